@@ -0,0 +1,174 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+from sqlalchemy.orm import Session
+import asyncio
+import hmac
+import threading
+
+from app.config import get_settings
+from app.database import get_db
+from app.api.v1.lexicon import LexiconEntryIn, LexiconEntryOut, LexiconList, entry_out, save_entry
+from app.services import lexicon
+from app.services.cache_warmer import WarmerBusy, cache_warmer, warm_set
+from app.services.tts_service import tts_service
+from app.shutdown import drain
+from app.profiling import MAX_PROFILE_SECONDS, ProfilerBusy, format_collapsed, sample_stacks
+from app.services.usage_rollup import query_rollups, rebuild_rollups
+
+router = APIRouter()
+settings = get_settings()
+
+
+def require_admin(x_admin_key: Optional[str] = Header(default=None, alias="X-Admin-Key")):
+    """Allow the request only with the configured admin key"""
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not hmac.compare_digest(x_admin_key or "", settings.ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+
+class UsageBucket(BaseModel):
+    bucket_start: datetime
+    provider: str
+    voice_id: str
+    generations: int
+    characters: int
+
+
+class UsageStats(BaseModel):
+    period: str
+    buckets: List[UsageBucket]
+    total_generations: int
+    total_characters: int
+
+
+@router.get("/stats", response_model=UsageStats, dependencies=[Depends(require_admin)])
+async def usage_stats(
+    period: str = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    provider: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Usage per provider and voice from the pre-aggregated rollups"""
+    if period not in ("hour", "day", "total"):
+        raise HTTPException(status_code=400, detail="period must be one of: hour, day, total")
+    
+    buckets = [
+        UsageBucket(
+            bucket_start=row.bucket_start,
+            provider=row.provider,
+            voice_id=row.voice_id,
+            generations=row.generations,
+            characters=row.characters,
+        )
+        for row in query_rollups(db, period, start=start, end=end, provider=provider)
+    ]
+    return UsageStats(
+        period=period,
+        buckets=buckets,
+        total_generations=sum(b.generations for b in buckets),
+        total_characters=sum(b.characters for b in buckets),
+    )
+
+
+@router.post("/rollups/rebuild", dependencies=[Depends(require_admin)])
+async def rebuild_usage_rollups(db: Session = Depends(get_db)):
+    """Recompute rollups from voice_generations (backfill after upgrades)"""
+    scanned = rebuild_rollups(db)
+    return {"rebuilt": True, "generations_scanned": scanned}
+
+
+@router.post("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile(
+    seconds: float = Query(default=10, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(default=5, ge=1, le=100),
+):
+    """Sample all thread stacks (event loop included) for ``seconds``.
+
+    Returns collapsed stacks for flamegraph.pl or speedscope. Sampling runs
+    in a worker thread, so the server keeps handling requests meanwhile.
+    """
+    # This handler runs on the loop thread, so its id labels the loop's stacks
+    loop_thread_id = threading.get_ident()
+    try:
+        stacks = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000, loop_thread_id)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        format_collapsed(stacks),
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
+
+
+@router.post("/drain", dependencies=[Depends(require_admin)])
+async def drain_instance():
+    """Stop taking requests and wait for in-flight ones (pre-stop hook).
+
+    ``/ready`` turns 503 and new requests are refused from here on; this
+    returns once in-flight requests finish or ``SHUTDOWN_DRAIN_SECONDS``
+    pass. The process should be stopped afterwards.
+    """
+    pending = await drain.wait(settings.SHUTDOWN_DRAIN_SECONDS)
+    return {"draining": True, "in_flight": len(pending)}
+
+
+@router.post("/cache/warm", dependencies=[Depends(require_admin)])
+async def warm_cache(
+    top_n: int = Query(default=settings.CACHE_WARM_TOP_N, ge=1, le=1000),
+    window_days: int = Query(default=settings.CACHE_WARM_WINDOW_DAYS, ge=1, le=365),
+    rate: float = Query(default=settings.CACHE_WARM_RATE, gt=0, le=100),
+    db: Session = Depends(get_db),
+):
+    """Render the most requested audio that's missing from the cache now.
+
+    Runs at ``rate`` renders a second and returns when done.
+    """
+    try:
+        report = await cache_warmer.warm(tts_service, db, top_n=top_n, window_days=window_days, rate=rate)
+    except WarmerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return report.as_dict()
+
+
+@router.get("/cache/warm", dependencies=[Depends(require_admin)])
+async def cache_warm_status():
+    """The last warm-up, and how much traffic its warm set has served since.
+
+    ``warm_set.hit_rate`` is the share of all cache lookups answered by a
+    warm-set file; compare it across ``CACHE_WARM_TOP_N`` values.
+    """
+    report = cache_warmer.last_report
+    return {
+        "running": cache_warmer.running,
+        "last_run": report.as_dict() if report else None,
+        "warm_set": {
+            "files": len(warm_set.filenames),
+            "lookups": warm_set.lookups,
+            "hits": warm_set.hits,
+            "hit_rate": round(warm_set.hit_rate, 4),
+        },
+    }
+
+
+@router.get("/lexicon", response_model=LexiconList, dependencies=[Depends(require_admin)])
+async def list_global_lexicon(db: Session = Depends(get_db)):
+    """Pronunciation entries applied for every device"""
+    entries = lexicon.list_entries(db, lexicon.GLOBAL_SCOPE)
+    return LexiconList(entries=[entry_out(e) for e in entries], total=len(entries))
+
+
+@router.put("/lexicon", response_model=LexiconEntryOut, dependencies=[Depends(require_admin)])
+async def put_global_lexicon_entry(body: LexiconEntryIn, db: Session = Depends(get_db)):
+    """Add or replace a global respelling; devices can override it"""
+    return save_entry(db, lexicon.GLOBAL_SCOPE, body)
+
+
+@router.delete("/lexicon/{entry_id}", status_code=204, dependencies=[Depends(require_admin)])
+async def delete_global_lexicon_entry(entry_id: int, db: Session = Depends(get_db)):
+    if not lexicon.delete_entry(db, lexicon.GLOBAL_SCOPE, entry_id):
+        raise HTTPException(status_code=404, detail="Lexicon entry not found")
+    return Response(status_code=204)
@@ -0,0 +1,17 @@
+import re
+
+from fastapi import Header
+
+# FingerprintJS visitor ids, or the frontend's "fallback_..." ids. Nothing
+# else is accepted, the empty string included, so a device id can never
+# collide with the sentinels that mark global and all-device rows.
+DEVICE_ID_PATTERN = r"^[A-Za-z0-9_-]{1,128}$"
+
+
+def is_device_id(value: str) -> bool:
+    return re.fullmatch(DEVICE_ID_PATTERN, value) is not None
+
+
+def device_id(x_device_id: str = Header(..., alias="X-Device-Id", pattern=DEVICE_ID_PATTERN)) -> str:
+    """The calling device, from ``X-Device-Id``"""
+    return x_device_id
@@ -0,0 +1,336 @@
+from fastapi import APIRouter, HTTPException, Depends, File, Form, UploadFile
+from pydantic import BaseModel
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+import asyncio
+import logging
+import os
+import uuid
+
+from app.config import get_settings
+from app.api.v1 import deps
+from app.database import SessionLocal, get_db
+from app.api.v1.tts import billable, resolve_output_format, resolve_voice
+from app.models import DocumentChapter, DocumentJob
+from app.services import quota
+from app.tracing import span
+from app.services.audio_cache import audio_cache
+from app.services.scheduler import priority
+from app.services.tts_service import tts_service
+from app.services.lexicon import Matcher, lexicon_store
+from app.services.documents import Chapter, DocumentError, detect_kind, iter_chapters, store_upload
+from app.services.audio_formats import media_type_for
+from app.services.usage_rollup import record_generation
+from app.metrics import tts_generations, tts_characters_processed, TOOL_NAME
+from app.shutdown import CANCEL_GRACE_SECONDS
+
+router = APIRouter()
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Chapters synthesized at once per document; extraction waits for a free slot
+DOCUMENT_MAX_IN_FLIGHT = 2
+
+
+class ChapterAudio(BaseModel):
+    index: int
+    title: str
+    characters: int
+    status: str
+    audio_url: Optional[str] = None
+
+
+class DocumentManifest(BaseModel):
+    success: bool
+    job_id: str
+    status: str
+    document: str
+    document_type: str
+    provider: str
+    voice_id: str
+    format: str
+    content_type: str
+    chapters: List[ChapterAudio]
+    characters_used: int
+
+
+@dataclass
+class ChapterOutline:
+    index: int
+    title: str
+    # Billed: the shorter of the extracted and the normalized text
+    characters: int
+
+
+def prepared_chapters(
+    file: BinaryIO, kind: str, prepare: Callable[[str], str]
+) -> Iterator[Tuple[Chapter, str]]:
+    """Chapters with their normalized text, skipping ones that normalize to nothing"""
+    for chapter in iter_chapters(file, kind, settings.DOCUMENT_CHAPTER_MAX_CHARS):
+        text = prepare(chapter.text)
+        if text:
+            yield chapter, text
+
+
+def outline(path: str, kind: str, prepare: Callable[[str], str]) -> List[ChapterOutline]:
+    """First pass: the chapters and their billed characters, for validation and the up-front hold"""
+    chapters = []
+    total = 0
+    with open(path, "rb") as file:
+        for chapter, text in prepared_chapters(file, kind, prepare):
+            characters = billable(chapter.text, text)
+            chapters.append(ChapterOutline(chapter.index, chapter.title, characters))
+            total += characters
+            if total > settings.DOCUMENT_MAX_CHARACTERS:
+                raise DocumentError(f"Document is longer than {settings.DOCUMENT_MAX_CHARACTERS} characters")
+    return chapters
+
+
+async def iterate_in_thread(iterator: Iterator):
+    """Drive a blocking iterator from a worker thread, one item at a time"""
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+class DocumentJobs:
+    """This process's background narrations; cancelled at shutdown"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def cancel(self) -> int:
+        """Cancel running narrations; each releases what it hasn't spoken"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=CANCEL_GRACE_SECONDS)
+        return len(tasks)
+
+
+document_jobs = DocumentJobs()
+
+
+def manifest(db: Session, job: DocumentJob) -> DocumentManifest:
+    chapters = (
+        db.query(DocumentChapter)
+        .filter(DocumentChapter.job_id == job.id)
+        .order_by(DocumentChapter.index)
+        .all()
+    )
+    return DocumentManifest(
+        success=job.status != "failed",
+        job_id=job.id,
+        status=job.status,
+        document=job.document,
+        document_type=job.document_type,
+        provider=job.provider,
+        voice_id=job.voice_id,
+        format=job.format,
+        content_type=media_type_for(job.format),
+        chapters=[
+            ChapterAudio(
+                index=c.index, title=c.title, characters=c.characters, status=c.status, audio_url=c.audio_url
+            )
+            for c in chapters
+        ],
+        characters_used=job.characters_used,
+    )
+
+
+async def narrate_document(
+    db: Session,
+    job_id: str,
+    source_path: str,
+    kind: str,
+    prepare: Callable[[str], str],
+    lexicon: Matcher,
+    reservation: quota.Reservation,
+    speed: float,
+    bitrate: Optional[int],
+):
+    """Background task: synthesize a document's chapters, recording each as it finishes.
+
+    Owns ``db`` and the scratch copy at ``source_path``. Every database
+    write commits before the next await, so the task never holds SQLite's
+    write lock while a chapter synthesizes. Spoken chapters are charged
+    when the document ends, however it ends; the rest of the hold is
+    released.
+    """
+    job = db.get(DocumentJob, job_id)
+    device_id, provider, voice_name, audio_format = job.device_id, job.provider, job.voice_id, job.format
+    db.commit()
+    limiter = asyncio.Semaphore(DOCUMENT_MAX_IN_FLIGHT)
+    delivered = 0
+
+    def finish(chapter: Chapter, filename: Optional[str]):
+        nonlocal delivered
+        row = db.query(DocumentChapter).filter_by(job_id=job_id, index=chapter.index).one()
+        row.status = "completed" if filename else "failed"
+        if filename:
+            row.audio_url = f"/audio/{filename}"
+            delivered += row.characters
+            db.get(DocumentJob, job_id).characters_used = delivered
+            record_generation(
+                db,
+                device_id=device_id,
+                voice_id=f"{provider}:{voice_name}",
+                provider=provider,
+                text_length=row.characters,
+                audio_url=row.audio_url,
+            )
+        db.commit()
+        # Long documents outlast a lease; each chapter extends it
+        quota.renew(db, reservation)
+
+    async def narrate(chapter: Chapter, text: str):
+        try:
+            with span("document.chapter", index=chapter.index, characters=len(text)), priority("paid"):
+                filename = await tts_service.synthesize(
+                    provider, voice_name, lexicon.apply(text), speed, audio_format, bitrate
+                )
+        finally:
+            limiter.release()
+        finish(chapter, filename)
+
+    tasks: List[asyncio.Task] = []
+    try:
+        with open(source_path, "rb") as file:
+            async for chapter, text in iterate_in_thread(prepared_chapters(file, kind, prepare)):
+                # Backpressure: extraction stops while the chapter slots are busy
+                await limiter.acquire()
+                tasks.append(asyncio.create_task(narrate(chapter, text)))
+            await asyncio.gather(*tasks)
+    except BaseException as e:
+        for task in tasks:
+            task.cancel()
+        if not isinstance(e, Exception):
+            raise
+        logger.exception("document narration failed", extra={"job_id": job_id})
+    finally:
+        db.rollback()
+        db.query(DocumentChapter).filter_by(job_id=job_id, status="pending").update(
+            {DocumentChapter.status: "failed"}, synchronize_session=False
+        )
+        db.get(DocumentJob, job_id).status = "completed" if delivered else "failed"
+        if delivered:
+            quota.settle(db, reservation, quota.cost({provider: delivered}))
+        else:
+            quota.release(db, reservation)
+        db.commit()
+        db.close()
+        if os.path.exists(source_path):
+            os.remove(source_path)
+        if delivered:
+            tts_generations.labels(tool=TOOL_NAME, provider=provider, voice_id=voice_name).inc()
+            tts_characters_processed.labels(tool=TOOL_NAME, provider=provider).inc(delivered)
+
+
+@router.post("/generate", response_model=DocumentManifest, status_code=202)
+async def generate_document(
+    file: UploadFile = File(..., description="A .txt, .md, .epub or .docx file"),
+    voice_id: str = Form(..., description="Voice ID in format 'provider:voice_name'"),
+    speed: float = Form(default=1.0, ge=0.5, le=2.0),
+    format: Optional[str] = Form(default=None),
+    bitrate: Optional[int] = Form(default=None),
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """Start narrating an uploaded document, one audio file per chapter.
+
+    The upload is copied to scratch, refused as soon as it passes
+    ``DOCUMENT_MAX_UPLOAD_MB``, and read twice, streaming both times: once
+    here to size and price it (the whole cost is held up front, from paid
+    tokens only), then in the background to synthesize chapters as they're
+    extracted, a few at a time. Returns the manifest right away; poll
+    ``GET /documents/{job_id}`` for each chapter's audio. Chapters that
+    fail are reported in the manifest and not charged.
+    """
+    backend, voice_name = resolve_voice(voice_id)
+    provider = backend.name
+    audio_format, bitrate = resolve_output_format(format, bitrate, None, provider)
+    try:
+        kind = detect_kind(file.filename, file.content_type)
+    except DocumentError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    def prepare(text: str) -> str:
+        return tts_service.prepare_text(provider, voice_name, text)
+
+    source_path = audio_cache.temp_path()
+    try:
+        await asyncio.to_thread(store_upload, file.file, source_path, settings.DOCUMENT_MAX_UPLOAD_MB * 1024 * 1024)
+    except DocumentError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        with span("document.outline", kind=kind) as stage:
+            try:
+                chapters = await asyncio.to_thread(outline, source_path, kind, prepare)
+            except DocumentError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            stage.set(chapters=len(chapters), characters=sum(c.characters for c in chapters))
+        if not chapters:
+            raise HTTPException(status_code=400, detail="No readable text found in the document")
+
+        # Hold the whole document's cost; a free trial doesn't cover documents
+        credits = quota.cost({provider: sum(c.characters for c in chapters)})
+        with span("tts.quota.reserve", credits=credits):
+            try:
+                reservation = quota.reserve(db, x_device_id, credits, use_free_trial=False)
+            except quota.QuotaExceeded as e:
+                raise HTTPException(status_code=402, detail=e.detail)
+
+        job = DocumentJob(
+            id=uuid.uuid4().hex,
+            device_id=x_device_id,
+            document=file.filename or "",
+            document_type=kind,
+            provider=provider,
+            voice_id=voice_name,
+            format=audio_format,
+        )
+        try:
+            db.add(job)
+            db.add_all(
+                DocumentChapter(job_id=job.id, index=c.index, title=c.title, characters=c.characters)
+                for c in chapters
+            )
+            db.commit()
+        except BaseException:
+            db.rollback()
+            quota.release(db, reservation)
+            db.commit()
+            raise
+    except BaseException:
+        os.remove(source_path)
+        raise
+
+    lexicon = lexicon_store.matcher(db, x_device_id)
+    document_jobs.start(narrate_document(
+        SessionLocal(bind=db.get_bind()), job.id, source_path, kind, prepare, lexicon, reservation, speed, bitrate
+    ))
+    return manifest(db, job)
+
+
+@router.get("/{job_id}", response_model=DocumentManifest)
+async def get_document(
+    job_id: str,
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """A document's manifest; chapters get their ``audio_url`` as they finish"""
+    job = db.query(DocumentJob).filter(DocumentJob.id == job_id, DocumentJob.device_id == x_device_id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return manifest(db, job)
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, Depends, Response
+from pydantic import BaseModel, Field
+from typing import List
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+from app.api.v1 import deps
+from app.database import get_db
+from app.services import lexicon
+from app.services.lexicon import MAX_REPLACEMENT_LENGTH, MAX_TERM_LENGTH
+
+router = APIRouter()
+
+
+class LexiconEntryIn(BaseModel):
+    term: str = Field(..., min_length=1, max_length=MAX_TERM_LENGTH, description="Word or phrase as written")
+    replacement: str = Field(
+        ..., min_length=1, max_length=MAX_REPLACEMENT_LENGTH, description="Phonetic respelling to speak instead"
+    )
+
+
+class LexiconEntryOut(BaseModel):
+    id: int
+    term: str
+    replacement: str
+    scope: str
+    updated_at: datetime
+
+
+class LexiconList(BaseModel):
+    entries: List[LexiconEntryOut]
+    total: int
+
+
+def entry_out(entry) -> LexiconEntryOut:
+    return LexiconEntryOut(
+        id=entry.id,
+        term=entry.term,
+        replacement=entry.replacement,
+        scope="global" if entry.device_id == lexicon.GLOBAL_SCOPE else "device",
+        updated_at=entry.updated_at,
+    )
+
+
+def save_entry(db: Session, device_id: str, body: LexiconEntryIn) -> LexiconEntryOut:
+    try:
+        return entry_out(lexicon.upsert_entry(db, device_id, body.term, body.replacement))
+    except lexicon.LexiconError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/", response_model=LexiconList)
+async def list_lexicon(
+    include_global: bool = False,
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """A device's pronunciation entries, optionally with the global ones"""
+    entries = lexicon.list_entries(db, x_device_id)
+    if include_global:
+        entries = lexicon.list_entries(db, lexicon.GLOBAL_SCOPE) + entries
+    return LexiconList(entries=[entry_out(e) for e in entries], total=len(entries))
+
+
+@router.put("/", response_model=LexiconEntryOut)
+async def put_lexicon_entry(
+    body: LexiconEntryIn,
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """Add or replace the device's respelling for a term"""
+    return save_entry(db, x_device_id, body)
+
+
+@router.delete("/{entry_id}", status_code=204)
+async def delete_lexicon_entry(
+    entry_id: int,
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """Remove one of the device's entries"""
+    if not lexicon.delete_entry(db, x_device_id, entry_id):
+        raise HTTPException(status_code=404, detail="Lexicon entry not found")
+    return Response(status_code=204)
@@ -0,0 +1,79 @@
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile
+from pydantic import BaseModel
+from typing import List
+from sqlalchemy.orm import Session
+
+from app.api.v1 import deps
+from app.config import get_settings
+from app.database import get_db
+from app.services.music import MusicError, MusicTrack, music_library
+
+router = APIRouter()
+settings = get_settings()
+
+
+class MusicTrackOut(BaseModel):
+    music_id: str
+    name: str
+    duration_seconds: float
+    channels: int
+    rate: int
+
+
+class MusicList(BaseModel):
+    tracks: List[MusicTrackOut]
+
+
+def track_out(track: MusicTrack) -> MusicTrackOut:
+    return MusicTrackOut(
+        music_id=track.music_id,
+        name=track.name,
+        duration_seconds=track.duration_seconds,
+        channels=track.channels,
+        rate=track.rate,
+    )
+
+
+@router.get("/", response_model=MusicList)
+async def list_music():
+    """Library tracks that can be mixed under a voiceover"""
+    return MusicList(tracks=[track_out(t) for t in music_library.tracks()])
+
+
+@router.get("/uploads", response_model=MusicList)
+async def list_uploads(
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """This device's uploaded music beds"""
+    return MusicList(tracks=[track_out(t) for t in music_library.uploads(db, x_device_id)])
+
+
+@router.post("/", response_model=MusicTrackOut)
+async def upload_music(
+    file: UploadFile = File(..., description="16-bit WAV, or any format ffmpeg reads when it's installed"),
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """Upload a music bed; pass the returned ``music_id`` as ``music.music_id`` to /tts/generate.
+
+    Only the uploading device can use the track. Each device keeps at most
+    ``MUSIC_MAX_UPLOADS_PER_DEVICE`` tracks and ``MUSIC_MAX_DEVICE_MB`` of
+    audio; delete one to make room.
+    """
+    try:
+        track = await music_library.save_upload(db, x_device_id, file.file, settings.MUSIC_MAX_UPLOAD_MB * 1024 * 1024)
+    except MusicError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return track_out(track)
+
+
+@router.delete("/{music_id}", status_code=204)
+async def delete_music(
+    music_id: str,
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """Remove one of this device's uploads"""
+    if not music_library.delete_upload(db, x_device_id, music_id):
+        raise HTTPException(status_code=404, detail="Music track not found")
@@ -1,17 +1,19 @@
-from fastapi import APIRouter, HTTPException, Request, Header, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request, Response, Header, Depends
+from pydantic import BaseModel, Field
 from typing import Optional
-import httpx
 import json
 import hmac
+import orjson
 import hashlib
 from datetime import datetime
 from sqlalchemy.orm import Session
 
+from app.api.v1 import deps
 from app.config import get_settings
 from app.database import get_db
 from app.models import PaymentTransaction, GenerationToken
 from app.metrics import payment_success, payment_revenue_cents, TOOL_NAME
+from app.tracing import inject_headers, span
 
 router = APIRouter()
 settings = get_settings()
@@ -26,7 +28,7 @@ PRODUCTS = {
 
 class CheckoutRequest(BaseModel):
     product_id: str
-    device_id: str
+    device_id: str = Field(..., pattern=deps.DEVICE_ID_PATTERN)
     success_url: str
     cancel_url: Optional[str] = None
 
@@ -58,25 +60,29 @@ async def create_checkout(
         raise HTTPException(status_code=500, detail="Product not configured in Creem")
     
     # Create checkout via Creem API
+    import httpx
+    
     try:
         async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://api.creem.io/v1/checkouts",
-                headers={
-                    "Authorization": f"Bearer {settings.CREEM_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "product_id": creem_product_id,
-                    "success_url": request.success_url,
-                    "cancel_url": request.cancel_url or request.success_url,
-                    "metadata": {
-                        "device_id": request.device_id,
-                        "product_id": request.product_id,
-                        "tokens": product["tokens"],
+            with span("payment.creem.checkout", product_id=request.product_id) as checkout:
+                response = await client.post(
+                    "https://api.creem.io/v1/checkouts",
+                    headers=inject_headers({
+                        "Authorization": f"Bearer {settings.CREEM_API_KEY}",
+                        "Content-Type": "application/json",
+                    }),
+                    json={
+                        "product_id": creem_product_id,
+                        "success_url": request.success_url,
+                        "cancel_url": request.cancel_url or request.success_url,
+                        "metadata": {
+                            "device_id": request.device_id,
+                            "product_id": request.product_id,
+                            "tokens": product["tokens"],
+                        },
                     },
-                },
-            )
+                )
+                checkout.set(status=response.status_code)
             
             if response.status_code != 200:
                 raise HTTPException(status_code=500, detail="Failed to create checkout")
@@ -173,10 +179,8 @@ async def handle_webhook(
     return {"received": True}
 
 
-@router.get("/products")
-async def list_products():
-    """List available products"""
-    return {
+def _products_body() -> bytes:
+    return orjson.dumps({
         "products": [
             {
                 "id": pid,
@@ -187,4 +191,18 @@ async def list_products():
             }
             for pid, info in PRODUCTS.items()
         ]
-    }
+    })
+
+
+# The catalogue is fixed per deploy, so it's serialized once
+PRODUCTS_BODY = _products_body()
+PRODUCTS_ETAG = f'"{hashlib.sha256(PRODUCTS_BODY).hexdigest()[:16]}"'
+
+
+@router.get("/products")
+async def list_products(request: Request):
+    """List available products"""
+    headers = {"ETag": PRODUCTS_ETAG, "Cache-Control": "public, max-age=300"}
+    if request.headers.get("if-none-match") == PRODUCTS_ETAG:
+        return Response(status_code=304, headers=headers)
+    return Response(PRODUCTS_BODY, media_type="application/json", headers=headers)
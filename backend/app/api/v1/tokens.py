@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Header, Depends
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from typing import Optional
 from sqlalchemy.orm import Session
 
+from app.api.v1 import deps
 from app.database import get_db
-from app.models import GenerationToken, FreeTrialUsage
+from app.models import CHARACTERS_PER_TOKEN, GenerationToken, FreeTrialUsage
 
 router = APIRouter()
 
@@ -13,13 +14,16 @@ class TokenStatus(BaseModel):
     total_tokens: int
     used_tokens: int
     remaining_tokens: int
+    # Tokens are metered by characters: premium voices use them faster
+    remaining_characters: int = 0
+    characters_per_token: int = CHARACTERS_PER_TOKEN
     free_trial_available: bool
     free_trial_used: bool
 
 
 @router.get("/status", response_model=TokenStatus)
 async def get_token_status(
-    x_device_id: str = Header(..., alias="X-Device-Id"),
+    x_device_id: str = Depends(deps.device_id),
     db: Session = Depends(get_db),
 ):
     """Get token status for a device"""
@@ -41,6 +45,7 @@ async def get_token_status(
             total_tokens=token_record.total_tokens,
             used_tokens=token_record.used_tokens,
             remaining_tokens=token_record.remaining_tokens,
+            remaining_characters=max(token_record.remaining_credits, 0),
             free_trial_available=free_trial_available,
             free_trial_used=free_trial_used,
         )
@@ -1,23 +1,85 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
-from pydantic import BaseModel, Field
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Optional, List, Dict
+from datetime import datetime
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
+import asyncio
+import base64
+import dataclasses
+import json
+from pathlib import Path
 
+from app.config import get_settings
+from app.api.v1 import deps
 from app.database import get_db
-from app.models import GenerationToken, FreeTrialUsage, VoiceGeneration
+from app.models import VoiceGeneration
+from app.services import export, quota
+from app.tracing import span
+from app.services.scheduler import priority
 from app.services.tts_service import tts_service
+from app.services.providers import TTSProvider
+from app.services.audio_cache import audio_cache
+from app.services.audio_post import PostProcess
+from app.services.audio_mix import Mix
+from app.services.music import music_library
+from app.services.cache_warmer import remember_request
+from app.services.lexicon import Matcher, lexicon_store
+from app.services.sentence_splitter import SentenceSplitter
+from app.services.ssml import Segment, SSMLError, is_ssml, parse_ssml
+from app.services.usage_rollup import record_generation, device_totals
+from app.services.audio_formats import (
+    AUDIO_FORMATS, FormatNotAcceptable, can_transcode, negotiate_format, normalize_bitrate, media_type_for
+)
 from app.metrics import (
-    tokens_consumed, free_trial_used, tts_generations, 
-    tts_characters_processed, TOOL_NAME
+    tts_generations, tts_characters_processed, TOOL_NAME
 )
 
 router = APIRouter()
+settings = get_settings()
+
+MAX_TEXT_LENGTH = 5000
+
+
+class PostProcessOptions(BaseModel):
+    target_lufs: Optional[float] = Field(
+        default=-16.0, ge=-40, le=-5, description="Integrated loudness target in LUFS; null skips normalization"
+    )
+    trim_silence: bool = Field(default=True, description="Cut leading and trailing silence")
+    fade_in_ms: int = Field(default=0, ge=0, le=5000)
+    fade_out_ms: int = Field(default=0, ge=0, le=5000)
+
+
+class MusicOptions(BaseModel):
+    music_id: str = Field(..., description="Track from /api/v1/music: 'library:<name>' or 'upload:<id>'")
+    music_gain_db: float = Field(default=-18.0, ge=-40, le=0, description="Music level where nobody speaks")
+    duck_db: float = Field(default=-12.0, ge=-40, le=0, description="Extra attenuation under speech")
+    lead_in_ms: int = Field(default=1000, ge=0, le=10000, description="Music before the voice starts")
+    tail_ms: int = Field(default=2000, ge=0, le=10000, description="Music after the voice, faded out")
 
 
 class TTSRequest(BaseModel):
-    text: str = Field(..., min_length=1, max_length=5000)
+    text: str = Field(..., min_length=1, max_length=MAX_TEXT_LENGTH)
     voice_id: str = Field(..., description="Voice ID in format 'provider:voice_name'")
     speed: float = Field(default=1.0, ge=0.5, le=2.0)
+    format: Optional[str] = Field(
+        default=None,
+        description=f"Output format: {', '.join(AUDIO_FORMATS)}. Falls back to the Accept header, then mp3",
+    )
+    bitrate: Optional[int] = Field(default=None, description="Bitrate in kbps for lossy formats")
+    normalize: bool = Field(
+        default=True,
+        description="Strip markup, expand numbers/abbreviations and collapse whitespace before synthesis",
+    )
+    postprocess: Optional[PostProcessOptions] = Field(
+        default=None,
+        description="Loudness normalization, silence trimming and fades applied after synthesis",
+    )
+    music: Optional[MusicOptions] = Field(
+        default=None,
+        description="Music bed mixed under the voice, ducked automatically while it speaks",
+    )
 
 
 class TTSResponse(BaseModel):
@@ -26,147 +88,396 @@ class TTSResponse(BaseModel):
     provider: str
     voice_id: str
     characters_used: int
+    segments: int = 1
+    format: str = "mp3"
+    content_type: str = "audio/mpeg"
     error: Optional[str] = None
 
 
-def check_token_or_free_trial(device_id: str, db: Session) -> tuple[bool, str]:
-    """Check if user has tokens or free trial available"""
-    # Check free trial
-    free_trial = db.query(FreeTrialUsage).filter(
-        FreeTrialUsage.device_id == device_id
-    ).first()
+def resolve_output_format(
+    requested_format: Optional[str],
+    requested_bitrate: Optional[int],
+    accept: Optional[str],
+    provider: str,
+) -> tuple[str, Optional[int]]:
+    """Negotiate the output format and bitrate for a request"""
+    try:
+        audio_format = negotiate_format(requested_format, accept)
+    except FormatNotAcceptable as e:
+        # An explicit body format is a bad request; a bad Accept header is 406
+        raise HTTPException(status_code=400 if requested_format else 406, detail=str(e))
     
-    if not free_trial:
-        # Create and use free trial
-        free_trial = FreeTrialUsage(device_id=device_id, used=True)
-        db.add(free_trial)
-        db.commit()
-        free_trial_used.labels(tool=TOOL_NAME).inc()
-        return True, "free_trial"
+    try:
+        bitrate = normalize_bitrate(audio_format, requested_bitrate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if not free_trial.used:
-        free_trial.used = True
-        db.commit()
-        free_trial_used.labels(tool=TOOL_NAME).inc()
-        return True, "free_trial"
+    if not tts_service.supports_format(provider, audio_format, bitrate):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Format '{audio_format}' is not available for {provider} voices on this server",
+        )
     
-    # Check paid tokens
-    token_record = db.query(GenerationToken).filter(
-        GenerationToken.device_id == device_id
-    ).first()
+    return audio_format, bitrate
+
+
+def resolve_voice(voice_id: str) -> tuple[TTSProvider, str]:
+    """Split a ``provider:voice`` id and validate it against the provider registry"""
+    if ":" not in voice_id:
+        raise HTTPException(status_code=400, detail="Invalid voice_id format. Use 'provider:voice_name'")
+    provider_name, voice_name = voice_id.split(":", 1)
+    provider = tts_service.get_provider(provider_name)
+    if provider is None:
+        raise HTTPException(status_code=400, detail=f"Unknown provider: {provider_name}")
+    if not provider.has_voice(voice_name):
+        raise HTTPException(status_code=400, detail=f"Unknown {provider.display_name} voice: {voice_name}")
+    return provider, voice_name
+
+
+def prepare_text(request: TTSRequest, provider: str, voice_name: str) -> str:
+    """Text to synthesize, normalized unless the client opted out"""
+    if not request.normalize:
+        return request.text
+    text = tts_service.prepare_text(provider, voice_name, request.text)
+    if not text:
+        raise HTTPException(status_code=400, detail="Text is empty after normalization")
+    return text
+
+
+def billable(submitted: str, spoken: str) -> int:
+    """Characters charged for ``submitted`` text spoken as ``spoken``.
+
+    Billing follows the text as submitted: expanding numbers and
+    abbreviations never costs more, while markup and whitespace that
+    normalization strips aren't charged either.
+    """
+    return min(len(submitted), len(spoken))
+
+
+def check_spoken_length(characters: int):
+    """Refuse text that grew past the length limit once expanded and respelled"""
+    if characters > MAX_TEXT_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Text is too long once normalized ({characters} characters, at most {MAX_TEXT_LENGTH})",
+        )
+
+
+def prepare_segments(
+    request: TTSRequest,
+    audio_format: str,
+    bitrate: Optional[int],
+) -> tuple[List[Segment], Dict[str, int]]:
+    """Parse SSML into validated, normalized segments and the characters billed per voice.
+
+    Usage is keyed ``provider:voice`` by the registry's provider name, however
+    the script spelled it, so pricing and history see one provider.
+    """
+    try:
+        segments = parse_ssml(request.text, request.voice_id, request.speed)
+    except SSMLError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if token_record and token_record.remaining_tokens > 0:
-        return True, "paid"
+    prepared = []
+    usage: Dict[str, int] = {}
+    for segment in segments:
+        if segment.is_break:
+            prepared.append(segment)
+            continue
+        backend, voice_name = resolve_voice(segment.voice_id)
+        submitted = segment.text
+        if request.normalize:
+            segment.text = tts_service.prepare_text(segment.provider, segment.voice_name, segment.text)
+            if not segment.text:
+                continue
+        prepared.append(segment)
+        voice_id = f"{backend.name}:{voice_name}"
+        usage[voice_id] = usage.get(voice_id, 0) + billable(submitted, segment.text)
     
-    return False, "no_tokens"
+    if not any(not s.is_break for s in prepared):
+        raise HTTPException(status_code=400, detail="Text is empty after normalization")
+    # Merging parts without ffmpeg is only possible by MP3 frame concatenation
+    if not can_transcode() and (audio_format != "mp3" or bitrate is not None):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Format '{audio_format}' is not available for multi-voice scripts on this server",
+        )
+    return prepared, usage
 
 
-def use_token(device_id: str, db: Session):
-    """Consume one token"""
-    token_record = db.query(GenerationToken).filter(
-        GenerationToken.device_id == device_id
-    ).first()
-    
-    if token_record:
-        token_record.used_tokens += 1
-        db.commit()
-        tokens_consumed.labels(tool=TOOL_NAME).inc()
+def resolve_postprocess(
+    request: TTSRequest,
+    provider: str,
+    audio_format: str,
+    segments: Optional[List[Segment]],
+    db: Session,
+    device_id: str,
+) -> Optional[PostProcess]:
+    """Post-processing settings for a request (music mixing included), if it asked for any"""
+    if request.postprocess is None and request.music is None:
+        return None
+    # Multi-voice scripts are merged losslessly before processing, which needs ffmpeg
+    supported = can_transcode() if segments else tts_service.supports_postprocess(provider, audio_format)
+    if not supported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Post-processing into '{audio_format}' is not available for {provider} voices on this server",
+        )
+    if request.postprocess is not None:
+        post = PostProcess(**request.postprocess.model_dump())
+    else:
+        # Mixing alone leaves the voice as rendered
+        post = PostProcess(target_lufs=None, trim_silence=False)
+    if request.music is None:
+        return post
+
+    track = music_library.resolve(request.music.music_id, db, device_id)
+    if track is None:
+        raise HTTPException(status_code=400, detail=f"Unknown music track: {request.music.music_id}")
+    options = request.music.model_dump(exclude={"music_id"})
+    return dataclasses.replace(post, mix=Mix(music_path=track.path, music_key=track.key, **options))
+
+
+def apply_lexicon(segments: List[Segment], lexicon: Matcher) -> List[Segment]:
+    """Copies of ``segments`` with the lexicon's respellings substituted"""
+    return [s if s.is_break else dataclasses.replace(s, text=lexicon.apply(s.text)) for s in segments]
+
+
+def provider_usage(usage: Dict[str, int]) -> Dict[str, int]:
+    """Collapse ``{voice_id: characters}`` to ``{provider: characters}`` for pricing"""
+    totals: Dict[str, int] = {}
+    for voice_id, characters in usage.items():
+        provider = voice_id.split(":", 1)[0]
+        totals[provider] = totals.get(provider, 0) + characters
+    return totals
+
+
+def reserve_quota(device_id: str, credits: int, db: Session) -> quota.Reservation:
+    try:
+        return quota.reserve(db, device_id, credits)
+    except quota.QuotaExceeded as e:
+        raise HTTPException(status_code=402, detail=e.detail)
 
 
 @router.post("/generate", response_model=TTSResponse)
 async def generate_speech(
     request: TTSRequest,
-    x_device_id: str = Header(..., alias="X-Device-Id"),
+    x_device_id: str = Depends(deps.device_id),
+    accept: Optional[str] = Header(default=None),
     db: Session = Depends(get_db),
 ):
     """Generate speech from text"""
-    # Validate voice_id format
-    if ":" not in request.voice_id:
-        raise HTTPException(status_code=400, detail="Invalid voice_id format. Use 'provider:voice_name'")
+    with span("tts.prepare", voice_id=request.voice_id) as stage:
+        backend, voice_name = resolve_voice(request.voice_id)
+        provider = backend.name
+        audio_format, bitrate = resolve_output_format(request.format, request.bitrate, accept, provider)
+        segments = None
+        if is_ssml(request.text):
+            segments, usage = prepare_segments(request, audio_format, bitrate)
+        else:
+            text = prepare_text(request, provider, voice_name)
+            usage = {f"{provider}:{voice_name}": billable(request.text, text)}
+        post = resolve_postprocess(request, provider, audio_format, segments, db, x_device_id)
+        stage.set(format=audio_format, segments=len(segments) if segments else 1, postprocess=post is not None)
     
-    provider, voice_name = request.voice_id.split(":", 1)
+    # Priced per character and provider tier, on the text as submitted (see ``billable``)
+    credits = quota.cost(provider_usage(usage))
     
-    # Check tokens/free trial
-    has_access, access_type = check_token_or_free_trial(x_device_id, db)
-    
-    if not has_access:
-        raise HTTPException(
-            status_code=402,
-            detail="No tokens remaining. Please purchase more to continue."
-        )
+    # Respellings change what's spoken (and the cache key) but aren't billed
+    with span("tts.lexicon") as stage:
+        lexicon = lexicon_store.matcher(db, x_device_id)
+        stage.set(entries=len(lexicon))
+        if segments:
+            segments = apply_lexicon(segments, lexicon)
+            check_spoken_length(sum(len(s.text) for s in segments))
+        else:
+            text = lexicon.apply(text)
+            check_spoken_length(len(text))
     
-    # Generate audio based on provider
-    audio_filename = None
+    # Hold the cost up front
+    with span("tts.quota.reserve", credits=credits):
+        reservation = reserve_quota(x_device_id, credits, db)
     
-    if provider.lower() == "openai":
-        if voice_name not in tts_service.OPENAI_VOICES:
-            raise HTTPException(status_code=400, detail=f"Unknown OpenAI voice: {voice_name}")
-        audio_filename = await tts_service.generate_openai(
-            request.text, 
-            voice_name, 
-            request.speed
-        )
-    elif provider.lower() == "edge":
-        audio_filename = await tts_service.generate_edge_tts(
-            request.text,
-            voice_name,
-            f"{int((request.speed - 1) * 100):+d}%"
-        )
-    else:
-        raise HTTPException(status_code=400, detail=f"Unknown provider: {provider}")
+    # Generate audio based on provider; paid work gets most provider slots under load
+    try:
+        with (
+            span("tts.synthesize", provider=provider, characters=sum(usage.values())),
+            priority(reservation.access_type),
+        ):
+            if segments:
+                audio_filename = await tts_service.synthesize_segments(segments, audio_format, bitrate, post)
+            else:
+                audio_filename = await tts_service.synthesize(
+                    provider, voice_name, text, request.speed, audio_format, bitrate, post=post
+                )
+    except asyncio.CancelledError:
+        # Cut off (client gone or shutdown deadline): nothing was delivered
+        quota.release(db, reservation, restore_free_trial=True)
+        db.commit()
+        raise
     
     if not audio_filename:
+        quota.release(db, reservation)
+        db.commit()
         raise HTTPException(status_code=500, detail="Failed to generate audio. Please try again.")
     
-    # Use token if paid
-    if access_type == "paid":
-        use_token(x_device_id, db)
-    
-    # Record generation
-    generation = VoiceGeneration(
-        device_id=x_device_id,
-        voice_id=request.voice_id,
-        provider=provider,
-        text_length=len(request.text),
-        audio_url=f"/audio/{audio_filename}",
-    )
-    db.add(generation)
-    db.commit()
-    
-    # Update metrics
-    tts_generations.labels(tool=TOOL_NAME, provider=provider, voice_id=voice_name).inc()
-    tts_characters_processed.labels(tool=TOOL_NAME, provider=provider).inc(len(request.text))
+    # Charge and record the generation (one row per voice) in one commit
+    with span("tts.record"):
+        quota.settle(db, reservation, credits)
+        request_hash = audio_filename.rsplit(".", 1)[0]
+        if settings.CACHE_WARM_TOP_N > 0 and not segments and post is None:
+            # Lets the cache warmer render this file again if it's popular
+            remember_request(
+                db, request_hash, provider, voice_name, text, request.speed, audio_format, bitrate
+            )
+        for voice_id, characters in usage.items():
+            voice_provider, voice = voice_id.split(":", 1)
+            record_generation(
+                db,
+                device_id=x_device_id,
+                voice_id=voice_id,
+                provider=voice_provider,
+                text_length=characters,
+                audio_url=f"/audio/{audio_filename}",
+                request_hash=request_hash,
+            )
+            
+            # Update metrics
+            tts_generations.labels(tool=TOOL_NAME, provider=voice_provider, voice_id=voice).inc()
+            tts_characters_processed.labels(tool=TOOL_NAME, provider=voice_provider).inc(characters)
+        db.commit()
     
     return TTSResponse(
         success=True,
         audio_url=f"/audio/{audio_filename}",
         provider=provider,
         voice_id=voice_name,
-        characters_used=len(request.text),
+        characters_used=sum(usage.values()),
+        segments=len(segments) if segments else 1,
+        format=audio_format,
+        content_type=media_type_for(audio_format),
+    )
+
+
+class HistoryItem(BaseModel):
+    id: int
+    voice_id: str
+    provider: str
+    text_length: int
+    audio_url: Optional[str] = None
+    created_at: datetime
+
+
+class HistoryResponse(BaseModel):
+    items: List[HistoryItem]
+    next_cursor: Optional[str] = None
+    total_generations: int
+    total_characters: int
+
+
+def _encode_cursor(generation: VoiceGeneration) -> str:
+    raw = f"{generation.created_at.isoformat()}|{generation.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, generation_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(generation_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/history", response_model=HistoryResponse)
+async def generation_history(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """Newest-first generation history for a device.
+
+    Pages with a keyset cursor over the ``(device_id, created_at)`` index so
+    deep pages cost the same as the first; totals come from the rollups.
+    """
+    query = db.query(VoiceGeneration).filter(VoiceGeneration.device_id == x_device_id)
+    if cursor:
+        created_at, generation_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            VoiceGeneration.created_at < created_at,
+            and_(VoiceGeneration.created_at == created_at, VoiceGeneration.id < generation_id),
+        ))
+    rows = query.order_by(
+        VoiceGeneration.created_at.desc(), VoiceGeneration.id.desc()
+    ).limit(limit + 1).all()
+    
+    page = rows[:limit]
+    totals = device_totals(db, x_device_id)
+    return HistoryResponse(
+        items=[
+            HistoryItem(
+                id=row.id,
+                voice_id=row.voice_id,
+                provider=row.provider,
+                text_length=row.text_length,
+                audio_url=row.audio_url,
+                created_at=row.created_at,
+            )
+            for row in page
+        ],
+        next_cursor=_encode_cursor(page[-1]) if len(rows) > limit else None,
+        total_generations=totals["generations"],
+        total_characters=totals["characters"],
+    )
+
+
+@router.get("/export")
+async def export_generations(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=1000, ge=1, le=10000),
+    manifest: str = Query(default="csv", pattern="^(csv|json)$"),
+    x_device_id: str = Depends(deps.device_id),
+    db: Session = Depends(get_db),
+):
+    """ZIP of a device's audio files and a manifest of its generations, oldest first.
+
+    Streamed as it's built (see ``services.export``). Holds up to ``limit``
+    generations; when more follow, ``X-Export-Next-Cursor`` (also in the
+    JSON manifest) fetches the next part. Retry a failed download with the
+    cursor it was requested with.
+    """
+    after = export.Key(*_decode_cursor(cursor)) if cursor else None
+    through, more = export.plan_part(db, x_device_id, after, limit)
+    next_cursor = _encode_cursor(through) if more else None
+    
+    # The request's session closes when this returns; the stream reads with its own
+    stream = export.stream_export(
+        Session(bind=db.get_bind()), x_device_id, after, through, manifest, next_cursor
     )
+    headers = {"Content-Disposition": 'attachment; filename="voiceover-export.zip"'}
+    if next_cursor:
+        headers["X-Export-Next-Cursor"] = next_cursor
+    return StreamingResponse(stream, media_type="application/zip", headers=headers)
 
 
 @router.post("/preview")
 async def preview_speech(
     request: TTSRequest,
+    accept: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db),
 ):
     """Generate a short preview (max 100 chars, no token required)"""
-    preview_text = request.text[:100]
-    
-    if ":" not in request.voice_id:
-        raise HTTPException(status_code=400, detail="Invalid voice_id format")
-    
-    provider, voice_name = request.voice_id.split(":", 1)
+    backend, voice_name = resolve_voice(request.voice_id)
+    provider = backend.name
+    audio_format, bitrate = resolve_output_format(request.format, request.bitrate, accept, provider)
+    # Anonymous, so only the global lexicon applies
+    preview_text = lexicon_store.matcher(db).apply(prepare_text(request, provider, voice_name)[:100])
     
-    # Generate preview
-    if provider.lower() == "openai":
-        audio_filename = await tts_service.generate_openai(preview_text, voice_name, request.speed)
-    elif provider.lower() == "edge":
-        audio_filename = await tts_service.generate_edge_tts(
-            preview_text, voice_name, f"{int((request.speed - 1) * 100):+d}%"
+    # Previews queue behind paid and free-trial work when providers are busy
+    with priority("preview"):
+        audio_filename = await tts_service.synthesize(
+            provider, voice_name, preview_text, request.speed, audio_format, bitrate
         )
-    else:
-        raise HTTPException(status_code=400, detail=f"Unknown provider: {provider}")
     
     if not audio_filename:
         raise HTTPException(status_code=500, detail="Failed to generate preview")
@@ -174,5 +485,208 @@ async def preview_speech(
     return {
         "success": True,
         "audio_url": f"/audio/{audio_filename}",
+        "format": audio_format,
+        "content_type": media_type_for(audio_format),
         "is_preview": True,
     }
+
+
+# Sentences synthesized concurrently per streaming session
+STREAM_MAX_IN_FLIGHT = 3
+# Characters a paid streaming session holds credits for at a time
+STREAM_HOLD_CHARACTERS = 1000
+
+
+class StreamStart(BaseModel):
+    voice_id: str = Field(..., description="Voice ID in format 'provider:voice_name'")
+    speed: float = Field(default=1.0, ge=0.5, le=2.0)
+    format: Optional[str] = None
+    bitrate: Optional[int] = None
+    normalize: bool = True
+
+
+async def receive_message(websocket: WebSocket) -> Optional[dict]:
+    """The client's next message as a JSON object; None if it's anything else"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    try:
+        data = json.loads(message.get("text") or message.get("bytes") or "")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@router.websocket("/stream")
+async def stream_speech(
+    websocket: WebSocket,
+    device_id: Optional[str] = Query(default=None),
+    x_device_id: Optional[str] = Header(default=None, alias="X-Device-Id"),
+    db: Session = Depends(get_db),
+):
+    """Real-time TTS over a WebSocket.
+
+    The client sends ``{"type": "start", "voice_id": ..., "speed": ..., "format": ...}``,
+    then any number of ``{"type": "text", "text": ...}`` chunks and finally
+    ``{"type": "end"}``. Each completed sentence is synthesized as soon as it
+    arrives; the server replies per sentence, in order, with an ``audio`` JSON
+    frame followed by a binary frame holding the audio. A free trial covers
+    the whole session. Otherwise delivered sentences are charged by
+    characters like ``/generate``: credits are held ``STREAM_HOLD_CHARACTERS``
+    at a time as the text grows, and the charge is settled once when the
+    session ends or the client goes away. The session ends when tokens run out.
+    """
+    await websocket.accept()
+    device = x_device_id or device_id
+    if not device or not deps.is_device_id(device):
+        await websocket.close(code=1008, reason="Missing or invalid device id")
+        return
+    
+    async def fail(detail: str, code: int = 1008):
+        await websocket.send_json({"type": "error", "detail": detail})
+        await websocket.close(code=code)
+    
+    try:
+        start = StreamStart(**(await receive_message(websocket) or {}))
+    except ValidationError:
+        await fail("First message must be a start message with a voice_id")
+        return
+    except WebSocketDisconnect:
+        return
+    
+    try:
+        backend, voice_name = resolve_voice(start.voice_id)
+        provider = backend.name
+        audio_format, bitrate = resolve_output_format(start.format, start.bitrate, None, provider)
+    except HTTPException as e:
+        await fail(e.detail)
+        return
+    
+    try:
+        session = quota.reserve(db, device, 0)
+    except quota.QuotaExceeded as e:
+        await fail(e.detail)
+        return
+    await websocket.send_json({"type": "ready", "access_type": session.access_type, "format": audio_format})
+    lexicon = lexicon_store.matcher(db, device)
+    
+    splitter = SentenceSplitter()
+    limiter = asyncio.Semaphore(STREAM_MAX_IN_FLIGHT)
+    pending: asyncio.Queue = asyncio.Queue()
+    characters = 0
+    # Credits for submitted sentences and for the delivered ones, which are charged
+    submitted = 0
+    delivered = 0
+    # (characters, filename) per delivered sentence, recorded with the charge at the end so the
+    # session doesn't hold a write transaction open between sentences
+    generations: List[tuple] = []
+    
+    async def synthesize(sentence: str) -> Optional[str]:
+        async with limiter:
+            with priority(session.access_type):
+                return await tts_service.synthesize(
+                    provider, voice_name, lexicon.apply(sentence), start.speed, audio_format, bitrate
+                )
+    
+    async def sender():
+        """Send finished sentences back strictly in submission order"""
+        nonlocal delivered
+        seq = 0
+        sent = 0
+        while True:
+            item = await pending.get()
+            if item is None:
+                return sent
+            sentence, task, billed, credits = item
+            filename = await task
+            if not filename:
+                await websocket.send_json({"type": "error", "seq": seq, "detail": "Failed to generate audio"})
+                seq += 1
+                continue
+            audio = await asyncio.to_thread(Path(audio_cache.path(filename)).read_bytes)
+            await websocket.send_json({
+                "type": "audio",
+                "seq": seq,
+                "text": sentence,
+                "audio_url": f"/audio/{filename}",
+                "format": audio_format,
+                "content_type": media_type_for(audio_format),
+                "bytes": len(audio),
+            })
+            await websocket.send_bytes(audio)
+            delivered += credits
+            generations.append((billed, filename))
+            tts_characters_processed.labels(tool=TOOL_NAME, provider=provider).inc(billed)
+            seq += 1
+            sent += 1
+    
+    def submit(sentences):
+        nonlocal submitted
+        for sentence in sentences:
+            raw = sentence
+            if start.normalize:
+                sentence = tts_service.prepare_text(provider, voice_name, sentence)
+                if not sentence:
+                    continue
+            billed = billable(raw, sentence)
+            credits = quota.cost({provider: billed}) if session.access_type == "paid" else 0
+            submitted += credits
+            if submitted > session.credits:
+                # Top the hold up a block at a time, or by just what's missing near the end of the balance
+                block = quota.cost({provider: STREAM_HOLD_CHARACTERS})
+                shortfall = submitted - session.credits
+                try:
+                    quota.extend(db, session, max(block, shortfall))
+                except quota.QuotaExceeded:
+                    quota.extend(db, session, shortfall)
+            pending.put_nowait((sentence, asyncio.create_task(synthesize(sentence)), billed, credits))
+    
+    sender_task = asyncio.create_task(sender())
+    try:
+        while True:
+            message = await receive_message(websocket)
+            if message is None:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            kind = message.get("type")
+            if kind == "text":
+                chunk = str(message.get("text", ""))
+                characters += len(chunk)
+                if characters > MAX_TEXT_LENGTH:
+                    await fail("Session text limit exceeded")
+                    break
+                submit(splitter.feed(chunk))
+            elif kind == "end":
+                submit(splitter.flush())
+                pending.put_nowait(None)
+                sent = await sender_task
+                if sent:
+                    tts_generations.labels(tool=TOOL_NAME, provider=provider, voice_id=voice_name).inc()
+                await websocket.send_json({"type": "done", "sentences": sent})
+                await websocket.close()
+                return
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind}"})
+    except quota.QuotaExceeded as e:
+        await fail(e.detail)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if not sender_task.done():
+            sender_task.cancel()
+        while not pending.empty():
+            item = pending.get_nowait()
+            if item is not None:
+                item[1].cancel()
+        # One charge for what was delivered, however the session ended; the rest of the hold is dropped
+        quota.settle(db, session, delivered)
+        for billed, filename in generations:
+            record_generation(
+                db,
+                device_id=device,
+                voice_id=f"{provider}:{voice_name}",
+                provider=provider,
+                text_length=billed,
+                audio_url=f"/audio/{filename}",
+            )
+        db.commit()
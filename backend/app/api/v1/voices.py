@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import List, Optional
+from app.compression import choose_encoding
+from app.services.edge_voices import edge_voices
 from app.services.tts_service import tts_service
 
 router = APIRouter()
@@ -33,56 +35,18 @@ async def list_voices(
     """List all available voices with optional filtering"""
     voices = []
     
-    # OpenAI voices
-    for voice_id, info in tts_service.OPENAI_VOICES.items():
-        voices.append(Voice(
-            id=f"openai:{voice_id}",
-            name=info["name"],
-            provider="OpenAI",
-            gender=info["gender"],
-            language="English",
-            locale="en-US",
-            description=info["description"],
-            available=True,
-        ))
-    
-    # Edge TTS voices (static list for common ones)
-    edge_voices_static = [
-        {"id": "en-US-GuyNeural", "name": "Guy", "gender": "male", "language": "English", "locale": "en-US"},
-        {"id": "en-US-JennyNeural", "name": "Jenny", "gender": "female", "language": "English", "locale": "en-US"},
-        {"id": "en-US-AriaNeural", "name": "Aria", "gender": "female", "language": "English", "locale": "en-US"},
-        {"id": "en-GB-SoniaNeural", "name": "Sonia", "gender": "female", "language": "English", "locale": "en-GB"},
-        {"id": "en-GB-RyanNeural", "name": "Ryan", "gender": "male", "language": "English", "locale": "en-GB"},
-        {"id": "zh-CN-XiaoxiaoNeural", "name": "Xiaoxiao", "gender": "female", "language": "Chinese", "locale": "zh-CN"},
-        {"id": "zh-CN-YunxiNeural", "name": "Yunxi", "gender": "male", "language": "Chinese", "locale": "zh-CN"},
-        {"id": "ja-JP-NanamiNeural", "name": "Nanami", "gender": "female", "language": "Japanese", "locale": "ja-JP"},
-        {"id": "ja-JP-KeitaNeural", "name": "Keita", "gender": "male", "language": "Japanese", "locale": "ja-JP"},
-        {"id": "ko-KR-SunHiNeural", "name": "Sun-Hi", "gender": "female", "language": "Korean", "locale": "ko-KR"},
-        {"id": "ko-KR-InJoonNeural", "name": "InJoon", "gender": "male", "language": "Korean", "locale": "ko-KR"},
-        {"id": "de-DE-KatjaNeural", "name": "Katja", "gender": "female", "language": "German", "locale": "de-DE"},
-        {"id": "de-DE-ConradNeural", "name": "Conrad", "gender": "male", "language": "German", "locale": "de-DE"},
-        {"id": "fr-FR-DeniseNeural", "name": "Denise", "gender": "female", "language": "French", "locale": "fr-FR"},
-        {"id": "fr-FR-HenriNeural", "name": "Henri", "gender": "male", "language": "French", "locale": "fr-FR"},
-        {"id": "es-ES-ElviraNeural", "name": "Elvira", "gender": "female", "language": "Spanish", "locale": "es-ES"},
-        {"id": "es-ES-AlvaroNeural", "name": "Alvaro", "gender": "male", "language": "Spanish", "locale": "es-ES"},
-        {"id": "pt-BR-FranciscaNeural", "name": "Francisca", "gender": "female", "language": "Portuguese", "locale": "pt-BR"},
-        {"id": "it-IT-ElsaNeural", "name": "Elsa", "gender": "female", "language": "Italian", "locale": "it-IT"},
-        {"id": "ru-RU-SvetlanaNeural", "name": "Svetlana", "gender": "female", "language": "Russian", "locale": "ru-RU"},
-        {"id": "hi-IN-SwaraNeural", "name": "Swara", "gender": "female", "language": "Hindi", "locale": "hi-IN"},
-        {"id": "ar-SA-ZariyahNeural", "name": "Zariyah", "gender": "female", "language": "Arabic", "locale": "ar-SA"},
-    ]
-    
-    for ev in edge_voices_static:
-        voices.append(Voice(
-            id=f"edge:{ev['id']}",
-            name=ev["name"],
-            provider="Edge TTS",
-            gender=ev["gender"],
-            language=ev["language"],
-            locale=ev["locale"],
-            description=f"{ev['language']} voice",
-            available=True,
-        ))
+    for backend in tts_service.providers.all():
+        for info in backend.voices():
+            voices.append(Voice(
+                id=f"{backend.name}:{info.voice}",
+                name=info.name,
+                provider=backend.display_name,
+                gender=info.gender,
+                language=info.language,
+                locale=info.locale,
+                description=info.description,
+                available=True,
+            ))
     
     # Apply filters
     if provider:
@@ -105,10 +69,30 @@ async def list_voices(
 
 
 @router.get("/all")
-async def get_all_edge_voices():
-    """Get all Edge TTS voices (dynamic fetch)"""
-    voices = await tts_service.get_edge_voices()
-    return {
-        "voices": voices,
-        "total": len(voices),
-    }
+async def get_all_edge_voices(
+    request: Request,
+    locale: Optional[str] = None,
+    gender: Optional[str] = None,
+):
+    """Get all Edge TTS voices from the cached snapshot"""
+    await edge_voices.ensure_fresh()
+    if locale or gender:
+        voices = edge_voices.filter(locale=locale, gender=gender)
+        return {
+            "voices": voices,
+            "total": len(voices),
+        }
+
+    # The unfiltered list is serialized (and compressed) once per snapshot
+    # change; the Content-Encoding keeps the middleware from compressing it again
+    headers = {"ETag": edge_voices.etag, "Cache-Control": "public, max-age=300", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == edge_voices.etag:
+        return Response(status_code=304, headers=headers)
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    if encoding == "br" and edge_voices.body_brotli is not None:
+        headers["Content-Encoding"] = "br"
+        return Response(edge_voices.body_brotli, media_type="application/json", headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = "gzip"
+        return Response(edge_voices.body_gzip, media_type="application/json", headers=headers)
+    return Response(edge_voices.body, media_type="application/json", headers=headers)
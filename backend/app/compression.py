@@ -0,0 +1,116 @@
+"""Response compression for API routes.
+
+Buffered JSON and text responses of at least ``COMPRESSION_MIN_BYTES`` are
+compressed with Brotli when the client accepts it (and the ``brotli``
+package is installed), otherwise gzip. Left alone:
+
+- ``/audio``: already compressed, and served with Range support
+- streamed bodies (WebSocket frames, ZIPs, chapter audio)
+- responses that already carry a Content-Encoding, like the pre-gzipped
+  ``/voices/all``
+- other content types, partial content and tiny bodies
+"""
+import gzip
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+EXCLUDED_PREFIXES = ("/audio",)
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+# Statuses whose body must not be re-encoded (or that have none)
+SKIP_STATUSES = {204, 206, 304}
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """``"br"``, ``"gzip"`` or None for an Accept-Encoding header, Brotli first"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """Compress whole-body responses in the encoding the client prefers"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        excluded_prefixes: Tuple[str, ...] = EXCLUDED_PREFIXES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.excluded_prefixes = excluded_prefixes
+
+    def _compressible(self, start: Message, body: bytes, more_body: bool) -> bool:
+        if more_body or len(body) < self.minimum_size or start["status"] in SKIP_STATUSES:
+            return False
+        headers = Headers(raw=start["headers"])
+        if "content-encoding" in headers:
+            return False
+        return headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(self.excluded_prefixes):
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+
+        async def send_compressed(message: Message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the first body shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            initial, start = start, None
+            body = message.get("body", b"")
+            if not self._compressible(initial, body, message.get("more_body", False)):
+                await send(initial)
+                await send(message)
+                return
+            body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            headers = MutableHeaders(raw=initial["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(initial)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -12,17 +12,113 @@ class Settings(BaseSettings):
     LLM_PROXY_URL: str = "https://llm-proxy.densematrix.ai"
     LLM_PROXY_KEY: str = ""
     
+    # Offline Piper voices (enabled when set); workers default to one per core
+    LOCAL_TTS_MODEL_DIR: str = ""
+    LOCAL_TTS_WORKERS: int = 0
+    
+    # "live", or "fake" to answer every provider offline with silent MP3 (no
+    # keys or network; local runs, CI and benchmarks). Fake latency is seconds
+    # ("0.05", "uniform:0.02:0.2", "lognormal:0.1:0.5"), audio is written in
+    # chunks of FAKE_TTS_CHUNK_MS spaced FAKE_TTS_CHUNK_INTERVAL_MS apart, and
+    # faults are chances per call ("503:0.05,empty:0.01"), seeded for repeatability
+    TTS_PROVIDER_MODE: str = "live"
+    FAKE_TTS_LATENCY: str = "0"
+    FAKE_TTS_CHUNK_MS: int = 0
+    FAKE_TTS_CHUNK_INTERVAL_MS: float = 0.0
+    FAKE_TTS_FAULTS: str = ""
+    FAKE_TTS_SEED: int = 0
+    
+    # Voice used when a provider fails, e.g. "local:en_US-lessac-medium"
+    TTS_FALLBACK_VOICE: str = ""
+    
+    # Keys /audio file names so URLs can't be derived from the text; when
+    # unset, a random secret is generated at the path and reused
+    AUDIO_URL_SECRET: str = ""
+    AUDIO_URL_SECRET_PATH: str = "data/audio_url_secret"
+    
+    # Processes for loudness normalization / trimming (0: up to 4, one per core)
+    AUDIO_POSTPROCESS_WORKERS: int = 0
+    
+    # Music beds: shipped WAV library, stored uploads and their size cap
+    MUSIC_LIBRARY_DIR: str = "music"
+    MUSIC_UPLOAD_DIR: str = "data/music"
+    MUSIC_MAX_UPLOAD_MB: int = 30
+    # Uploads are cut to this many seconds once decoded; per-device quota
+    MUSIC_MAX_SECONDS: int = 600
+    MUSIC_MAX_UPLOADS_PER_DEVICE: int = 20
+    MUSIC_MAX_DEVICE_MB: int = 500
+    
+    # Document uploads: size cap, characters per chapter job and per document
+    DOCUMENT_MAX_UPLOAD_MB: int = 50
+    DOCUMENT_CHAPTER_MAX_CHARS: int = 20000
+    DOCUMENT_MAX_CHARACTERS: int = 500000
+    
+    # Relative share of provider slots under load (JSON: paid, free_trial, preview)
+    TTS_PRIORITY_WEIGHTS: str = '{"paid": 8, "free_trial": 3, "preview": 1}'
+    
+    # Cache warming: re-render the top N requests per voice from this many days
+    # of history, at most CACHE_WARM_RATE renders a second, on startup and/or
+    # daily in an off-peak UTC window such as "2-5" (N of 0 disables it all)
+    CACHE_WARM_TOP_N: int = 20
+    CACHE_WARM_WINDOW_DAYS: int = 7
+    CACHE_WARM_RATE: float = 0.5
+    CACHE_WARM_ON_STARTUP: bool = True
+    CACHE_WARM_HOURS: str = ""
+    
+    # Edge voice list snapshot; refreshed in the background once this old
+    EDGE_VOICE_SNAPSHOT_PATH: str = "data/edge_voices.json.gz"
+    EDGE_VOICE_MAX_AGE_SECONDS: int = 24 * 3600
+    
+    # Response compression: smallest body compressed, gzip level, Brotli quality
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
     # Database
     DATABASE_URL: str = "sqlite:///./app.db"
+    # Connection pool (server databases; file-backed SQLite uses the size too)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # SQLite connect pragmas
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
     
     # Creem Payment
     CREEM_API_KEY: str = ""
     CREEM_WEBHOOK_SECRET: str = ""
     CREEM_PRODUCT_IDS: str = "{}"  # JSON string
     
+    # Logging ("text" or "json")
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"
+    
+    # Tracing: "" (spans not exported), "log" or "memory"
+    TRACE_EXPORTER: str = ""
+    TRACE_SAMPLE_RATE: float = 1.0
+    
+    # Credit holds of requests that never settled (worker killed) are handed
+    # back once this old; checked at startup and every CREDIT_HOLD_SWEEP_SECONDS
+    CREDIT_HOLD_LEASE_SECONDS: int = 3600
+    CREDIT_HOLD_SWEEP_SECONDS: int = 300
+    
+    # Shutdown waits this long for in-flight requests before cancelling them;
+    # runs after uvicorn's --timeout-graceful-shutdown (see the Dockerfile)
+    SHUTDOWN_DRAIN_SECONDS: float = 5.0
+    
+    # Log a stack when a callback blocks the event loop this long (0 disables)
+    LOOP_LAG_THRESHOLD_MS: int = 100
+    
     # CORS
     CORS_ORIGINS: str = "*"
     
+    # Admin endpoints (disabled when empty)
+    ADMIN_API_KEY: str = ""
+    
     class Config:
         env_file = ".env"
 
@@ -1,27 +1,189 @@
-from sqlalchemy import create_engine
+import hashlib
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, inspect, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.config import get_settings
+from sqlalchemy.pool import QueuePool
+from app.config import Settings, get_settings
+from app.metrics import db_pool_checkout_wait, db_pool_checkout_timeouts, TOOL_NAME
+from app.tracing import tracer
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-)
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            db_pool_checkout_timeouts.labels(tool=TOOL_NAME).inc()
+            raise
+        finally:
+            db_pool_checkout_wait.labels(tool=TOOL_NAME).observe(time.perf_counter() - start)
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(database_url: str, config: Settings = settings) -> dict:
+    """``create_engine`` keyword arguments for the database's profile.
+
+    File-backed SQLite gets a timed pool sized like a server's (SQLite
+    serializes writers itself; the busy timeout makes them queue instead of
+    failing). In-memory SQLite keeps SQLAlchemy's default single-connection
+    pool. Server databases get a sized pool with pre-ping and recycling, so
+    connections dropped by the server or a proxy are replaced transparently.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        options = {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            },
+        }
+        if not _is_memory_sqlite(url):
+            options.update(
+                poolclass=TimedQueuePool,
+                pool_size=config.DB_POOL_SIZE,
+                max_overflow=config.DB_MAX_OVERFLOW,
+                pool_timeout=config.DB_POOL_TIMEOUT,
+            )
+        return options
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def sqlite_pragmas(config: Settings = settings) -> list[str]:
+    return [
+        f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}",
+    ]
+
+
+def make_engine(database_url: str, config: Settings = settings):
+    """Engine tuned per database profile; see ``engine_options``"""
+    engine = create_engine(database_url, **engine_options(database_url, config))
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and not _is_memory_sqlite(url):
+        pragmas = sqlite_pragmas(config)
+
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            # WAL lets readers run alongside the writer; NORMAL syncs at
+            # checkpoints instead of every commit, which is safe under WAL
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return engine
+
+
+engine = make_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 
 def get_db():
+    # Not made current: FastAPI may run this generator's halves in different contexts
+    session_span = tracer.start_span("db.session")
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+        session_span.end()
 
 
 def create_tables():
     from app import models  # noqa
     Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables, so add indexes introduced since
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    add_missing_columns(engine)
+
+
+def add_missing_columns(bind):
+    """ALTER in columns added to existing tables, with their scalar default.
+
+    A column may name a SQL expression in ``info["backfill"]`` to populate
+    existing rows once it's added.
+    """
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT {column.default.arg!r}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                if column.info.get("backfill"):
+                    conn.execute(text(f"UPDATE {table.name} SET {column.name} = {column.info['backfill']}"))
+
+
+def schema_fingerprint() -> str:
+    """Hash of every table, column and index the models declare"""
+    from app import models  # noqa
+    parts = []
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        if table.name == models.SchemaVersion.__tablename__:
+            continue
+        columns = ",".join(f"{c.name}:{c.type}:{c.nullable}" for c in table.columns)
+        indexes = ",".join(sorted(
+            f"{i.name}:{'+'.join(c.name for c in i.columns)}" for i in table.indexes
+        ))
+        parts.append(f"{table.name}({columns})[{indexes}]")
+    return hashlib.sha256(";".join(parts).encode()).hexdigest()
+
+
+def ensure_schema() -> bool:
+    """Create tables and indexes only when the model schema has changed.
+
+    Reads the stored fingerprint in one query and skips all DDL when it
+    matches, which keeps cold starts fast. Returns True if DDL ran.
+    """
+    from app.models import SchemaVersion
+    fingerprint = schema_fingerprint()
+    try:
+        with engine.connect() as conn:
+            current = conn.execute(
+                select(SchemaVersion.fingerprint).where(SchemaVersion.id == 1)
+            ).scalar()
+    except SQLAlchemyError:
+        current = None
+    if current == fingerprint:
+        return False
+    
+    create_tables()
+    db = SessionLocal()
+    try:
+        db.merge(SchemaVersion(id=1, fingerprint=fingerprint, applied_at=datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+    return True
@@ -0,0 +1,53 @@
+import json
+import logging
+from datetime import datetime, timezone
+
+from app.tracing import TraceLogFilter
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def _fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Log lines that keep ``extra=`` fields.
+
+    ``json`` emits one JSON object per line for log shippers; otherwise the
+    fields are appended to the message as ``key=value`` pairs.
+    """
+
+    def __init__(self, as_json: bool = False):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.as_json = as_json
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = _fields(record)
+        if not self.as_json:
+            line = super().format(record)
+            if fields:
+                line += " " + " ".join(f"{k}={v!r}" for k, v in fields.items())
+            return line
+
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **fields,
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level: str = "INFO", log_format: str = "text"):
+    """Attach a structured handler to the ``app`` logger hierarchy"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter(as_json=log_format == "json"))
+    handler.addFilter(TraceLogFilter())
+    logger = logging.getLogger("app")
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
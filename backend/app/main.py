@@ -1,26 +1,70 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import os
 
+from app.compression import CompressionMiddleware
 from app.config import get_settings
-from app.api.v1 import tts, voices, payment, tokens
-from app.database import create_tables
+from app.api.v1 import tts, voices, payment, tokens, admin, lexicon, documents, music
+from app.api.v1.documents import document_jobs
+from app.database import engine, ensure_schema
+from app.logging_config import configure_logging
+from app.tracing import TracingMiddleware, instrument_engine, tracer
 from app.metrics import metrics_router
+from app.profiling import loop_monitor
+from app.readiness import readiness, warm_up
+from app.shutdown import DrainMiddleware, drain, flush_telemetry
+from app.services.audio_cache import STALE_PARTIAL_SECONDS, audio_cache
+from app.services.cache_warmer import run_warmer
+from app.services.edge_voices import edge_voices
+from app.services.http_client import close_http_client
+from app.services.quota import run_hold_sweeper
+from app.services.tts_service import tts_service
 
 settings = get_settings()
+configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+tracer.configure(settings.TRACE_EXPORTER, settings.TRACE_SAMPLE_RATE)
+instrument_engine(engine)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    create_tables()
-    # Create audio directory
+    # Startup: DDL only runs when the schema fingerprint changed
+    ensure_schema()
+    # Create audio directory, clearing scratch files from killed workers
     os.makedirs("audio_output", exist_ok=True)
+    audio_cache.remove_partials(max_age=STALE_PARTIAL_SECONDS)
+    drain.reset()
+    warm_task = asyncio.create_task(warm_up())
+    # Popular requests are re-rendered in the background at a bounded rate
+    cache_warm_task = asyncio.create_task(run_warmer(tts_service))
+    # Holds left by killed workers go back to their devices once their lease ends
+    hold_sweep_task = asyncio.create_task(run_hold_sweeper())
+    if settings.LOOP_LAG_THRESHOLD_MS:
+        loop_monitor.threshold = settings.LOOP_LAG_THRESHOLD_MS / 1000
+        loop_monitor.start()
     yield
-    # Shutdown
-    pass
+    # Shutdown: turn new work away, let in-flight requests finish until the
+    # deadline, then cancel the rest (their credit holds are released)
+    cache_warm_task.cancel()
+    hold_sweep_task.cancel()
+    await drain.drain(settings.SHUTDOWN_DRAIN_SECONDS)
+    # Background narrations charge the chapters they finished and release the rest
+    await document_jobs.cancel()
+    await tts_service.cancel_inflight()
+    warm_task.cancel()
+    await loop_monitor.stop()
+    readiness.reset()
+    await close_http_client()
+    tts_service.close()
+    edge_voices.close()
+    audio_cache.remove_partials()
+    # Closing pooled connections checkpoints SQLite's WAL into the database file
+    engine.dispose()
+    flush_telemetry()
 
 
 app = FastAPI(
@@ -28,8 +72,20 @@ app = FastAPI(
     description="Multi-provider AI voiceover platform",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# Innermost (added first): compresses what the routes return
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_BYTES,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+# Requests in flight, for the shutdown drain; inside CORS so a 503 is readable
+app.add_middleware(DrainMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -37,16 +93,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "X-Export-Next-Cursor"],
 )
 
+# Root span per request; added last so it wraps everything else
+app.add_middleware(TracingMiddleware)
+
 # Static files for generated audio
-app.mount("/audio", StaticFiles(directory="audio_output"), name="audio")
+# (the directory is created in lifespan, so don't require it at import time)
+app.mount("/audio", StaticFiles(directory="audio_output", check_dir=False), name="audio")
 
 # Routes
 app.include_router(tts.router, prefix="/api/v1/tts", tags=["TTS"])
+app.include_router(documents.router, prefix="/api/v1/documents", tags=["Documents"])
+app.include_router(music.router, prefix="/api/v1/music", tags=["Music"])
 app.include_router(voices.router, prefix="/api/v1/voices", tags=["Voices"])
 app.include_router(payment.router, prefix="/api/v1/payment", tags=["Payment"])
 app.include_router(tokens.router, prefix="/api/v1/tokens", tags=["Tokens"])
+app.include_router(lexicon.router, prefix="/api/v1/lexicon", tags=["Lexicon"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["Admin"])
 app.include_router(metrics_router, tags=["Metrics"])
 
 
@@ -55,6 +120,22 @@ async def health_check():
     return {"status": "healthy", "service": settings.APP_NAME}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until pools and provider imports are warm, and while draining"""
+    if drain.draining:
+        return ORJSONResponse(status_code=503, content={"status": "draining", "in_flight": drain.in_flight})
+    status_code = 200 if readiness.ready else 503
+    return ORJSONResponse(
+        status_code=status_code,
+        content={
+            "status": "ready" if readiness.ready else "starting",
+            "checks": readiness.checks,
+            "details": readiness.details,
+        },
+    )
+
+
 @app.get("/")
 async def root():
     return {
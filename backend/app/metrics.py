@@ -56,6 +56,97 @@ tts_characters_processed = Counter(
     ["tool", "provider"]
 )
 
+tts_cache_lookups = Counter(
+    "tts_cache_lookups_total",
+    "Audio cache lookups",
+    ["tool", "provider", "result"]
+)
+
+tts_coalesced_requests = Counter(
+    "tts_coalesced_requests_total",
+    "Requests that joined an identical in-flight synthesis instead of starting their own",
+    ["tool", "provider"]
+)
+
+tts_fallbacks = Counter(
+    "tts_fallbacks_total",
+    "Generations served by the fallback voice after a provider failed",
+    ["tool", "provider"]
+)
+
+tts_upstream_retries = Counter(
+    "tts_upstream_retries_total",
+    "Upstream TTS retries (retried) and calls that gave up (exhausted, budget, retry_after)",
+    ["tool", "provider", "result"]
+)
+
+tts_warm_set_lookups = Counter(
+    "tts_warm_set_lookups_total",
+    "Audio cache lookups for files in the cache warmer's warm set",
+    ["tool", "result"]
+)
+
+cache_warm_requests = Counter(
+    "cache_warm_requests_total",
+    "Popular requests visited by the cache warmer (cached, restored, failed, unknown)",
+    ["tool", "result"]
+)
+
+tts_queue_wait = Histogram(
+    "tts_queue_wait_seconds",
+    "Time spent waiting for a provider concurrency slot, per priority class",
+    ["tool", "provider", "priority"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+tts_priority_latency = Histogram(
+    "tts_priority_latency_seconds",
+    "Synthesis latency as seen by requests, per priority class",
+    ["tool", "priority"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+# Database pool
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for (or opening) a pooled database connection",
+    ["tool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
+
+db_pool_checkout_timeouts = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Pool checkouts that gave up after DB_POOL_TIMEOUT",
+    ["tool"]
+)
+
+# Event loop health
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke a sleeping heartbeat",
+    ["tool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+event_loop_slow_callbacks = Counter(
+    "event_loop_slow_callbacks_total",
+    "Times a callback blocked the event loop longer than the lag threshold",
+    ["tool"]
+)
+
+# Shutdown
+requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "Requests being served (what a shutdown drain waits for)",
+    ["tool"]
+)
+
+shutdown_cancelled_requests = Counter(
+    "shutdown_cancelled_requests_total",
+    "Requests still running at the drain deadline and cancelled",
+    ["tool"]
+)
+
 # SEO Metrics
 page_views = Counter(
     "page_views_total",
@@ -1,21 +1,52 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Index, UniqueConstraint
 from datetime import datetime
 from app.database import Base
 
+# A token buys this many standard-tier characters (see app.services.quota)
+CHARACTERS_PER_TOKEN = 1000
+
 
 class GenerationToken(Base):
+    """A device's token balance.
+
+    Usage is metered in credits (standard-tier characters): ``used_credits``
+    is settled usage and ``reserved_credits`` is held by requests still
+    synthesizing (one ``CreditHold`` row each). ``used_tokens`` mirrors ``used_credits`` rounded up.
+    """
     __tablename__ = "generation_tokens"
     
     id = Column(Integer, primary_key=True, index=True)
     device_id = Column(String, index=True, nullable=False)
     total_tokens = Column(Integer, default=0)
     used_tokens = Column(Integer, default=0)
+    # Rows from before per-character billing carry their used tokens over
+    used_credits = Column(Integer, default=0, nullable=False, info={"backfill": f"used_tokens * {CHARACTERS_PER_TOKEN}"})
+    reserved_credits = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     @property
     def remaining_tokens(self):
         return self.total_tokens - self.used_tokens
+    
+    @property
+    def remaining_credits(self):
+        return self.total_tokens * CHARACTERS_PER_TOKEN - (self.used_credits or 0) - (self.reserved_credits or 0)
+
+
+class CreditHold(Base):
+    """Credits one in-flight request holds in ``GenerationToken.reserved_credits``.
+
+    A hold past ``expires_at`` belongs to a request whose worker died before
+    settling; ``quota.release_expired_holds`` hands its credits back.
+    """
+    __tablename__ = "credit_holds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String, nullable=False)
+    credits = Column(Integer, default=0, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class PaymentTransaction(Base):
@@ -52,4 +83,148 @@ class VoiceGeneration(Base):
     text_length = Column(Integer, nullable=False)
     audio_duration_seconds = Column(Float, nullable=True)
     audio_url = Column(String, nullable=True)
+    # Stem of the cached audio's filename; the cache warmer counts these
+    request_hash = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_voice_generations_device_created", "device_id", "created_at"),
+    )
+
+
+class CachedRequest(Base):
+    """What a cached audio file was rendered from, so it can be rendered again.
+
+    Keyed by the request hash (the cache filename's stem). Recorded for
+    single-voice generations without post-processing; ``text`` is the
+    prepared text that was synthesized. ``created_at`` moves up each time
+    the request is made again; the warmer deletes rows older than
+    ``CACHE_WARM_WINDOW_DAYS``.
+    """
+    __tablename__ = "cached_requests"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    request_hash = Column(String, unique=True, nullable=False)
+    provider = Column(String, nullable=False)
+    voice = Column(String, nullable=False)
+    text = Column(String, nullable=False)
+    speed = Column(Float, nullable=False, default=1.0)
+    audio_format = Column(String, nullable=False)
+    bitrate = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UsageRollup(Base):
+    """Pre-aggregated generation counts, maintained as generations are written.
+
+    ``period`` is ``hour``, ``day`` or ``total`` (``bucket_start`` is the epoch
+    for totals). ``device_id`` is ``*`` for rows aggregated over all devices.
+    """
+    __tablename__ = "usage_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    provider = Column(String, nullable=False)
+    voice_id = Column(String, nullable=False)
+    device_id = Column(String, nullable=False)
+    generations = Column(Integer, default=0)
+    characters = Column(Integer, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint(
+            "period", "device_id", "bucket_start", "provider", "voice_id",
+            name="uq_usage_rollups_bucket",
+        ),
+    )
+
+
+class LexiconEntry(Base):
+    """A respelling substituted for ``term`` before synthesis.
+
+    ``device_id`` is ``*`` for global entries; a device's entries override
+    global ones for the same term. Terms match case-insensitively.
+    """
+    __tablename__ = "lexicon_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String, nullable=False)
+    term = Column(String, nullable=False)
+    replacement = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("device_id", "term", name="uq_lexicon_entries_term"),
+    )
+
+
+class MusicUpload(Base):
+    """A music bed a device uploaded.
+
+    Files are stored once per content (``ident``, the ``upload:<ident>``
+    music id), so devices uploading the same track share it; each device
+    only sees its own rows. ``size`` is the stored WAV's bytes.
+    """
+    __tablename__ = "music_uploads"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String, nullable=False)
+    ident = Column(String, nullable=False, index=True)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("device_id", "ident", name="uq_music_uploads_device"),
+    )
+
+
+class DocumentJob(Base):
+    """A document being narrated in the background, polled by its device.
+
+    ``status`` is ``processing``, ``completed`` (at least one chapter was
+    spoken) or ``failed``; each chapter has a ``DocumentChapter`` row.
+    """
+    __tablename__ = "document_jobs"
+    
+    id = Column(String, primary_key=True)
+    device_id = Column(String, index=True, nullable=False)
+    document = Column(String, nullable=False)
+    document_type = Column(String, nullable=False)
+    provider = Column(String, nullable=False)
+    voice_id = Column(String, nullable=False)
+    format = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="processing")
+    characters_used = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DocumentChapter(Base):
+    """One chapter of a ``DocumentJob``: ``pending``, ``completed`` or ``failed``.
+
+    ``characters`` is what's billed for it (the shorter of the extracted
+    and the normalized text, like ``/tts/generate``).
+    """
+    __tablename__ = "document_chapters"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, nullable=False)
+    index = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    characters = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    audio_url = Column(String, nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint("job_id", "index", name="uq_document_chapters_index"),
+    )
+
+
+class SchemaVersion(Base):
+    """Fingerprint of the schema last applied, so startup can skip DDL"""
+    __tablename__ = "schema_version"
+    
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
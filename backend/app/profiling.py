@@ -0,0 +1,155 @@
+"""Live diagnosis: a sampling profiler and an event-loop lag monitor.
+
+The profiler reads every thread's stack from ``sys._current_frames`` at a
+fixed interval from a background thread, so it needs no restart or
+instrumentation and profiles the event loop while the loop keeps serving.
+Output is the collapsed-stack format ``flamegraph.pl`` and speedscope read:
+one ``frame;frame;frame count`` line per distinct stack, root first.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.metrics import event_loop_lag, event_loop_slow_callbacks, TOOL_NAME
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILE_SECONDS = 60
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is already running"""
+
+
+_profile_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> List[str]:
+    """Frame labels from the outermost call to ``frame``"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def _thread_names(loop_thread_id: Optional[int]) -> Dict[int, str]:
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    if loop_thread_id in names:
+        names[loop_thread_id] = "event-loop"
+    return names
+
+
+def sample_stacks(
+    seconds: float,
+    interval: float = 0.005,
+    loop_thread_id: Optional[int] = None,
+) -> Counter:
+    """Sample every thread's stack for ``seconds``; counts per collapsed stack.
+
+    Blocking; run it in a thread. Idle threads parked in a wait are sampled
+    too, which flamegraphs show as wide ``wait``/``select`` towers.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+        while time.monotonic() < deadline:
+            names = _thread_names(loop_thread_id)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                thread = names.get(thread_id, f"thread-{thread_id}")
+                stacks[";".join([thread] + collapse_stack(frame))] += 1
+            time.sleep(interval)
+        return stacks
+    finally:
+        _profile_lock.release()
+
+
+def format_collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag and reports callbacks that block the loop.
+
+    A heartbeat coroutine sleeps ``interval`` and records how late it woke
+    into ``event_loop_lag_seconds``. A watchdog thread checks the heartbeat;
+    when the loop has been stuck for longer than ``threshold`` it counts a
+    slow callback and logs the loop thread's stack, showing what blocked it.
+    """
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start monitoring the running loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            event_loop_lag.labels(tool=TOOL_NAME).observe(max(0.0, now - before - self.interval))
+            self._last_beat = now
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.threshold or beat == reported_beat:
+                continue
+            # One report per stall; the heartbeat moves on once the loop is free
+            reported_beat = beat
+            event_loop_slow_callbacks.labels(tool=TOOL_NAME).inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            logger.warning(
+                "event loop blocked",
+                extra={
+                    "blocked_ms": round(stalled * 1000, 1),
+                    "stack": ";".join(collapse_stack(frame)) if frame is not None else None,
+                },
+            )
+
+
+loop_monitor = LoopLagMonitor()
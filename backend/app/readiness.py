@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import Dict, Iterable
+
+from sqlalchemy import text
+
+from app.config import get_settings
+from app.database import engine
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Backoff between attempts to reach the upstream while warming the HTTP pool
+HTTP_WARM_MAX_DELAY = 30.0
+
+
+class Readiness:
+    """Tracks warm-up checks; the app is ready once all of them pass.
+
+    ``details`` are reported alongside but never gate readiness: one
+    provider's upstream being down shouldn't take the others (or the
+    fallback voice) out of rotation.
+    """
+
+    def __init__(self, checks: Iterable[str], details: Iterable[str] = ()):
+        self.checks: Dict[str, bool] = {name: False for name in checks}
+        self.details: Dict[str, bool] = {name: False for name in details}
+
+    def mark(self, name: str, ok: bool = True):
+        if name in self.details:
+            self.details[name] = ok
+        else:
+            self.checks[name] = ok
+
+    def reset(self):
+        for states in (self.checks, self.details):
+            for name in states:
+                states[name] = False
+
+    @property
+    def ready(self) -> bool:
+        return all(self.checks.values())
+
+
+readiness = Readiness(["database", "providers", "http_pool"], details=["upstream"])
+
+
+def _ping_database():
+    # Opens a pooled connection so the first request doesn't pay for it
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def _warm_http_pool():
+    """Open the HTTP pool, then connect it to the OpenAI upstream in the background.
+
+    The pool being open is the readiness check. The upstream connection is
+    the non-fatal ``upstream`` detail, retried with backoff until it
+    connects. Any HTTP response counts: what's warmed is the connection and
+    its TLS session, which the first synthesis then reuses.
+    """
+    import httpx
+    from app.services.http_client import get_http_client
+
+    client = get_http_client()
+    readiness.mark("http_pool", not client.is_closed)
+    if settings.TTS_PROVIDER_MODE == "fake" or not settings.LLM_PROXY_KEY:
+        # Nothing upstream to reach
+        readiness.mark("upstream")
+        return
+    delay = 1.0
+    while True:
+        try:
+            await client.head(settings.LLM_PROXY_URL, timeout=5.0)
+            readiness.mark("upstream")
+            return
+        except httpx.HTTPError as e:
+            logger.warning("upstream connection warm-up failed", extra={"error": str(e), "retry_in": delay})
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, HTTP_WARM_MAX_DELAY)
+
+
+async def warm_up():
+    """Warm pools and lazily imported providers after startup.
+
+    Runs in the background so the server starts accepting connections (and
+    answering /health) immediately; /ready reports when this has finished.
+    """
+    from app.services.edge_voices import edge_voices
+    from app.services.tts_service import tts_service
+
+    try:
+        await asyncio.to_thread(_ping_database)
+        readiness.mark("database")
+    except Exception:
+        logger.exception("database warm-up failed")
+
+    try:
+        await asyncio.to_thread(tts_service.preload)
+        readiness.mark("providers")
+    except Exception:
+        logger.exception("provider warm-up failed")
+
+    try:
+        loaded = await asyncio.to_thread(edge_voices.load)
+        # Without a snapshot, Edge voices are only checked by shape; fetch one
+        # without holding up readiness (fake mode has no upstream to ask)
+        if (not loaded or edge_voices.stale) and settings.TTS_PROVIDER_MODE != "fake":
+            edge_voices.revalidate()
+    except Exception:
+        logger.exception("voice snapshot load failed")
+
+    await _warm_http_pool()
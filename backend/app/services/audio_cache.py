@@ -0,0 +1,142 @@
+import glob
+import hashlib
+import hmac
+import os
+import secrets
+import time
+import uuid
+from typing import Optional
+
+from app.config import get_settings
+from app.services.audio_formats import extension_for
+
+settings = get_settings()
+
+AUDIO_DIR = "audio_output"
+# Scratch files this old belong to a process that died before cleaning up
+STALE_PARTIAL_SECONDS = 3600
+
+
+def load_secret(secret: str, path: str) -> bytes:
+    """``secret``, or the one kept at ``path`` (created on first use, shared by workers)"""
+    if secret:
+        return secret.encode()
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    generated = secrets.token_hex(32).encode()
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another worker got there first
+        with open(path, "rb") as f:
+            return f.read()
+    with os.fdopen(fd, "wb") as f:
+        f.write(generated)
+    return generated
+
+
+class AudioCache:
+    """Content-addressed store for generated audio.
+
+    Entries are keyed by a hash of everything that affects the output, so an
+    identical request is served from disk instead of going upstream again.
+    Files (and so ``/audio`` URLs) are named with an HMAC of that key under
+    a server secret: knowing someone's text doesn't reveal their audio URL.
+    """
+
+    def __init__(self, directory: str = AUDIO_DIR, secret: Optional[bytes] = None):
+        self.directory = directory
+        self._secret = secret
+
+    @property
+    def secret(self) -> bytes:
+        if self._secret is None:
+            self._secret = load_secret(settings.AUDIO_URL_SECRET, settings.AUDIO_URL_SECRET_PATH)
+        return self._secret
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        voice: str,
+        text: str,
+        rate: str = "",
+        audio_format: str = "mp3",
+        bitrate: Optional[int] = None,
+        pitch: str = "",
+        post: str = "",
+    ) -> str:
+        """Hash every input that changes the rendered audio.
+
+        ``rate`` and ``pitch`` are the provider's own settings (``"1.00"`` for
+        OpenAI, ``"+0%"`` / ``"+0Hz"`` for Edge). ``post`` describes any
+        post-processing; it's left out when empty so existing keys still match.
+        """
+        parts = [
+            provider.lower(),
+            voice,
+            rate,
+            pitch,
+            audio_format,
+            str(bitrate or ""),
+            text,
+        ]
+        if post:
+            parts.append(post)
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def filename(self, key: str, audio_format: str) -> str:
+        name = hmac.new(self.secret, key.encode(), hashlib.sha256).hexdigest()[:32]
+        return f"{name}.{extension_for(audio_format)}"
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def get(self, key: str, audio_format: str) -> Optional[str]:
+        """Return the cached filename for ``key`` or None on a miss"""
+        filename = self.filename(key, audio_format)
+        if os.path.exists(self.path(filename)):
+            return filename
+        return None
+
+    def temp_path(self) -> str:
+        """Scratch path for an in-progress write; moved into place by ``commit``.
+
+        Named after the writing process so its leftovers can be found.
+        """
+        return self.path(f"{os.getpid()}-{uuid.uuid4()}.part")
+
+    def commit(self, temp_path: str, key: str, audio_format: str) -> str:
+        """Atomically publish a finished file under its cache name"""
+        filename = self.filename(key, audio_format)
+        os.replace(temp_path, self.path(filename))
+        return filename
+
+    def remove_partials(self, max_age: Optional[float] = None) -> int:
+        """Delete scratch files left by interrupted writes.
+
+        Without ``max_age`` only this process's files are removed (for
+        shutdown); with it, any process's files older than ``max_age``
+        seconds (for startup, when other workers may be writing).
+        """
+        if max_age is None:
+            paths = glob.glob(self.path(f"{os.getpid()}-*.part"))
+        else:
+            cutoff = time.time() - max_age
+            paths = [p for p in glob.glob(self.path("*.part")) if os.path.getmtime(p) < cutoff]
+        removed = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+audio_cache = AudioCache()
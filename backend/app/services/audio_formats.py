@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import mimetypes
+import shutil
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Output formats we can serve. ``bitrate`` is the default in kbps for lossy
+# codecs; lossless formats ignore any requested bitrate.
+AUDIO_FORMATS = {
+    "mp3": {
+        "media_type": "audio/mpeg",
+        "ext": "mp3",
+        "ffmpeg": ["-c:a", "libmp3lame", "-f", "mp3"],
+        "bitrate": 128,
+        "lossy": True,
+    },
+    "opus": {
+        "media_type": "audio/ogg",
+        "ext": "opus",
+        "ffmpeg": ["-c:a", "libopus", "-f", "ogg"],
+        "bitrate": 32,
+        "lossy": True,
+    },
+    "aac": {
+        "media_type": "audio/aac",
+        "ext": "aac",
+        "ffmpeg": ["-c:a", "aac", "-f", "adts"],
+        "bitrate": 64,
+        "lossy": True,
+    },
+    "wav": {
+        "media_type": "audio/wav",
+        "ext": "wav",
+        "ffmpeg": ["-c:a", "pcm_s16le", "-f", "wav"],
+        "bitrate": None,
+        "lossy": False,
+    },
+    "pcm": {
+        "media_type": "audio/pcm",
+        "ext": "pcm",
+        "ffmpeg": ["-c:a", "pcm_s16le", "-ar", "24000", "-ac", "1", "-f", "s16le"],
+        "bitrate": None,
+        "lossy": False,
+    },
+}
+
+DEFAULT_FORMAT = "mp3"
+
+# Media types clients send in ``Accept`` mapped to our format names. Only
+# types whose container we actually produce: Opus is served in Ogg and AAC as
+# ADTS, so audio/webm and audio/mp4 aren't aliases and get 406.
+MEDIA_TYPE_ALIASES = {
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+    "audio/aac": "aac",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/wave": "wav",
+    "audio/pcm": "pcm",
+    "audio/l16": "pcm",
+}
+
+# So StaticFiles serves /audio with the right Content-Type
+for _spec in AUDIO_FORMATS.values():
+    mimetypes.add_type(_spec["media_type"], f".{_spec['ext']}")
+
+MIN_BITRATE = 16
+MAX_BITRATE = 320
+
+
+class FormatNotAcceptable(ValueError):
+    """Raised when neither the body nor the Accept header name a format we serve"""
+
+
+def _parse_accept(accept: str) -> list[tuple[float, str]]:
+    """Return ``(q, media_type)`` pairs from an Accept header, best first"""
+    entries = []
+    for position, part in enumerate(accept.split(",")):
+        fields = [f.strip() for f in part.split(";")]
+        media_type = fields[0].lower()
+        if not media_type:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            if param.lower().startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        # Stable sort on q, earlier entries win ties
+        entries.append((-q, position, q, media_type))
+    entries.sort()
+    return [(q, media_type) for _, _, q, media_type in entries]
+
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """Pick the output format from the request body or the Accept header.
+
+    An explicit ``format`` in the body always wins. Otherwise only audio media
+    types in ``Accept`` are considered, so API clients sending
+    ``application/json`` still get the default format.
+    """
+    if requested:
+        fmt = requested.lower()
+        if fmt not in AUDIO_FORMATS:
+            raise FormatNotAcceptable(f"Unsupported format: {requested}")
+        return fmt
+
+    if not accept:
+        return DEFAULT_FORMAT
+
+    saw_audio = False
+    for q, media_type in _parse_accept(accept):
+        if media_type in ("*/*", "audio/*"):
+            if q > 0:
+                return DEFAULT_FORMAT
+            continue
+        if not media_type.startswith("audio/"):
+            continue
+        saw_audio = True
+        fmt = MEDIA_TYPE_ALIASES.get(media_type)
+        if fmt and q > 0:
+            return fmt
+
+    if saw_audio:
+        raise FormatNotAcceptable(f"None of the accepted media types are supported: {accept}")
+    return DEFAULT_FORMAT
+
+
+def normalize_bitrate(audio_format: str, bitrate: Optional[int]) -> Optional[int]:
+    """Validate a requested bitrate (kbps); lossless formats have none"""
+    if not AUDIO_FORMATS[audio_format]["lossy"]:
+        return None
+    if bitrate is None:
+        return None
+    if not MIN_BITRATE <= bitrate <= MAX_BITRATE:
+        raise ValueError(f"Bitrate must be between {MIN_BITRATE} and {MAX_BITRATE} kbps")
+    return bitrate
+
+
+def media_type_for(audio_format: str) -> str:
+    return AUDIO_FORMATS[audio_format]["media_type"]
+
+
+def extension_for(audio_format: str) -> str:
+    return AUDIO_FORMATS[audio_format]["ext"]
+
+
+def can_transcode() -> bool:
+    """Whether a local ffmpeg is available for format conversion"""
+    return shutil.which("ffmpeg") is not None
+
+
+def ffmpeg_args(
+    src_path: str,
+    dst_path: str,
+    audio_format: str,
+    bitrate: Optional[int] = None,
+    output_args: Sequence[str] = (),
+) -> list[str]:
+    """``output_args`` go before the codec's, e.g. ``-t`` to cap the duration"""
+    spec = AUDIO_FORMATS[audio_format]
+    args = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", src_path, "-vn", *output_args]
+    codec_args = list(spec["ffmpeg"])
+    if spec["lossy"]:
+        # Bitrate goes before the trailing "-f <muxer>" pair
+        codec_args[-2:-2] = ["-b:a", f"{bitrate or spec['bitrate']}k"]
+    return args + codec_args + [dst_path]
+
+
+async def transcode(
+    src_path: str,
+    dst_path: str,
+    audio_format: str,
+    bitrate: Optional[int] = None,
+    output_args: Sequence[str] = (),
+) -> bool:
+    """Transcode ``src_path`` into ``dst_path`` with ffmpeg without blocking the loop"""
+    if not can_transcode():
+        return False
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_args(src_path, dst_path, audio_format, bitrate, output_args),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        logger.error(
+            "transcode failed",
+            extra={"format": audio_format, "stderr": stderr.decode(errors="replace").strip()},
+        )
+        return False
+    return True
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from typing import List, Optional, Union
+
+from app.services.audio_formats import AUDIO_FORMATS, can_transcode
+
+logger = logging.getLogger(__name__)
+
+# Sample rate the providers render at; parts are resampled to it when merging
+MERGE_SAMPLE_RATE = 24000
+
+# One silent MPEG-2 Layer III frame: 24 kHz, 48 kbps, mono (Edge's own format).
+# 576 samples per frame, 144 bytes: header FFF364C0, zeroed side info and data.
+_SILENT_MP3_FRAME = bytes.fromhex("FFF364C0") + bytes(140)
+_MP3_FRAME_MS = 576 / 24000 * 1000
+
+# A part is either a path to an audio file or a pause length in milliseconds
+Part = Union[str, int]
+
+
+def mp3_silence(duration_ms: int) -> bytes:
+    """Silent MP3 frames lasting roughly ``duration_ms``"""
+    frames = max(1, round(duration_ms / _MP3_FRAME_MS))
+    return _SILENT_MP3_FRAME * frames
+
+
+def concat_mp3(parts: List[Part], dst_path: str):
+    """Join MP3 files by appending frames, inserting silent frames for pauses.
+
+    MP3 streams are a sequence of self-contained frames, so this is valid
+    without decoding; it's the fallback when ffmpeg isn't available.
+    """
+    with open(dst_path, "wb") as out:
+        for part in parts:
+            if isinstance(part, int):
+                out.write(mp3_silence(part))
+            else:
+                with open(part, "rb") as f:
+                    out.write(f.read())
+
+
+def _ffmpeg_concat_args(parts: List[Part], dst_path: str, audio_format: str, bitrate: Optional[int]) -> List[str]:
+    args = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    for part in parts:
+        if isinstance(part, int):
+            args += [
+                "-f", "lavfi", "-t", f"{part / 1000:.3f}",
+                "-i", f"anullsrc=r={MERGE_SAMPLE_RATE}:cl=mono",
+            ]
+        else:
+            args += ["-i", part]
+
+    labels = []
+    filters = []
+    for index in range(len(parts)):
+        filters.append(
+            f"[{index}:a]aresample={MERGE_SAMPLE_RATE},aformat=channel_layouts=mono[a{index}]"
+        )
+        labels.append(f"[a{index}]")
+    filters.append(f"{''.join(labels)}concat=n={len(parts)}:v=0:a=1[out]")
+
+    spec = AUDIO_FORMATS[audio_format]
+    codec_args = list(spec["ffmpeg"])
+    if spec["lossy"]:
+        codec_args[-2:-2] = ["-b:a", f"{bitrate or spec['bitrate']}k"]
+    return args + ["-filter_complex", ";".join(filters), "-map", "[out]"] + codec_args + [dst_path]
+
+
+async def merge_audio(
+    parts: List[Part],
+    dst_path: str,
+    audio_format: str = "mp3",
+    bitrate: Optional[int] = None,
+) -> bool:
+    """Render ``parts`` in order into one file.
+
+    With ffmpeg the parts are decoded, resampled and re-encoded once into
+    ``audio_format``. Without it only MP3 parts into MP3 output can be
+    merged, by frame concatenation.
+    """
+    if not can_transcode():
+        if audio_format != "mp3" or bitrate is not None:
+            return False
+        concat_mp3(parts, dst_path)
+        return True
+
+    process = await asyncio.create_subprocess_exec(
+        *_ffmpeg_concat_args(parts, dst_path, audio_format, bitrate),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        logger.error(
+            "audio merge failed",
+            extra={"format": audio_format, "parts": len(parts), "stderr": stderr.decode(errors="replace").strip()},
+        )
+        return False
+    return True
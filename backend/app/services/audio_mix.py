@@ -0,0 +1,152 @@
+"""Music beds mixed under a voiceover, ducked automatically under speech.
+
+The ducking envelope comes from the voice itself: RMS over 10 ms windows,
+gated at a threshold, then turned into gain ramps. Because the whole voice
+track is known up front, the music starts dipping ``attack_ms`` *before*
+each phrase (a live ducker can only react after it) and comes back up over
+``release_ms`` once a pause outlasts the hold time. Every step is a NumPy
+array operation (running maxima for the distance to the nearest speech),
+so there is no per-sample or per-window Python loop.
+
+Pure signal processing; reading and writing files happens in
+``audio_post.process_file``, which runs in the post-processing pool.
+NumPy is imported by the functions that use it, so requests can name a
+``Mix`` without loading it into the serving process.
+"""
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+ENVELOPE_WINDOW_MS = 10
+# Pauses shorter than this (between words) keep the music ducked
+HOLD_MS = 300
+
+
+@dataclass(frozen=True)
+class Mix:
+    """A music bed under the voice.
+
+    ``music_key`` identifies the track's content for the cache key (the path
+    alone doesn't change when a library file is replaced).
+    """
+
+    music_path: str
+    music_key: str
+    music_gain_db: float = -18.0
+    duck_db: float = -12.0
+    attack_ms: int = 150
+    release_ms: int = 600
+    threshold_db: float = -40.0
+    lead_in_ms: int = 1000
+    tail_ms: int = 2000
+
+    def cache_token(self) -> str:
+        return (
+            f"mix:{self.music_key}:{self.music_gain_db:.1f}:{self.duck_db:.1f}:{self.attack_ms}:"
+            f"{self.release_ms}:{self.threshold_db:.0f}:{self.lead_in_ms}:{self.tail_ms}"
+        )
+
+
+def speech_envelope(
+    voice: "np.ndarray",
+    rate: int,
+    threshold_db: float = -40.0,
+    attack_ms: int = 150,
+    release_ms: int = 600,
+    hold_ms: int = HOLD_MS,
+) -> "np.ndarray":
+    """Per-sample ducking amount in [0, 1] (1 under speech) for ``(frames, channels)`` audio"""
+    import numpy as np
+
+    frames = voice.shape[0]
+    window = max(1, rate * ENVELOPE_WINDOW_MS // 1000)
+    windows = -(-frames // window)
+    if windows == 0:
+        return np.zeros(0, dtype=np.float32)
+    padded = np.zeros((windows * window, voice.shape[1]), dtype=np.float32)
+    padded[:frames] = voice
+    rms = np.sqrt((padded.reshape(windows, window, -1) ** 2).mean(axis=(1, 2)))
+    active = rms > 10 ** (threshold_db / 20)
+    if not active.any():
+        return np.zeros(frames, dtype=np.float32)
+
+    # Windows since the last speech window, and until the next one
+    index = np.arange(windows)
+    last = np.maximum.accumulate(np.where(active, index, -windows * 2))
+    following = np.minimum.accumulate(np.where(active, index, windows * 3)[::-1])[::-1]
+    since, until = index - last, following - index
+
+    attack = max(1, attack_ms // ENVELOPE_WINDOW_MS)
+    release = max(1, release_ms // ENVELOPE_WINDOW_MS)
+    hold = hold_ms // ENVELOPE_WINDOW_MS
+    onset = np.clip(1 - until / attack, 0, 1)
+    decay = np.clip(1 - np.maximum(since - hold, 0) / release, 0, 1)
+    envelope = np.maximum(onset, decay).astype(np.float32)
+
+    # Window values sit at window centres; interpolate between them per sample
+    centres = (index + 0.5) * window
+    return np.interp(np.arange(frames), centres, envelope).astype(np.float32)
+
+
+def fit_music(music: "np.ndarray", music_rate: int, rate: int, channels: int, frames: int) -> "np.ndarray":
+    """Resample ``music`` to ``rate``, loop it to ``frames`` and match ``channels``.
+
+    Resampling is linear interpolation, which is plenty for a bed sitting
+    well under the voice.
+    """
+    import numpy as np
+
+    if music.shape[0] == 0:
+        return np.zeros((frames, channels), dtype=np.float32)
+    if music.shape[1] != channels:
+        music = music.mean(axis=1, keepdims=True)
+        if channels > 1:
+            music = np.repeat(music, channels, axis=1)
+
+    positions = np.arange(frames, dtype=np.float64) * (music_rate / rate)
+    # Loop by wrapping positions; the last sample interpolates back to the first
+    positions %= music.shape[0]
+    looped = np.vstack([music, music[:1]])
+    points = np.arange(looped.shape[0])
+    return np.stack([np.interp(positions, points, looped[:, c]) for c in range(channels)], axis=1).astype(np.float32)
+
+
+def mix_music(
+    voice: "np.ndarray",
+    rate: int,
+    music: "np.ndarray",
+    music_rate: int,
+    mix: Mix,
+    ceiling_db: float = -1.0,
+) -> "np.ndarray":
+    """Voice over a ducked music bed, with ``lead_in_ms`` before and a faded ``tail_ms`` after.
+
+    Output has the voice's rate and the larger channel count of the two.
+    The sum is scaled down as a whole if its peak would pass ``ceiling_db``.
+    """
+    import numpy as np
+
+    lead = rate * mix.lead_in_ms // 1000
+    tail = rate * mix.tail_ms // 1000
+    total = lead + voice.shape[0] + tail
+    channels = max(voice.shape[1], music.shape[1])
+
+    voice_track = np.zeros((total, voice.shape[1]), dtype=np.float32)
+    voice_track[lead:lead + voice.shape[0]] = voice
+    envelope = speech_envelope(voice_track, rate, mix.threshold_db, mix.attack_ms, mix.release_ms)
+    gain = 10 ** ((mix.music_gain_db + mix.duck_db * envelope) / 20)
+
+    bed = fit_music(music, music_rate, rate, channels, total)
+    bed *= gain[:, None]
+    if tail:
+        bed[total - tail:] *= np.linspace(1.0, 0.0, tail, dtype=np.float32)[:, None]
+
+    # A mono voice broadcasts across a stereo bed
+    mixed = bed + voice_track
+    peak = np.abs(mixed).max() if mixed.size else 0.0
+    ceiling = 10 ** (ceiling_db / 20)
+    if peak > ceiling:
+        mixed *= ceiling / peak
+    return mixed
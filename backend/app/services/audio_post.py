@@ -0,0 +1,327 @@
+"""Loudness normalization, silence trimming and fades on decoded PCM.
+
+Every stage is a NumPy array operation, so a long file costs a few passes
+over memory rather than a Python loop per sample. Loudness is integrated
+loudness per ITU-R BS.1770 (K-weighting, 400 ms blocks, absolute and
+relative gates). K-weighting is a linear-phase FIR with the filters'
+magnitude response, applied by overlap-add FFTs of ``FFT_SIZE`` frames:
+loudness only depends on filtered energy, so phase doesn't matter, no
+recursive filter loop is needed, and memory stays bounded however long the
+file is.
+
+Files are processed in a process pool (``postprocess``) so the work never
+runs on the event loop or holds the GIL of the serving process. A music
+bed (``audio_mix``) is mixed in as the last stage. NumPy is imported by
+the functions that use it, so importing this module (for ``PostProcess``)
+doesn't load it into the serving process.
+"""
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from app.config import get_settings
+from app.services.audio_mix import Mix
+
+if TYPE_CHECKING:
+    import numpy as np
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Gain is capped so sample peaks stay below this (dBFS)
+PEAK_CEILING_DB = -1.0
+# BS.1770 gating
+BLOCK_SECONDS = 0.4
+BLOCK_STEP_SECONDS = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+# Silence trimming resolution and what is kept either side of the speech
+TRIM_WINDOW_MS = 10
+TRIM_PAD_MS = 50
+# K-weighting FIR length (resolves the 38 Hz high-pass) and overlap-add block
+FILTER_TAPS = 8192
+FFT_SIZE = 1 << 16
+
+
+@dataclass(frozen=True)
+class PostProcess:
+    """What to apply after synthesis; ``target_lufs=None`` skips normalization"""
+
+    target_lufs: Optional[float] = -16.0
+    trim_silence: bool = True
+    silence_threshold_db: float = -50.0
+    fade_in_ms: int = 0
+    fade_out_ms: int = 0
+    mix: Optional[Mix] = None
+
+    def cache_token(self) -> str:
+        """Folded into the cache key; processed audio is cached separately"""
+        target = "" if self.target_lufs is None else f"{self.target_lufs:.1f}"
+        trim = f"{self.silence_threshold_db:.0f}" if self.trim_silence else ""
+        token = f"post:{target}:{trim}:{self.fade_in_ms}:{self.fade_out_ms}"
+        return f"{token}:{self.mix.cache_token()}" if self.mix else token
+
+
+def _biquad_power(b, a, cos_w: "np.ndarray", cos_2w: "np.ndarray") -> "np.ndarray":
+    """|H|^2 of a biquad on the unit circle, in real arithmetic"""
+    def power(c):
+        return c[0] ** 2 + c[1] ** 2 + c[2] ** 2 + 2 * (c[0] * c[1] + c[1] * c[2]) * cos_w + 2 * c[0] * c[2] * cos_2w
+
+    return power(b) / power(a)
+
+
+def k_weighting(frequencies: "np.ndarray", rate: int) -> "np.ndarray":
+    """Magnitude of the BS.1770 K-weighting (shelf + high-pass) at ``frequencies``"""
+    import numpy as np
+
+    # High shelf, +4 dB above ~1.5 kHz (RBJ cookbook form)
+    gain = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1500.0 / rate
+    alpha = np.sin(w0) / (2 * (1 / np.sqrt(2)))
+    cos_w0 = np.cos(w0)
+    root = 2 * np.sqrt(gain) * alpha
+    shelf_b = (
+        gain * ((gain + 1) + (gain - 1) * cos_w0 + root),
+        -2 * gain * ((gain - 1) + (gain + 1) * cos_w0),
+        gain * ((gain + 1) + (gain - 1) * cos_w0 - root),
+    )
+    shelf_a = (
+        (gain + 1) - (gain - 1) * cos_w0 + root,
+        2 * ((gain - 1) - (gain + 1) * cos_w0),
+        (gain + 1) - (gain - 1) * cos_w0 - root,
+    )
+    # High-pass at 38 Hz
+    w0 = 2 * np.pi * 38.0 / rate
+    alpha = np.sin(w0) / (2 * 0.5)
+    cos_w0 = np.cos(w0)
+    pass_b = ((1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2)
+    pass_a = (1 + alpha, -2 * cos_w0, 1 - alpha)
+
+    cos_w = np.cos(2 * np.pi * frequencies / rate)
+    cos_2w = 2 * cos_w ** 2 - 1
+    power = _biquad_power(shelf_b, shelf_a, cos_w, cos_2w) * _biquad_power(pass_b, pass_a, cos_w, cos_2w)
+    return np.sqrt(np.maximum(power, 0)).astype(np.float32)
+
+
+@lru_cache(maxsize=8)
+def k_weighting_taps(rate: int) -> "np.ndarray":
+    """Linear-phase FIR with the K-weighting magnitude; delays by ``FILTER_TAPS // 2``"""
+    import numpy as np
+
+    response = k_weighting(np.fft.rfftfreq(FILTER_TAPS, 1 / rate), rate)
+    taps = np.roll(np.fft.irfft(response, n=FILTER_TAPS), FILTER_TAPS // 2)
+    # Periodic Hann, centred on the peak
+    return taps * np.hanning(FILTER_TAPS + 1)[:-1]
+
+
+def weighted_step_energy(samples: "np.ndarray", rate: int, step: int) -> "np.ndarray":
+    """K-weighted energy, summed over channels, of each ``step`` frames.
+
+    Filtered ``FFT_SIZE`` frames at a time (overlap-add), so the working set
+    is a few blocks rather than the whole signal's spectrum.
+    """
+    import numpy as np
+
+    taps = k_weighting_taps(rate)
+    delay = taps.size // 2
+    hop = FFT_SIZE - taps.size + 1
+    kernel = np.fft.rfft(taps, n=FFT_SIZE)
+    frames, channels = samples.shape
+    energy = np.zeros(frames // step + 1)
+    tail = np.zeros((channels, taps.size - 1))
+    # Output sample n is convolution sample n + delay
+    for begin in range(0, frames + delay, hop):
+        block = np.fft.irfft(np.fft.rfft(samples[begin:begin + hop].T, n=FFT_SIZE) * kernel, n=FFT_SIZE)
+        block[:, : tail.shape[1]] += tail
+        tail = block[:, hop:].copy()
+        positions = np.arange(begin - delay, begin - delay + hop)
+        kept = (positions >= 0) & (positions < frames)
+        squares = (block[:, :hop][:, kept] ** 2).sum(axis=0)
+        energy += np.bincount(positions[kept] // step, weights=squares, minlength=energy.size)
+    return energy
+
+
+def integrated_loudness(samples: "np.ndarray", rate: int) -> float:
+    """Gated loudness in LUFS of float samples shaped ``(frames, channels)``"""
+    import numpy as np
+
+    frames = samples.shape[0]
+    step = int(BLOCK_STEP_SECONDS * rate)
+    # Blocks are whole steps, so their energy is a sum of step energies
+    steps_per_block = round(BLOCK_SECONDS / BLOCK_STEP_SECONDS)
+    block = steps_per_block * step
+    if frames < block:
+        return float("-inf")
+
+    # Mean square per overlapping block from a running sum of step energy
+    energy = np.concatenate(([0.0], np.cumsum(weighted_step_energy(samples, rate, step))))
+    starts = np.arange((frames - block) // step + 1)
+    power = (energy[starts + steps_per_block] - energy[starts]) / block
+    with np.errstate(divide="ignore"):
+        loudness = -0.691 + 10 * np.log10(power)
+
+    gated = power[loudness > ABSOLUTE_GATE_LUFS]
+    if gated.size == 0:
+        return float("-inf")
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) + RELATIVE_GATE_LU
+    gated = power[(loudness > ABSOLUTE_GATE_LUFS) & (loudness > relative_gate)]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
+
+
+def normalize_loudness(samples: "np.ndarray", rate: int, target_lufs: float) -> Tuple["np.ndarray", float]:
+    """Scale to ``target_lufs``, limited so peaks stay under ``PEAK_CEILING_DB``; gain in dB"""
+    import numpy as np
+
+    loudness = integrated_loudness(samples, rate)
+    if not np.isfinite(loudness):
+        return samples, 0.0
+    gain = 10 ** ((target_lufs - loudness) / 20)
+    peak = np.abs(samples).max()
+    if peak > 0:
+        gain = min(gain, 10 ** (PEAK_CEILING_DB / 20) / peak)
+    return samples * gain, float(20 * np.log10(gain))
+
+
+def trim_silence(samples: "np.ndarray", rate: int, threshold_db: float = -50.0) -> "np.ndarray":
+    """Cut leading and trailing audio quieter than ``threshold_db`` (10 ms RMS windows).
+
+    Audio that is quiet throughout is returned as is rather than emptied.
+    """
+    import numpy as np
+
+    window = max(1, rate * TRIM_WINDOW_MS // 1000)
+    windows = samples.shape[0] // window
+    if windows == 0:
+        return samples
+    framed = samples[: windows * window].reshape(windows, window, -1)
+    rms = np.sqrt((framed ** 2).mean(axis=(1, 2)))
+    loud = np.flatnonzero(rms > 10 ** (threshold_db / 20))
+    if loud.size == 0:
+        return samples
+    pad = rate * TRIM_PAD_MS // 1000
+    start = max(0, loud[0] * window - pad)
+    end = min(samples.shape[0], (loud[-1] + 1) * window + pad)
+    return samples[start:end]
+
+
+def apply_fades(samples: "np.ndarray", rate: int, fade_in_ms: int = 0, fade_out_ms: int = 0) -> "np.ndarray":
+    """Linear fade in/out; fades longer than the audio are shortened to fit"""
+    import numpy as np
+
+    samples = samples.copy()
+    frames = samples.shape[0]
+    fade_in = min(frames, rate * fade_in_ms // 1000)
+    fade_out = min(frames, rate * fade_out_ms // 1000)
+    if fade_in:
+        samples[:fade_in] *= np.linspace(0.0, 1.0, fade_in, dtype=samples.dtype)[:, None]
+    if fade_out:
+        samples[frames - fade_out:] *= np.linspace(1.0, 0.0, fade_out, dtype=samples.dtype)[:, None]
+    return samples
+
+
+def read_wav(path: str, max_seconds: Optional[float] = None) -> Tuple["np.ndarray", int]:
+    """16-bit PCM WAV as float32 ``(frames, channels)`` in [-1, 1] and its rate.
+
+    ``max_seconds`` reads only the start of the file.
+    """
+    import numpy as np
+
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"Expected 16-bit PCM, got {8 * f.getsampwidth()}-bit")
+        channels = f.getnchannels()
+        rate = f.getframerate()
+        frames = f.getnframes()
+        if max_seconds is not None:
+            frames = min(frames, math.ceil(max_seconds * rate) + 1)
+        data = np.frombuffer(f.readframes(frames), dtype="<i2")
+    return data.reshape(-1, channels).astype(np.float32) / 32768, rate
+
+
+def write_wav(path: str, samples: "np.ndarray", rate: int):
+    import numpy as np
+
+    pcm = np.clip(np.round(samples * 32768), -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(samples.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(pcm.tobytes())
+
+
+def process_file(src_path: str, dst_path: str, post: PostProcess) -> dict:
+    """Run ``post`` over a WAV file into ``dst_path``.
+
+    Returns the seconds spent per stage and the gain applied (``gain_db``).
+    """
+    from app.services.audio_mix import mix_music
+
+    timings = {}
+    started = time.perf_counter()
+    samples, rate = read_wav(src_path)
+    timings["decode"] = time.perf_counter() - started
+
+    if post.trim_silence:
+        started = time.perf_counter()
+        samples = trim_silence(samples, rate, post.silence_threshold_db)
+        timings["trim"] = time.perf_counter() - started
+    if post.target_lufs is not None:
+        started = time.perf_counter()
+        samples, timings["gain_db"] = normalize_loudness(samples, rate, post.target_lufs)
+        timings["loudness"] = time.perf_counter() - started
+    if post.fade_in_ms or post.fade_out_ms:
+        started = time.perf_counter()
+        samples = apply_fades(samples, rate, post.fade_in_ms, post.fade_out_ms)
+        timings["fades"] = time.perf_counter() - started
+    if post.mix is not None:
+        started = time.perf_counter()
+        # Only as much music as the mix lasts is decoded
+        seconds = samples.shape[0] / rate + (post.mix.lead_in_ms + post.mix.tail_ms) / 1000
+        music, music_rate = read_wav(post.mix.music_path, max_seconds=seconds)
+        timings["music_decode"] = time.perf_counter() - started
+        started = time.perf_counter()
+        samples = mix_music(samples, rate, music, music_rate, post.mix, PEAK_CEILING_DB)
+        timings["mix"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    write_wav(dst_path, samples, rate)
+    timings["encode"] = time.perf_counter() - started
+    return timings
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        workers = settings.AUDIO_POSTPROCESS_WORKERS or min(4, os.cpu_count() or 1)
+        _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+async def postprocess(src_path: str, dst_path: str, post: PostProcess) -> bool:
+    """Process a WAV file in the worker pool without blocking the loop"""
+    loop = asyncio.get_running_loop()
+    try:
+        timings = await loop.run_in_executor(_pool(), process_file, src_path, dst_path, post)
+    except Exception:
+        logger.exception("audio post-processing failed")
+        return False
+    logger.debug("audio post-processed", extra=timings)
+    return True
+
+
+def shutdown_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
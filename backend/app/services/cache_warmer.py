@@ -0,0 +1,320 @@
+"""Re-render the most requested audio after a deploy or cache loss.
+
+Every ``/tts/generate`` records the request hash (the cache filename's stem)
+on its ``voice_generations`` row, and single-voice requests without
+post-processing also record what was rendered in ``cached_requests``,
+stamped with when it was last requested. The warmer counts hashes over the last ``CACHE_WARM_WINDOW_DAYS``, takes the top
+``CACHE_WARM_TOP_N`` per voice and renders whichever of them are missing
+from the audio cache, one at a time, at most ``CACHE_WARM_RATE`` per second
+and in the lowest priority class, so user requests keep the provider slots.
+Each run first deletes recipes nobody has asked for within the window:
+they can't be picked, and they hold users' text.
+
+Those files are the warm set. Cache lookups that land on it are counted
+(``warm_set.hit_rate``, ``tts_warm_set_lookups_total``): a warm set that
+serves few requests can shrink, one that serves most of them may pay off
+bigger.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.metrics import cache_warm_requests, tts_warm_set_lookups, TOOL_NAME
+from app.models import CachedRequest, VoiceGeneration
+from app.services.audio_cache import audio_cache
+from app.services.scheduler import priority
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Lowest class, so warming never takes a slot ahead of a user
+WARM_PRIORITY = "preview"
+
+
+class WarmerBusy(RuntimeError):
+    pass
+
+
+def remember_request(
+    db: Session,
+    request_hash: str,
+    provider: str,
+    voice: str,
+    text: str,
+    speed: float,
+    audio_format: str,
+    bitrate: Optional[int],
+):
+    """Record how ``request_hash`` was rendered, or that it was asked for again, in the caller's transaction"""
+    row = {
+        "request_hash": request_hash,
+        "provider": provider,
+        "voice": voice,
+        "text": text,
+        "speed": speed,
+        "audio_format": audio_format,
+        "bitrate": bitrate,
+        "created_at": datetime.utcnow(),
+    }
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        statement = insert(CachedRequest)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["request_hash"], set_={"created_at": statement.excluded.created_at}
+            ),
+            [row],
+        )
+        return
+    existing = db.query(CachedRequest).filter_by(request_hash=request_hash).first()
+    if existing is None:
+        db.add(CachedRequest(**row))
+    else:
+        existing.created_at = row["created_at"]
+
+
+def forget_stale_requests(db: Session, since: datetime) -> int:
+    """Delete recipes last requested before ``since``; returns how many went"""
+    deleted = (
+        db.query(CachedRequest)
+        .filter(CachedRequest.created_at < since)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+@dataclass
+class Candidate:
+    voice_id: str
+    request_hash: str
+    filename: str
+    uses: int
+    recipe: Optional[CachedRequest]
+
+
+def popular_requests(db: Session, top_n: int, since: datetime) -> List[Candidate]:
+    """The ``top_n`` most generated request hashes per voice since ``since``, most used first"""
+    uses = func.count(VoiceGeneration.id)
+    ranked = (
+        db.query(
+            VoiceGeneration.voice_id.label("voice_id"),
+            VoiceGeneration.request_hash.label("request_hash"),
+            func.max(VoiceGeneration.audio_url).label("audio_url"),
+            uses.label("uses"),
+            func.row_number().over(
+                partition_by=VoiceGeneration.voice_id,
+                order_by=(uses.desc(), VoiceGeneration.request_hash),
+            ).label("rank"),
+        )
+        .filter(VoiceGeneration.request_hash.isnot(None), VoiceGeneration.created_at >= since)
+        .group_by(VoiceGeneration.voice_id, VoiceGeneration.request_hash)
+        .subquery()
+    )
+    rows = (
+        db.query(ranked.c.voice_id, ranked.c.request_hash, ranked.c.audio_url, ranked.c.uses, CachedRequest)
+        .outerjoin(CachedRequest, CachedRequest.request_hash == ranked.c.request_hash)
+        .filter(ranked.c.rank <= top_n)
+        .order_by(ranked.c.uses.desc(), ranked.c.request_hash)
+        .all()
+    )
+    return [
+        Candidate(voice_id, request_hash, audio_url.rsplit("/", 1)[-1], uses, recipe)
+        for voice_id, request_hash, audio_url, uses, recipe in rows
+    ]
+
+
+class WarmSet:
+    """Filenames the last warm-up covered, and how often lookups land on them"""
+
+    def __init__(self):
+        self.filenames: Set[str] = set()
+        self.lookups = 0
+        self.hits = 0
+
+    def replace(self, filenames: Set[str]):
+        self.filenames = filenames
+        self.lookups = 0
+        self.hits = 0
+
+    def observe(self, filename: str, hit: bool):
+        """Count a cache lookup (called for every one)"""
+        self.lookups += 1
+        if filename in self.filenames:
+            if hit:
+                self.hits += 1
+            tts_warm_set_lookups.labels(tool=TOOL_NAME, result="hit" if hit else "miss").inc()
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of all cache lookups served from the warm set"""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+@dataclass
+class WarmReport:
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    candidates: int = 0
+    # Already in the cache when the run reached them
+    cached: int = 0
+    restored: int = 0
+    failed: int = 0
+    # No recipe recorded (multi-voice or post-processed requests)
+    unknown: int = 0
+    # Left for the next run when the off-peak window closed
+    deferred: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of the warm set that was already cached"""
+        return self.cached / self.candidates if self.candidates else 0.0
+
+    def as_dict(self) -> dict:
+        report = asdict(self)
+        report["hit_rate"] = round(self.hit_rate, 4)
+        return report
+
+
+class CacheWarmer:
+    def __init__(self):
+        self.running = False
+        self.last_report: Optional[WarmReport] = None
+
+    @staticmethod
+    def _plan(db: Optional[Session], top_n: int, window_days: int) -> List[Candidate]:
+        session = db or SessionLocal()
+        try:
+            since = datetime.utcnow() - timedelta(days=window_days)
+            forget_stale_requests(session, since)
+            candidates = popular_requests(session, top_n, since)
+            # Recipes are read after the session is gone
+            for candidate in candidates:
+                if candidate.recipe is not None:
+                    session.expunge(candidate.recipe)
+            return candidates
+        finally:
+            if db is None:
+                session.close()
+
+    async def warm(
+        self,
+        service,
+        db: Optional[Session] = None,
+        top_n: int = settings.CACHE_WARM_TOP_N,
+        window_days: int = settings.CACHE_WARM_WINDOW_DAYS,
+        rate: float = settings.CACHE_WARM_RATE,
+        deadline: Optional[float] = None,
+    ) -> WarmReport:
+        """Render missing popular requests with ``service`` (a ``TTSService``).
+
+        History is read from ``db``, or from a session of its own.
+        Renders are spaced ``1 / rate`` seconds apart; none start after
+        ``deadline`` (a ``time.monotonic()`` value).
+        """
+        if self.running:
+            raise WarmerBusy("Cache warming is already running")
+        self.running = True
+        report = WarmReport(started_at=datetime.utcnow())
+        try:
+            candidates = await asyncio.to_thread(self._plan, db, top_n, window_days)
+            report.candidates = len(candidates)
+            warm_set.replace({c.filename for c in candidates})
+            interval = 1 / rate if rate > 0 else 0.0
+            next_render = time.monotonic()
+            for candidate in candidates:
+                if os.path.exists(audio_cache.path(candidate.filename)):
+                    report.cached += 1
+                    cache_warm_requests.labels(tool=TOOL_NAME, result="cached").inc()
+                    continue
+                if candidate.recipe is None:
+                    report.unknown += 1
+                    cache_warm_requests.labels(tool=TOOL_NAME, result="unknown").inc()
+                    continue
+                if deadline is not None and max(next_render, time.monotonic()) >= deadline:
+                    report.deferred += 1
+                    continue
+                await asyncio.sleep(max(0.0, next_render - time.monotonic()))
+                next_render = time.monotonic() + interval
+                result = await self._render(service, candidate)
+                if result == "restored":
+                    report.restored += 1
+                else:
+                    report.failed += 1
+                cache_warm_requests.labels(tool=TOOL_NAME, result=result).inc()
+        finally:
+            self.running = False
+            report.finished_at = datetime.utcnow()
+            self.last_report = report
+        logger.info("cache warm-up finished", extra=report.as_dict())
+        return report
+
+    @staticmethod
+    async def _render(service, candidate: Candidate) -> str:
+        recipe = candidate.recipe
+        try:
+            with priority(WARM_PRIORITY):
+                filename = await service.synthesize(
+                    recipe.provider, recipe.voice, recipe.text, recipe.speed, recipe.audio_format, recipe.bitrate
+                )
+        except Exception:
+            logger.exception("cache warm-up render failed", extra={"request_hash": candidate.request_hash})
+            return "failed"
+        # A provider fallback caches under another voice's key, which doesn't warm this one
+        return "restored" if filename == candidate.filename else "failed"
+
+
+def parse_hours(raw: str) -> Optional[tuple]:
+    """``"2-5"`` -> ``(2, 5)``: an off-peak window in UTC hours; None when unset"""
+    if not raw.strip():
+        return None
+    start, _, end = raw.partition("-")
+    window = (int(start), int(end))
+    if not all(0 <= hour <= 24 for hour in window) or window[0] == window[1]:
+        raise ValueError(f"Invalid CACHE_WARM_HOURS: {raw}")
+    return window
+
+
+def seconds_until(hour: int, now: datetime) -> float:
+    """Seconds from ``now`` (UTC) to the next ``hour``:00"""
+    start = now.replace(hour=hour % 24, minute=0, second=0, microsecond=0)
+    if start <= now:
+        start += timedelta(days=1)
+    return (start - now).total_seconds()
+
+
+async def run_warmer(service):
+    """Background task: warm once at startup, then daily in the off-peak window"""
+    if settings.CACHE_WARM_TOP_N <= 0:
+        return
+    hours = parse_hours(settings.CACHE_WARM_HOURS)
+    if settings.CACHE_WARM_ON_STARTUP:
+        try:
+            await cache_warmer.warm(service)
+        except Exception:
+            logger.exception("cache warm-up failed")
+    while hours is not None:
+        start, end = hours
+        await asyncio.sleep(seconds_until(start, datetime.utcnow()))
+        window = ((end - start) % 24) * 3600
+        try:
+            await cache_warmer.warm(service, deadline=time.monotonic() + window)
+        except WarmerBusy:
+            pass
+        except Exception:
+            logger.exception("cache warm-up failed")
+
+
+warm_set = WarmSet()
+cache_warmer = CacheWarmer()
@@ -0,0 +1,427 @@
+"""Text extraction from uploaded documents, streamed as chapters.
+
+Supports plain text, Markdown, EPUB and DOCX. Nothing holds the whole
+document: text files are read in bounded lines, and EPUB/DOCX (ZIP
+containers) are inflated member by member into incremental parsers. Memory
+is bounded by the chapter size, however large the upload.
+"""
+import codecs
+import io
+import os
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import BinaryIO, Iterator, List, Optional
+
+DOCUMENT_KINDS = {
+    ".txt": "text",
+    ".text": "text",
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".epub": "epub",
+    ".docx": "docx",
+}
+CONTENT_TYPES = {
+    "text/plain": "text",
+    "text/markdown": "markdown",
+    "application/epub+zip": "epub",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+}
+
+READ_CHUNK = 64 * 1024
+# Longest paragraph kept in one piece; longer runs of text are cut at spaces
+MAX_BLOCK_CHARS = 4000
+# Cap on bytes inflated from a ZIP container, against decompression bombs
+MAX_INFLATED_BYTES = 512 * 1024 * 1024
+MAX_PACKAGE_FILE_BYTES = 4 * 1024 * 1024
+
+# "Chapter 12", "CHAPTER XII. The Return", "Prologue", ... on a line of their own
+_TEXT_HEADING = re.compile(
+    r"^(?:(?:chapter|part|book)\s+[\w.-]+|prologue|epilogue|introduction)\b.{0,80}$", re.I
+)
+_MD_HEADING = re.compile(r"^(#{1,2})\s+(.+?)\s*#*\s*$")
+_MD_FENCE = re.compile(r"^\s*(```|~~~)")
+_DOCX_HEADING = re.compile(r"^(?:Title|Heading[12])$")
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+OPF = "{http://www.idpf.org/2007/opf}"
+CONTAINER = "{urn:oasis:names:tc:opendocument:xmlns:container}"
+
+
+class DocumentError(ValueError):
+    """Raised for uploads that can't be read; the message is user-facing"""
+
+
+def store_upload(file: BinaryIO, path: str, max_bytes: int) -> int:
+    """Copy an upload to ``path``, refusing it as soon as it passes ``max_bytes``"""
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while chunk := file.read(READ_CHUNK):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise DocumentError(f"Documents are limited to {max_bytes // (1024 * 1024)} MB")
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return size
+
+
+@dataclass
+class Block:
+    """A paragraph of text; ``heading`` starts a chapter, ``boundary`` ends one"""
+    text: str
+    heading: bool = False
+    boundary: bool = False
+
+
+@dataclass
+class Chapter:
+    index: int
+    title: str
+    text: str
+
+
+def detect_kind(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """Document kind from the file extension, falling back to the content type"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    kind = DOCUMENT_KINDS.get(extension) or CONTENT_TYPES.get((content_type or "").split(";")[0].strip())
+    if kind is None:
+        raise DocumentError("Unsupported document type. Upload .txt, .md, .epub or .docx")
+    return kind
+
+
+def _split_long(text: str, limit: int = MAX_BLOCK_CHARS) -> List[str]:
+    """Cut ``text`` into pieces of at most ``limit`` characters, at spaces where possible"""
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+# Plain text and Markdown
+
+def _lines(file: BinaryIO) -> Iterator[str]:
+    """Lines of a UTF-8 file, at most ``READ_CHUNK`` characters each"""
+    reader = io.TextIOWrapper(file, encoding="utf-8-sig", errors="replace", newline=None)
+    try:
+        while True:
+            line = reader.readline(READ_CHUNK)
+            if not line:
+                return
+            yield line
+    finally:
+        # Leave the upload open for the caller
+        reader.detach()
+
+
+def _text_blocks(file: BinaryIO, markdown: bool) -> Iterator[Block]:
+    paragraph: List[str] = []
+    size = 0
+    in_fence = False
+
+    def flush() -> Iterator[Block]:
+        nonlocal size
+        if paragraph:
+            text = " ".join(paragraph)
+            paragraph.clear()
+            size = 0
+            for piece in _split_long(text):
+                yield Block(piece)
+
+    for line in _lines(file):
+        stripped = line.strip()
+        if markdown and _MD_FENCE.match(line):
+            # Code blocks aren't read aloud
+            in_fence = not in_fence
+            yield from flush()
+            continue
+        if in_fence:
+            continue
+        if not stripped:
+            yield from flush()
+            continue
+
+        heading = None
+        if markdown:
+            match = _MD_HEADING.match(stripped)
+            if match:
+                heading = match.group(2)
+        elif not paragraph and len(stripped) <= 100 and _TEXT_HEADING.match(stripped):
+            heading = stripped
+        if heading:
+            yield from flush()
+            yield Block(heading, heading=True)
+            continue
+
+        paragraph.append(stripped)
+        size += len(stripped)
+        if size > MAX_BLOCK_CHARS:
+            yield from flush()
+    yield from flush()
+
+
+# ZIP containers
+
+class _Inflated(io.RawIOBase):
+    """A ZIP member stream that fails once the archive has inflated too much"""
+
+    def __init__(self, member: BinaryIO, budget: List[int]):
+        self.member = member
+        self.budget = budget
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.member.read(len(buffer))
+        self.budget[0] -= len(data)
+        if self.budget[0] < 0:
+            raise DocumentError("Document expands to more data than allowed")
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _open_zip(file: BinaryIO, kind: str) -> zipfile.ZipFile:
+    try:
+        return zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise DocumentError(f"Not a valid {kind.upper()} file")
+
+
+def _read_small(archive: zipfile.ZipFile, name: str) -> bytes:
+    """A package metadata file, which is never large in a real document"""
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        raise DocumentError(f"Document is missing {name}")
+    if info.file_size > MAX_PACKAGE_FILE_BYTES:
+        raise DocumentError(f"{name} is too large")
+    return archive.read(info)
+
+
+def _docx_blocks(file: BinaryIO) -> Iterator[Block]:
+    archive = _open_zip(file, "docx")
+    budget = [MAX_INFLATED_BYTES]
+    try:
+        member = archive.open("word/document.xml")
+    except KeyError:
+        raise DocumentError("Document is missing word/document.xml")
+
+    with member:
+        body = None
+        depth = 0
+        try:
+            for event, element in ET.iterparse(io.BufferedReader(_Inflated(member, budget)), events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if element.tag == f"{W}body":
+                        body = element
+                    continue
+                depth -= 1
+                if element.tag == f"{W}p":
+                    pieces = []
+                    for node in element.iter():
+                        if node.tag == f"{W}t" and node.text:
+                            pieces.append(node.text)
+                        elif node.tag in (f"{W}tab", f"{W}br", f"{W}cr"):
+                            pieces.append(" ")
+                    text = "".join(pieces).strip()
+                    style = element.find(f"{W}pPr/{W}pStyle")
+                    heading = style is not None and bool(_DOCX_HEADING.match(style.get(f"{W}val", "")))
+                    if text:
+                        if heading:
+                            yield Block(text, heading=True)
+                        else:
+                            for piece in _split_long(text):
+                                yield Block(piece)
+                    element.clear()
+                # Drop finished top-level paragraphs and tables from the tree
+                if body is not None and depth == 2:
+                    body.clear()
+        except ET.ParseError:
+            raise DocumentError("Document text is not valid XML")
+
+
+class _XHTMLBlocks(HTMLParser):
+    """Incremental XHTML to blocks; fed in chunks, drained after each feed"""
+
+    BLOCK_TAGS = frozenset({
+        "p", "div", "li", "br", "tr", "section", "article", "blockquote", "dd", "dt", "pre",
+        "h1", "h2", "h3", "h4", "h5", "h6",
+    })
+    HEADING_TAGS = frozenset({"h1", "h2", "h3"})
+    SKIP_TAGS = frozenset({"head", "script", "style", "title"})
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Block] = []
+        self._text: List[str] = []
+        self._size = 0
+        self._skip = 0
+        self._heading = False
+
+    def _flush(self):
+        text = " ".join("".join(self._text).split())
+        self._text.clear()
+        self._size = 0
+        if not text:
+            return
+        if self._heading:
+            self.blocks.append(Block(text, heading=True))
+        else:
+            self.blocks.extend(Block(piece) for piece in _split_long(text))
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+            self._heading = tag in self.HEADING_TAGS
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+            self._heading = False
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self._text.append(data)
+        self._size += len(data)
+        if self._size > MAX_BLOCK_CHARS and not self._heading:
+            self._flush()
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def drain(self) -> List[Block]:
+        blocks, self.blocks = self.blocks, []
+        return blocks
+
+
+def _epub_spine(archive: zipfile.ZipFile) -> List[str]:
+    """Archive paths of the book's content documents, in reading order"""
+    try:
+        container = ET.fromstring(_read_small(archive, "META-INF/container.xml"))
+        rootfile = container.find(f".//{CONTAINER}rootfile")
+        if rootfile is None or not rootfile.get("full-path"):
+            raise DocumentError("EPUB has no package document")
+        opf_path = rootfile.get("full-path")
+        package = ET.fromstring(_read_small(archive, opf_path))
+    except ET.ParseError:
+        raise DocumentError("EPUB package metadata is not valid XML")
+
+    base = posixpath.dirname(opf_path)
+    manifest = {
+        item.get("id"): posixpath.normpath(posixpath.join(base, item.get("href", "")))
+        for item in package.iter(f"{OPF}item")
+        if "html" in item.get("media-type", "")
+    }
+    return [
+        manifest[ref.get("idref")]
+        for ref in package.iter(f"{OPF}itemref")
+        if ref.get("idref") in manifest and ref.get("linear", "yes") != "no"
+    ]
+
+
+def _epub_blocks(file: BinaryIO) -> Iterator[Block]:
+    archive = _open_zip(file, "epub")
+    budget = [MAX_INFLATED_BYTES]
+    for path in _epub_spine(archive):
+        try:
+            member = archive.open(path)
+        except KeyError:
+            continue
+        # Each content document is at least its own chapter
+        yield Block("", boundary=True)
+        parser = _XHTMLBlocks()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        with member:
+            stream = _Inflated(member, budget)
+            while True:
+                chunk = stream.read(READ_CHUNK)
+                if not chunk:
+                    break
+                parser.feed(decoder.decode(chunk))
+                yield from parser.drain()
+        parser.feed(decoder.decode(b"", final=True))
+        parser.close()
+        yield from parser.drain()
+
+
+READERS = {
+    "text": lambda file: _text_blocks(file, markdown=False),
+    "markdown": lambda file: _text_blocks(file, markdown=True),
+    "docx": _docx_blocks,
+    "epub": _epub_blocks,
+}
+
+
+def iter_blocks(file: BinaryIO, kind: str) -> Iterator[Block]:
+    file.seek(0)
+    return READERS[kind](file)
+
+
+def iter_chapters(file: BinaryIO, kind: str, max_chars: int) -> Iterator[Chapter]:
+    """Chapters of a document, each at most ``max_chars`` characters.
+
+    Headings (Markdown ``#``/``##``, Word Title/Heading 1-2, EPUB h1-h3,
+    "Chapter ..." lines in plain text) and EPUB content documents start a
+    chapter; a chapter that outgrows ``max_chars`` continues in another
+    one at a paragraph boundary. The heading is read as the chapter's
+    first line.
+    """
+    index = 0
+    title: Optional[str] = None
+    continued = False
+    parts: List[str] = []
+    size = 0
+
+    def chapter() -> Chapter:
+        nonlocal index, parts, size
+        if title is None:
+            result = Chapter(index, f"Section {index + 1}", "\n\n".join(parts))
+        elif continued:
+            result = Chapter(index, f"{title} (continued)", "\n\n".join(parts))
+        else:
+            result = Chapter(index, title, "\n\n".join([title] + parts))
+        index += 1
+        parts, size = [], 0
+        return result
+
+    for block in iter_blocks(file, kind):
+        if block.boundary or block.heading:
+            if parts:
+                yield chapter()
+                title, continued = None, False
+            if block.heading:
+                # Consecutive headings ("Part One", "Chapter 1") title one chapter
+                title = f"{title}. {block.text}" if title else block.text
+            continue
+
+        for piece in _split_long(block.text, max_chars):
+            if parts and size + len(piece) > max_chars:
+                yield chapter()
+                continued = True
+            parts.append(piece)
+            size += len(piece) + 2
+    if parts:
+        yield chapter()
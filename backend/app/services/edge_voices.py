@@ -0,0 +1,197 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import orjson
+
+from app.compression import brotli
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VoiceDiff:
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+async def _fetch_from_edge() -> list:
+    from app.services.providers import registry
+
+    return await registry.get("edge").list_all_voices()
+
+
+class EdgeVoiceSnapshot:
+    """The full Edge voice list, kept in memory and persisted as gzipped JSON.
+
+    Served stale-while-revalidate: once loaded, reads never wait on the
+    network; a snapshot older than ``max_age`` triggers one background
+    refresh. Refreshes are diffed by ``ShortName`` so the locale and gender
+    indexes only change for voices that did, and the serialized (and
+    compressed) response bodies are rebuilt only when something changed, in
+    a worker thread. A failed refresh keeps the previous snapshot.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_age: float,
+        fetch: Callable[[], Awaitable[list]] = _fetch_from_edge,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self._fetch = fetch
+        self.voices: Dict[str, dict] = {}
+        self.by_locale: Dict[str, Set[str]] = {}
+        self.by_gender: Dict[str, Set[str]] = {}
+        self.fetched_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._serialize()
+
+    @property
+    def stale(self) -> bool:
+        return time.time() - self.fetched_at > self.max_age
+
+    def load(self) -> bool:
+        """Load the on-disk snapshot; False if there is none or it's unreadable"""
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning("ignoring unreadable voice snapshot", extra={"path": self.path, "error": str(e)})
+            return False
+        self.apply(data["voices"])
+        self.fetched_at = data["fetched_at"]
+        return True
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.part"
+        payload = {"fetched_at": self.fetched_at, "voices": list(self.voices.values())}
+        with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def _index(self, name: str, voice: dict):
+        self.by_locale.setdefault(voice.get("Locale", ""), set()).add(name)
+        self.by_gender.setdefault(voice.get("Gender", "").lower(), set()).add(name)
+
+    def _unindex(self, name: str, voice: dict):
+        self.by_locale.get(voice.get("Locale", ""), set()).discard(name)
+        self.by_gender.get(voice.get("Gender", "").lower(), set()).discard(name)
+
+    def apply(self, voices: list, serialize: bool = True) -> VoiceDiff:
+        """Replace the voice list, touching indexes only for what changed"""
+        incoming = {v["ShortName"]: v for v in voices if v.get("ShortName")}
+        diff = VoiceDiff()
+        for name in self.voices.keys() - incoming.keys():
+            self._unindex(name, self.voices.pop(name))
+            diff.removed.append(name)
+        for name, voice in incoming.items():
+            current = self.voices.get(name)
+            if current == voice:
+                continue
+            if current is None:
+                diff.added.append(name)
+            else:
+                self._unindex(name, current)
+                diff.changed.append(name)
+            self.voices[name] = voice
+            self._index(name, voice)
+        if diff and serialize:
+            self._serialize()
+        return diff
+
+    def _ordered(self) -> List[dict]:
+        return [self.voices[name] for name in sorted(self.voices)]
+
+    @staticmethod
+    def _encode(ordered: List[dict]) -> tuple:
+        """Response bodies (plain, gzip, brotli) and ETag for a voice list"""
+        body = orjson.dumps({"voices": ordered, "total": len(ordered)})
+        body_gzip = gzip.compress(body, compresslevel=6, mtime=0)
+        # Compressed once per change, so the slow high quality is affordable
+        body_brotli = brotli.compress(body, quality=11) if brotli else None
+        return body, body_gzip, body_brotli, f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+    def _serialize(self):
+        # Swapped in together so a body is never served with another's ETag
+        self.body, self.body_gzip, self.body_brotli, self.etag = self._encode(self._ordered())
+
+    def filter(self, locale: Optional[str] = None, gender: Optional[str] = None) -> List[dict]:
+        names: Optional[Set[str]] = None
+        if locale:
+            names = set(self.by_locale.get(locale, ()))
+        if gender:
+            matching = self.by_gender.get(gender.lower(), set())
+            names = matching.copy() if names is None else names & matching
+        if names is None:
+            names = set(self.voices)
+        return [self.voices[name] for name in sorted(names)]
+
+    async def refresh(self) -> Optional[VoiceDiff]:
+        """Fetch the upstream list now; shares an in-flight refresh"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self) -> Optional[VoiceDiff]:
+        try:
+            voices = await self._fetch()
+        except Exception as e:
+            logger.warning("Edge voice refresh failed", extra={"error": str(e)})
+            return None
+        if not voices:
+            logger.warning("Edge voice refresh returned no voices; keeping snapshot")
+            return None
+        diff = self.apply(voices, serialize=False)
+        if diff:
+            encoded = await asyncio.to_thread(self._encode, self._ordered())
+            self.body, self.body_gzip, self.body_brotli, self.etag = encoded
+        self.fetched_at = time.time()
+        try:
+            await asyncio.to_thread(self._save)
+        except OSError as e:
+            logger.warning("could not persist voice snapshot", extra={"path": self.path, "error": str(e)})
+        if diff:
+            logger.info(
+                "Edge voices updated",
+                extra={"added": len(diff.added), "removed": len(diff.removed), "changed": len(diff.changed)},
+            )
+        return diff
+
+    def revalidate(self):
+        """Start a background refresh unless one is already running"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def ensure_fresh(self):
+        """Block only when nothing is loaded; otherwise revalidate in the background"""
+        if not self.voices:
+            await self.refresh()
+        elif self.stale:
+            self.revalidate()
+
+    def close(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._refresh_task = None
+
+
+edge_voices = EdgeVoiceSnapshot(settings.EDGE_VOICE_SNAPSHOT_PATH, settings.EDGE_VOICE_MAX_AGE_SECONDS)
@@ -0,0 +1,198 @@
+"""Streamed ZIP export of a device's generations.
+
+The archive holds each audio file once under ``audio/`` (stored, since
+MP3 and Opus don't compress further) and a manifest of the generations,
+``manifest.csv`` or ``manifest.json``. It's built while it's sent: history
+is read in keyset pages of ``PAGE_SIZE`` rows and files in ``CHUNK_SIZE``
+pieces, so memory doesn't grow with the history. Long histories go out in
+parts of up to ``limit`` generations, oldest first. A part ends at a fixed
+row, so retrying a cut-off download with the same cursor exports the same
+generations, and the next part's cursor starts after it.
+"""
+import csv
+import io
+import os
+import zipfile
+from datetime import datetime
+from typing import Iterator, NamedTuple, Optional, Set
+
+import orjson
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.models import VoiceGeneration
+from app.services.audio_cache import audio_cache
+
+PAGE_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+MANIFEST_FIELDS = (
+    "id", "created_at", "voice_id", "provider", "text_length", "audio_duration_seconds", "audio_url", "file",
+)
+COLUMNS = (
+    VoiceGeneration.id,
+    VoiceGeneration.created_at,
+    VoiceGeneration.voice_id,
+    VoiceGeneration.provider,
+    VoiceGeneration.text_length,
+    VoiceGeneration.audio_duration_seconds,
+    VoiceGeneration.audio_url,
+)
+
+
+class Key(NamedTuple):
+    """Position in a device's history; any row with these attributes works too"""
+
+    created_at: datetime
+    id: int
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable file that collects what zipfile writes until it's drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def _device_rows(db: Session, device_id: str, after=None, through=None):
+    """Query for a device's generations after ``after`` up to ``through`` (rows with created_at and id)"""
+    query = db.query(*COLUMNS).filter(VoiceGeneration.device_id == device_id)
+    if after is not None:
+        query = query.filter(or_(
+            VoiceGeneration.created_at > after.created_at,
+            and_(VoiceGeneration.created_at == after.created_at, VoiceGeneration.id > after.id),
+        ))
+    if through is not None:
+        query = query.filter(or_(
+            VoiceGeneration.created_at < through.created_at,
+            and_(VoiceGeneration.created_at == through.created_at, VoiceGeneration.id <= through.id),
+        ))
+    return query
+
+
+def _ascending(query):
+    return query.order_by(VoiceGeneration.created_at, VoiceGeneration.id)
+
+
+def plan_part(db: Session, device_id: str, after, limit: int):
+    """``(last row, more_follow)`` for the part of up to ``limit`` generations after ``after``.
+
+    The last row is None when nothing is left to export.
+    """
+    rows = _ascending(_device_rows(db, device_id, after)).offset(limit - 1).limit(2).all()
+    if rows:
+        return rows[0], len(rows) > 1
+    last = _device_rows(db, device_id, after).order_by(
+        VoiceGeneration.created_at.desc(), VoiceGeneration.id.desc()
+    ).first()
+    return last, False
+
+
+def _pages(db: Session, device_id: str, after, through) -> Iterator:
+    """Rows from ``after`` through ``through``, read a keyset page at a time"""
+    while True:
+        page = _ascending(_device_rows(db, device_id, after, through)).limit(PAGE_SIZE).all()
+        yield from page
+        if len(page) < PAGE_SIZE:
+            return
+        after = page[-1]
+
+
+def _audio_name(audio_url: Optional[str]) -> Optional[str]:
+    if not audio_url or not audio_url.startswith("/audio/"):
+        return None
+    name = os.path.basename(audio_url)
+    return name or None
+
+
+def _manifest_record(row, included: Set[str]) -> dict:
+    name = _audio_name(row.audio_url)
+    return {
+        "id": row.id,
+        "created_at": row.created_at.isoformat(),
+        "voice_id": row.voice_id,
+        "provider": row.provider,
+        "text_length": row.text_length,
+        "audio_duration_seconds": row.audio_duration_seconds,
+        "audio_url": row.audio_url,
+        "file": f"audio/{name}" if name in included else None,
+    }
+
+
+def stream_export(
+    db: Session,
+    device_id: str,
+    after,
+    through,
+    manifest: str = "csv",
+    next_cursor: Optional[str] = None,
+) -> Iterator[bytes]:
+    """The ZIP for generations after ``after`` through ``through``, piece by piece.
+
+    Takes ownership of ``db`` and closes it. Audio that's no longer in the
+    cache is left out; its manifest ``file`` is empty.
+    """
+    sink = _Sink()
+    included: Set[str] = set()
+    try:
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as archive:
+            if through is not None:
+                for row in _pages(db, device_id, after, through):
+                    name = _audio_name(row.audio_url)
+                    if name is None or name in included:
+                        continue
+                    path = audio_cache.path(name)
+                    try:
+                        audio = open(path, "rb")
+                    except OSError:
+                        continue
+                    included.add(name)
+                    info = zipfile.ZipInfo(f"audio/{name}", date_time=row.created_at.timetuple()[:6])
+                    info.file_size = os.fstat(audio.fileno()).st_size
+                    with audio, archive.open(info, "w") as entry:
+                        while chunk := audio.read(CHUNK_SIZE):
+                            entry.write(chunk)
+                            yield sink.drain()
+                    yield sink.drain()
+
+            info = zipfile.ZipInfo(f"manifest.{manifest}", date_time=datetime.utcnow().timetuple()[:6])
+            with archive.open(info, "w") as entry:
+                rows = _pages(db, device_id, after, through) if through is not None else ()
+                if manifest == "json":
+                    entry.write(orjson.dumps({"device_id": device_id, "next_cursor": next_cursor})[:-1])
+                    entry.write(b',"generations":[')
+                    for i, row in enumerate(rows):
+                        entry.write((b"," if i else b"") + orjson.dumps(_manifest_record(row, included)))
+                        if sink.size >= CHUNK_SIZE:
+                            yield sink.drain()
+                    entry.write(b"]}")
+                else:
+                    text = io.StringIO()
+                    writer = csv.DictWriter(text, MANIFEST_FIELDS)
+                    writer.writeheader()
+                    for row in rows:
+                        writer.writerow(_manifest_record(row, included))
+                        if text.tell() >= CHUNK_SIZE:
+                            entry.write(text.getvalue().encode())
+                            text.seek(0)
+                            text.truncate()
+                            yield sink.drain()
+                    entry.write(text.getvalue().encode())
+        # Closing the archive wrote the central directory
+        yield sink.drain()
+    finally:
+        db.close()
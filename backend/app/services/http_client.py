@@ -0,0 +1,21 @@
+# Shared pooled client for upstream HTTP APIs so connections (and TLS
+# sessions) are reused across requests. Created lazily; closed on shutdown.
+_http_client = None
+
+
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,226 @@
+"""Pronunciation lexicons: respellings substituted into text before synthesis.
+
+Entries are global (``device_id`` is ``GLOBAL_SCOPE``) or per device, with device entries
+overriding global ones for the same term. Each scope's entries compile into
+an Aho-Corasick automaton, so a text is scanned once however many entries
+there are. Compiled matchers are cached in memory and rebuilt when the
+entries' fingerprint (count and latest ``updated_at``) changes, which every
+edit does, in any worker process.
+"""
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import LexiconEntry
+
+MAX_TERM_LENGTH = 100
+MAX_REPLACEMENT_LENGTH = 200
+MAX_ENTRIES_PER_DEVICE = 1000
+# The device_id of global entries; never a valid device id
+GLOBAL_SCOPE = "*"
+
+
+class LexiconError(ValueError):
+    """Raised for entries that can't be stored"""
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _lower(text: str) -> str:
+    """Lowercase without changing length, so match offsets map back to ``text``"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+class Matcher:
+    """Case-insensitive whole-word multi-term replacement (Aho-Corasick).
+
+    Overlapping matches resolve leftmost-longest. A term edge that is a
+    word character only matches at a word boundary, so ``AI`` doesn't
+    match inside ``AIR`` but ``C++`` still matches before a space.
+    """
+
+    def __init__(self, entries: Dict[str, str]):
+        self.replacements = {_lower(term): replacement for term, replacement in entries.items() if term}
+        self._goto: List[Dict[str, int]] = [{}]
+        # Lengths of the terms ending at each node, longest first
+        self._out: List[Tuple[int, ...]] = [()]
+        for term in self.replacements:
+            node = 0
+            for char in term:
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._out.append(())
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._out[node] = (len(term),)
+
+        # Failure links, breadth first, merging outputs along them
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = tuple(sorted(set(self._out[child] + self._out[self._fail[child]]), reverse=True))
+
+    def __len__(self) -> int:
+        return len(self.replacements)
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """Non-overlapping ``(start, end)`` spans of whole-word matches"""
+        if not self.replacements:
+            return []
+        lowered = _lower(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        candidates = []
+        node = 0
+        for end, char in enumerate(lowered, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length in out[node]:
+                start = end - length
+                if start and _is_word(text[start - 1]) and _is_word(text[start]):
+                    continue
+                if end < len(text) and _is_word(text[end]) and _is_word(text[end - 1]):
+                    continue
+                candidates.append((start, -end))
+
+        spans = []
+        position = 0
+        for start, negative_end in sorted(candidates):
+            if start >= position:
+                spans.append((start, -negative_end))
+                position = -negative_end
+        return spans
+
+    def apply(self, text: str) -> str:
+        spans = self.find(text)
+        if not spans:
+            return text
+        pieces = []
+        position = 0
+        for start, end in spans:
+            pieces.append(text[position:start])
+            pieces.append(self.replacements[_lower(text[start:end])])
+            position = end
+        pieces.append(text[position:])
+        return "".join(pieces)
+
+
+EMPTY = Matcher({})
+
+
+class LexiconStore:
+    """Compiled matchers per device, rebuilt when their entries change.
+
+    Devices without entries share the global matcher; device matchers
+    (global plus device entries) are kept for the ``max_devices`` most
+    recently used devices.
+    """
+
+    def __init__(self, max_devices: int = 256):
+        self.max_devices = max_devices
+        self._matchers: "OrderedDict[str, Tuple[tuple, Matcher]]" = OrderedDict()
+
+    @staticmethod
+    def _fingerprint(db: Session, scopes: Iterable[str]) -> tuple:
+        rows = (
+            db.query(LexiconEntry.device_id, func.count(LexiconEntry.id), func.max(LexiconEntry.updated_at))
+            .filter(LexiconEntry.device_id.in_(list(scopes)))
+            .group_by(LexiconEntry.device_id)
+            .all()
+        )
+        return tuple(sorted((scope, count, str(updated)) for scope, count, updated in rows))
+
+    def matcher(self, db: Session, device_id: str = GLOBAL_SCOPE) -> Matcher:
+        """The matcher for ``device_id`` (global entries only for ``GLOBAL_SCOPE``)"""
+        fingerprint = self._fingerprint(db, {GLOBAL_SCOPE, device_id})
+        if not fingerprint:
+            return EMPTY
+        if not any(scope == device_id for scope, _, _ in fingerprint):
+            device_id = GLOBAL_SCOPE
+
+        cached = self._matchers.get(device_id)
+        if cached is not None and cached[0] == fingerprint:
+            self._matchers.move_to_end(device_id)
+            return cached[1]
+
+        entries: Dict[str, str] = {}
+        # Global rows first so the device's own entries override them
+        rows = (
+            db.query(LexiconEntry.term, LexiconEntry.replacement)
+            .filter(LexiconEntry.device_id.in_({GLOBAL_SCOPE, device_id}))
+            .order_by(LexiconEntry.device_id != GLOBAL_SCOPE)
+            .all()
+        )
+        for term, replacement in rows:
+            entries[_lower(term)] = replacement
+        compiled = Matcher(entries)
+
+        self._matchers[device_id] = (fingerprint, compiled)
+        self._matchers.move_to_end(device_id)
+        while len(self._matchers) > self.max_devices:
+            self._matchers.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        self._matchers.clear()
+
+
+lexicon_store = LexiconStore()
+
+
+def list_entries(db: Session, device_id: str) -> List[LexiconEntry]:
+    return db.query(LexiconEntry).filter(LexiconEntry.device_id == device_id).order_by(LexiconEntry.term).all()
+
+
+def upsert_entry(db: Session, device_id: str, term: str, replacement: str) -> LexiconEntry:
+    """Add or update the entry for ``term`` (case-insensitively) and commit"""
+    term = " ".join(term.split())
+    replacement = " ".join(replacement.split())
+    if not term or not any(_is_word(c) for c in term):
+        raise LexiconError("Term must contain a letter or digit")
+    if len(term) > MAX_TERM_LENGTH or not replacement or len(replacement) > MAX_REPLACEMENT_LENGTH:
+        raise LexiconError(
+            f"Terms are 1-{MAX_TERM_LENGTH} characters and replacements 1-{MAX_REPLACEMENT_LENGTH}"
+        )
+
+    entry = (
+        db.query(LexiconEntry)
+        .filter(LexiconEntry.device_id == device_id, func.lower(LexiconEntry.term) == term.lower())
+        .first()
+    )
+    if entry is None:
+        count = db.query(func.count(LexiconEntry.id)).filter(LexiconEntry.device_id == device_id).scalar()
+        if device_id != GLOBAL_SCOPE and count >= MAX_ENTRIES_PER_DEVICE:
+            raise LexiconError(f"A device can have at most {MAX_ENTRIES_PER_DEVICE} lexicon entries")
+        entry = LexiconEntry(device_id=device_id, term=term, replacement=replacement)
+        db.add(entry)
+    else:
+        entry.term = term
+        entry.replacement = replacement
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+
+def delete_entry(db: Session, device_id: str, entry_id: int) -> bool:
+    deleted = (
+        db.query(LexiconEntry)
+        .filter(LexiconEntry.id == entry_id, LexiconEntry.device_id == device_id)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return bool(deleted)
@@ -0,0 +1,207 @@
+"""Music tracks available for mixing under voiceovers.
+
+Library tracks are 16-bit WAV files in ``MUSIC_LIBRARY_DIR`` shipped with
+the deployment (``library:<file stem>``). Uploads are stored by content
+hash in ``MUSIC_UPLOAD_DIR`` (``upload:<hash>``), converted to WAV with
+ffmpeg when they arrive in another format, so identical uploads share a
+file and the mixer only ever decodes WAV. Conversion output is capped at
+``MUSIC_MAX_SECONDS`` of 44.1 kHz stereo, however small the upload was.
+
+An upload belongs to the devices that uploaded it (``MusicUpload`` rows):
+only they can mix it, within ``MUSIC_MAX_UPLOADS_PER_DEVICE`` tracks and
+``MUSIC_MAX_DEVICE_MB`` of stored audio each.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+import wave
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import MusicUpload
+from app.services.audio_formats import can_transcode, transcode
+
+settings = get_settings()
+
+_MUSIC_ID = re.compile(r"^(library|upload):([\w-][\w.-]{0,99})$")
+COPY_CHUNK = 1024 * 1024
+# What converted uploads are decoded to, bounding their size with MUSIC_MAX_SECONDS
+CONVERTED_RATE = 44100
+CONVERTED_CHANNELS = 2
+
+
+class MusicError(ValueError):
+    """Raised for uploads that can't be used as music; the message is user-facing"""
+
+
+@dataclass(frozen=True)
+class MusicTrack:
+    music_id: str
+    name: str
+    path: str
+    # Changes whenever the audio does; part of mixed audio's cache key
+    key: str
+    duration_seconds: float
+    channels: int
+    rate: int
+
+
+def _wav_info(path: str) -> Optional[tuple]:
+    """``(seconds, channels, rate)`` for a 16-bit PCM WAV, None otherwise"""
+    try:
+        with wave.open(path, "rb") as f:
+            if f.getsampwidth() != 2:
+                return None
+            return f.getnframes() / f.getframerate(), f.getnchannels(), f.getframerate()
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+class MusicLibrary:
+    def __init__(self, library_dir: str = settings.MUSIC_LIBRARY_DIR, upload_dir: str = settings.MUSIC_UPLOAD_DIR):
+        self.library_dir = library_dir
+        self.upload_dir = upload_dir
+
+    def _track(self, music_id: str, name: str, path: str) -> Optional[MusicTrack]:
+        info = _wav_info(path)
+        if info is None:
+            return None
+        stat = os.stat(path)
+        kind, _, ident = music_id.partition(":")
+        key = ident if kind == "upload" else f"{ident}:{stat.st_size}:{stat.st_mtime_ns}"
+        seconds, channels, rate = info
+        return MusicTrack(music_id, name, path, key, round(seconds, 3), channels, rate)
+
+    def tracks(self) -> List[MusicTrack]:
+        """Library tracks, by name"""
+        if not os.path.isdir(self.library_dir):
+            return []
+        found = []
+        for filename in sorted(os.listdir(self.library_dir)):
+            stem, extension = os.path.splitext(filename)
+            if extension.lower() != ".wav" or not _MUSIC_ID.match(f"library:{stem}"):
+                continue
+            track = self._track(f"library:{stem}", stem, os.path.join(self.library_dir, filename))
+            if track is not None:
+                found.append(track)
+        return found
+
+    def resolve(self, music_id: str, db: Optional[Session] = None, device_id: str = "") -> Optional[MusicTrack]:
+        """The track for ``music_id``; uploads only for a device that uploaded them"""
+        match = _MUSIC_ID.match(music_id)
+        if not match:
+            return None
+        kind, ident = match.groups()
+        if kind == "upload" and (db is None or self._owned(db, device_id, ident) is None):
+            return None
+        path = os.path.join(self.library_dir, f"{ident}.wav") if kind == "library" else self._upload_path(ident)
+        if not os.path.isfile(path):
+            return None
+        return self._track(music_id, ident, path)
+
+    def _store(self, file: BinaryIO, max_bytes: int) -> tuple:
+        """Copy an upload into the upload directory, hashing as it goes"""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        temp_path = os.path.join(self.upload_dir, f"{uuid.uuid4()}.part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, "wb") as out:
+                while chunk := file.read(COPY_CHUNK):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise MusicError(f"Music uploads are limited to {max_bytes // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, digest.hexdigest()[:32]
+
+    @staticmethod
+    def _owned(db: Session, device_id: str, ident: str) -> Optional[MusicUpload]:
+        return db.query(MusicUpload).filter_by(device_id=device_id, ident=ident).first()
+
+    def uploads(self, db: Session, device_id: str) -> List[MusicTrack]:
+        """A device's uploads, oldest first"""
+        rows = db.query(MusicUpload).filter_by(device_id=device_id).order_by(MusicUpload.id).all()
+        tracks = (self._track(f"upload:{row.ident}", row.ident, self._upload_path(row.ident)) for row in rows)
+        return [track for track in tracks if track is not None]
+
+    def _upload_path(self, ident: str) -> str:
+        return os.path.join(self.upload_dir, f"{ident}.wav")
+
+    def _check_quota(self, db: Session, device_id: str, size: int):
+        count, stored = db.query(func.count(MusicUpload.id), func.coalesce(func.sum(MusicUpload.size), 0)).filter(
+            MusicUpload.device_id == device_id
+        ).one()
+        if count >= settings.MUSIC_MAX_UPLOADS_PER_DEVICE:
+            raise MusicError(
+                f"Devices can keep {settings.MUSIC_MAX_UPLOADS_PER_DEVICE} music uploads; delete one to add another"
+            )
+        if stored + size > settings.MUSIC_MAX_DEVICE_MB * 1024 * 1024:
+            raise MusicError(f"Music uploads are limited to {settings.MUSIC_MAX_DEVICE_MB} MB per device")
+
+    async def save_upload(self, db: Session, device_id: str, file: BinaryIO, max_bytes: int) -> MusicTrack:
+        """Store an uploaded track (WAV, or anything ffmpeg reads) for ``device_id`` and return it"""
+        temp_path, ident = await asyncio.to_thread(self._store, file, max_bytes)
+        music_id = f"upload:{ident}"
+        path = self._upload_path(ident)
+        converted = f"{temp_path}.wav"
+        created = False
+        try:
+            if not os.path.exists(path):
+                if _wav_info(temp_path) is not None:
+                    os.replace(temp_path, path)
+                elif not can_transcode():
+                    raise MusicError("Upload music as 16-bit WAV; other formats need ffmpeg on the server")
+                elif not await transcode(temp_path, converted, "wav", output_args=(
+                    "-t", str(settings.MUSIC_MAX_SECONDS),
+                    "-ar", str(CONVERTED_RATE),
+                    "-ac", str(CONVERTED_CHANNELS),
+                )):
+                    raise MusicError("Couldn't read the uploaded music")
+                else:
+                    os.replace(converted, path)
+                created = True
+        finally:
+            for leftover in (temp_path, converted):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        if self._owned(db, device_id, ident) is None:
+            size = os.path.getsize(path)
+            try:
+                self._check_quota(db, device_id, size)
+            except MusicError:
+                if created and not db.query(MusicUpload.id).filter_by(ident=ident).first():
+                    os.remove(path)
+                raise
+            db.add(MusicUpload(device_id=device_id, ident=ident, size=size))
+            db.commit()
+        return self._track(music_id, ident, path)
+
+    def delete_upload(self, db: Session, device_id: str, music_id: str) -> bool:
+        """Drop a device's upload; the file goes once no device has it"""
+        match = _MUSIC_ID.match(music_id)
+        if not match or match.group(1) != "upload":
+            return False
+        ident = match.group(2)
+        row = self._owned(db, device_id, ident)
+        if row is None:
+            return False
+        db.delete(row)
+        db.commit()
+        if not db.query(MusicUpload.id).filter_by(ident=ident).first():
+            path = self._upload_path(ident)
+            if os.path.exists(path):
+                os.remove(path)
+        return True
+
+music_library = MusicLibrary()
@@ -0,0 +1,50 @@
+# TTS providers
+from typing import List
+
+from app.config import get_settings
+from app.services.providers.base import ProviderCapabilities, TTSProvider, VoiceInfo
+from app.services.providers.registry import ProviderRegistry
+from app.services.providers.openai import OpenAIProvider
+from app.services.providers.edge import EdgeProvider
+from app.services.providers.fake import FakeBehavior, FakeProvider
+from app.services.providers.local import LocalProvider
+
+settings = get_settings()
+
+PROVIDER_MODES = ("live", "fake")
+
+
+def build_registry(mode: str = settings.TTS_PROVIDER_MODE) -> ProviderRegistry:
+    """The configured providers; in ``fake`` mode, offline stand-ins for them"""
+    if mode not in PROVIDER_MODES:
+        raise ValueError(f"Invalid TTS_PROVIDER_MODE: {mode}")
+    providers: List[TTSProvider] = [OpenAIProvider(), EdgeProvider()]
+    # Offline voices are opt-in: they need piper-tts and downloaded models
+    if settings.LOCAL_TTS_MODEL_DIR:
+        providers.append(LocalProvider(settings.LOCAL_TTS_MODEL_DIR, settings.LOCAL_TTS_WORKERS))
+
+    built = ProviderRegistry()
+    if mode == "fake":
+        behavior = FakeBehavior.from_settings(settings)
+        providers = [FakeProvider(behavior=behavior, imitating=p) for p in providers]
+        providers.append(FakeProvider(behavior=behavior))
+    for provider in providers:
+        built.register(provider)
+    return built
+
+
+registry = build_registry()
+
+__all__ = [
+    "ProviderCapabilities",
+    "TTSProvider",
+    "VoiceInfo",
+    "ProviderRegistry",
+    "OpenAIProvider",
+    "EdgeProvider",
+    "FakeBehavior",
+    "FakeProvider",
+    "LocalProvider",
+    "build_registry",
+    "registry",
+]
@@ -0,0 +1,97 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional
+
+from app.services.retry import RetryPolicy
+
+
+@dataclass(frozen=True)
+class ProviderCapabilities:
+    """What a provider can do, used for validation, routing and tuning.
+
+    ``formats`` are produced natively (anything else is transcoded locally),
+    ``max_chars`` is the longest text accepted in one upstream call (longer
+    text is split at sentence boundaries), and ``max_concurrency`` caps
+    in-flight upstream calls from this process.
+    """
+    max_chars: int
+    formats: FrozenSet[str] = frozenset({"mp3"})
+    streaming: bool = False
+    batching: bool = False
+    pitch: bool = False
+    bitrate: bool = False
+    max_concurrency: int = 8
+
+
+@dataclass
+class VoiceInfo:
+    """A catalog entry; ``voice`` is the provider-local name"""
+    voice: str
+    name: str
+    gender: str
+    language: str
+    locale: str
+    description: Optional[str] = None
+    extra: Dict[str, str] = field(default_factory=dict)
+
+
+class TTSProvider(ABC):
+    """A speech synthesis backend addressed as ``<name>:<voice>``"""
+
+    name: str
+    display_name: str
+    capabilities: ProviderCapabilities
+
+    def has_voice(self, voice: str) -> bool:
+        return any(v.voice == voice for v in self.voices())
+
+    @abstractmethod
+    def voices(self) -> List[VoiceInfo]:
+        """Voices shown in the catalog"""
+
+    def speed_setting(self, speed: float) -> str:
+        """Provider-specific rendering of ``speed``; part of the cache key"""
+        return f"{speed:.2f}"
+
+    def native_format(self, audio_format: str, bitrate: Optional[int] = None) -> Optional[str]:
+        """Format to request upstream, or None if the output must be transcoded"""
+        if audio_format not in self.capabilities.formats:
+            return None
+        if bitrate is not None and not self.capabilities.bitrate:
+            return None
+        return audio_format
+
+    def source_format(self, audio_format: str, bitrate: Optional[int] = None) -> str:
+        """What to ask the provider for; lossless when we'll re-encode anyway"""
+        native = self.native_format(audio_format, bitrate)
+        if native:
+            return native
+        if "wav" in self.capabilities.formats:
+            return "wav"
+        return next(iter(sorted(self.capabilities.formats)))
+
+    def retry_policy(self) -> RetryPolicy:
+        """A fresh policy for this provider; TTSService keeps one per provider"""
+        return RetryPolicy()
+
+    def preload(self):
+        """Import SDKs or load models ahead of the first request"""
+
+    def close(self):
+        """Release worker pools or other resources on shutdown"""
+
+    @abstractmethod
+    async def render(
+        self,
+        text: str,
+        voice: str,
+        speed: float,
+        audio_format: str,
+        dst_path: str,
+        pitch: str = "+0Hz",
+    ) -> bool:
+        """Synthesize ``text`` into ``dst_path`` in ``audio_format`` (a native format).
+
+        Raise ``UpstreamError`` to have the failure retried (if retryable)
+        or reported; returning False is a fatal failure.
+        """
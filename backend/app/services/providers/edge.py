@@ -0,0 +1,115 @@
+import asyncio
+import os
+import re
+from typing import List
+
+from app.services.providers.base import ProviderCapabilities, TTSProvider, VoiceInfo
+from app.services.retry import RetryPolicy, UpstreamError, is_retryable_status, parse_retry_after
+
+# Common Edge voices shown in the catalog; voices are checked against the full
+# upstream list once its snapshot is loaded
+EDGE_VOICES_STATIC = [
+    {"id": "en-US-GuyNeural", "name": "Guy", "gender": "male", "language": "English", "locale": "en-US"},
+    {"id": "en-US-JennyNeural", "name": "Jenny", "gender": "female", "language": "English", "locale": "en-US"},
+    {"id": "en-US-AriaNeural", "name": "Aria", "gender": "female", "language": "English", "locale": "en-US"},
+    {"id": "en-GB-SoniaNeural", "name": "Sonia", "gender": "female", "language": "English", "locale": "en-GB"},
+    {"id": "en-GB-RyanNeural", "name": "Ryan", "gender": "male", "language": "English", "locale": "en-GB"},
+    {"id": "zh-CN-XiaoxiaoNeural", "name": "Xiaoxiao", "gender": "female", "language": "Chinese", "locale": "zh-CN"},
+    {"id": "zh-CN-YunxiNeural", "name": "Yunxi", "gender": "male", "language": "Chinese", "locale": "zh-CN"},
+    {"id": "ja-JP-NanamiNeural", "name": "Nanami", "gender": "female", "language": "Japanese", "locale": "ja-JP"},
+    {"id": "ja-JP-KeitaNeural", "name": "Keita", "gender": "male", "language": "Japanese", "locale": "ja-JP"},
+    {"id": "ko-KR-SunHiNeural", "name": "Sun-Hi", "gender": "female", "language": "Korean", "locale": "ko-KR"},
+    {"id": "ko-KR-InJoonNeural", "name": "InJoon", "gender": "male", "language": "Korean", "locale": "ko-KR"},
+    {"id": "de-DE-KatjaNeural", "name": "Katja", "gender": "female", "language": "German", "locale": "de-DE"},
+    {"id": "de-DE-ConradNeural", "name": "Conrad", "gender": "male", "language": "German", "locale": "de-DE"},
+    {"id": "fr-FR-DeniseNeural", "name": "Denise", "gender": "female", "language": "French", "locale": "fr-FR"},
+    {"id": "fr-FR-HenriNeural", "name": "Henri", "gender": "male", "language": "French", "locale": "fr-FR"},
+    {"id": "es-ES-ElviraNeural", "name": "Elvira", "gender": "female", "language": "Spanish", "locale": "es-ES"},
+    {"id": "es-ES-AlvaroNeural", "name": "Alvaro", "gender": "male", "language": "Spanish", "locale": "es-ES"},
+    {"id": "pt-BR-FranciscaNeural", "name": "Francisca", "gender": "female", "language": "Portuguese", "locale": "pt-BR"},
+    {"id": "it-IT-ElsaNeural", "name": "Elsa", "gender": "female", "language": "Italian", "locale": "it-IT"},
+    {"id": "ru-RU-SvetlanaNeural", "name": "Svetlana", "gender": "female", "language": "Russian", "locale": "ru-RU"},
+    {"id": "hi-IN-SwaraNeural", "name": "Swara", "gender": "female", "language": "Hindi", "locale": "hi-IN"},
+    {"id": "ar-SA-ZariyahNeural", "name": "Zariyah", "gender": "female", "language": "Arabic", "locale": "ar-SA"},
+]
+
+
+# Edge short names (en-US-GuyNeural, zh-CN-liaoning-XiaobeiNeural), accepted
+# until the voice list snapshot has been fetched
+EDGE_SHORT_NAME = re.compile(r"^[a-z]{2,3}(?:-[A-Za-z0-9]+){1,3}-[A-Za-z0-9]+Neural$")
+
+
+class EdgeProvider(TTSProvider):
+    """Microsoft Edge read-aloud voices (free)"""
+
+    name = "edge"
+    display_name = "Edge TTS"
+    capabilities = ProviderCapabilities(
+        max_chars=10000,
+        formats=frozenset({"mp3"}),
+        streaming=True,
+        pitch=True,
+        max_concurrency=8,
+    )
+
+    def has_voice(self, voice: str) -> bool:
+        from app.services.edge_voices import edge_voices
+
+        if edge_voices.voices:
+            return voice in edge_voices.voices
+        return bool(EDGE_SHORT_NAME.match(voice))
+
+    def voices(self) -> List[VoiceInfo]:
+        return [
+            VoiceInfo(
+                voice=ev["id"],
+                name=ev["name"],
+                gender=ev["gender"],
+                language=ev["language"],
+                locale=ev["locale"],
+                description=f"{ev['language']} voice",
+            )
+            for ev in EDGE_VOICES_STATIC
+        ]
+
+    def speed_setting(self, speed: float) -> str:
+        """Edge takes a relative rate string"""
+        return f"{int((speed - 1) * 100):+d}%"
+
+    def retry_policy(self) -> RetryPolicy:
+        # The websocket endpoint throttles bursts; back off a little longer
+        return RetryPolicy(max_attempts=3, base_delay=0.5)
+
+    def preload(self):
+        import edge_tts  # noqa
+
+    async def render(self, text, voice, speed, audio_format, dst_path, pitch="+0Hz") -> bool:
+        import aiohttp
+        import edge_tts
+        from edge_tts.exceptions import NoAudioReceived, WebSocketError
+
+        communicate = edge_tts.Communicate(text, voice, rate=self.speed_setting(speed), pitch=pitch)
+        try:
+            # save() truncates dst_path, so a retry never appends to a partial file
+            await communicate.save(dst_path)
+        except aiohttp.ClientResponseError as e:
+            raise UpstreamError(
+                f"Edge TTS error: {e.status} {e.message}",
+                retryable=is_retryable_status(e.status),
+                status=e.status,
+                retry_after=parse_retry_after(e.headers.get("Retry-After") if e.headers else None),
+            )
+        except NoAudioReceived as e:
+            # Edge sends no audio for a voice or text it won't speak; asking again won't change that
+            raise UpstreamError(f"Edge TTS returned no audio: {e!r}", retryable=False)
+        except (WebSocketError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            raise UpstreamError(f"Edge TTS failed: {e!r}", retryable=True)
+        if not os.path.exists(dst_path) or not os.path.getsize(dst_path):
+            raise UpstreamError("Edge TTS returned no audio", retryable=True)
+        return True
+
+    async def list_all_voices(self) -> list:
+        """The full upstream voice list"""
+        import edge_tts
+
+        return await edge_tts.list_voices()
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import math
+import random
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Callable, List, Optional, Tuple
+
+from app.services.audio_merge import mp3_silence
+from app.services.providers.base import ProviderCapabilities, TTSProvider, VoiceInfo
+from app.services.retry import RetryPolicy, UpstreamError, is_retryable_status
+
+# Roughly 15 characters of speech per second
+MS_PER_CHAR = 66
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """A latency sampler (seconds) from ``"0.05"``, ``"uniform:0.02:0.2"``,
+    ``"normal:0.1:0.03"`` (clipped at 0) or ``"lognormal:0.1:0.5"`` (median, sigma)"""
+    kind, _, args = spec.strip().partition(":")
+    try:
+        if not args:
+            fixed = float(kind or 0)
+            return lambda rng: fixed
+        a, b = (float(x) for x in args.split(":"))
+    except ValueError:
+        raise ValueError(f"Invalid fake latency: {spec}")
+    if kind == "uniform":
+        return lambda rng: rng.uniform(a, b)
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(a, b))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(a), b) if a > 0 else 0.0
+    raise ValueError(f"Invalid fake latency: {spec}")
+
+
+def parse_faults(spec: str) -> List[Tuple[str, float]]:
+    """``"503:0.05,empty:0.01"`` -> ``[("503", 0.05), ("empty", 0.01)]``.
+
+    An HTTP status raises ``UpstreamError`` with that status; ``empty``
+    returns no audio.
+    """
+    faults = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        outcome, _, probability = part.partition(":")
+        try:
+            chance = float(probability)
+        except ValueError:
+            raise ValueError(f"Invalid fake fault: {part}")
+        if (outcome != "empty" and not outcome.isdigit()) or not 0 <= chance <= 1:
+            raise ValueError(f"Invalid fake fault: {part}")
+        faults.append((outcome, chance))
+    if sum(chance for _, chance in faults) > 1:
+        raise ValueError(f"Fake fault probabilities add up to more than 1: {spec}")
+    return faults
+
+
+@dataclass(frozen=True)
+class FakeBehavior:
+    """How a fake provider responds: latency, streaming cadence and faults.
+
+    ``latency`` and ``faults`` are specs for ``parse_latency`` and
+    ``parse_faults``. Audio is written ``chunk_ms`` of speech at a time,
+    ``chunk_interval_ms`` apart, like a streaming upstream (0 writes it all
+    at once). Each call's draws are seeded from ``seed``, the voice, the
+    text and how many times that text was rendered before, so a run is
+    repeatable however its requests interleave.
+    """
+    latency: str = "0"
+    chunk_ms: int = 0
+    chunk_interval_ms: float = 0.0
+    faults: str = ""
+    seed: int = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "FakeBehavior":
+        return cls(
+            latency=settings.FAKE_TTS_LATENCY,
+            chunk_ms=settings.FAKE_TTS_CHUNK_MS,
+            chunk_interval_ms=settings.FAKE_TTS_CHUNK_INTERVAL_MS,
+            faults=settings.FAKE_TTS_FAULTS,
+            seed=settings.FAKE_TTS_SEED,
+        )
+
+
+class FakeProvider(TTSProvider):
+    """Offline provider for tests, benchmarks and ``TTS_PROVIDER_MODE=fake``.
+
+    Produces valid (silent) MP3 whose length is proportional to the text,
+    after an optional fixed ``latency`` in seconds plus whatever ``behavior``
+    adds. Not registered by default. With ``imitating``, it stands in for a
+    real provider: same name, voices, limits, speed setting and retry
+    policy, so voice ids, cache keys and pricing work as they would live.
+    """
+
+    name = "fake"
+    display_name = "Fake"
+    capabilities = ProviderCapabilities(
+        max_chars=5000,
+        formats=frozenset({"mp3"}),
+        streaming=True,
+        batching=True,
+        pitch=True,
+        max_concurrency=64,
+    )
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        behavior: FakeBehavior = FakeBehavior(),
+        imitating: Optional[TTSProvider] = None,
+    ):
+        self.latency = latency
+        self.behavior = behavior
+        self.imitating = imitating
+        self.calls = 0
+        self._sample_latency = parse_latency(behavior.latency)
+        self._faults = parse_faults(behavior.faults)
+        self._renders: Counter = Counter()
+        if imitating is not None:
+            self.name = imitating.name
+            self.display_name = imitating.display_name
+            # MP3 is all this renders; other formats are transcoded as for Edge
+            self.capabilities = replace(imitating.capabilities, formats=frozenset({"mp3"}), bitrate=False)
+
+    def has_voice(self, voice: str) -> bool:
+        if self.imitating is not None:
+            return self.imitating.has_voice(voice)
+        return bool(voice)
+
+    def voices(self) -> List[VoiceInfo]:
+        if self.imitating is not None:
+            return self.imitating.voices()
+        return [VoiceInfo(voice="default", name="Fake", gender="neutral", language="English", locale="en-US")]
+
+    def speed_setting(self, speed: float) -> str:
+        if self.imitating is not None:
+            return self.imitating.speed_setting(speed)
+        return super().speed_setting(speed)
+
+    def retry_policy(self) -> RetryPolicy:
+        if self.imitating is not None:
+            return self.imitating.retry_policy()
+        return super().retry_policy()
+
+    def _rng(self, voice: str, text: str) -> random.Random:
+        key = hashlib.sha256(f"{voice}\x1f{text}".encode()).hexdigest()[:16]
+        attempt = self._renders[key]
+        self._renders[key] += 1
+        return random.Random(f"{self.behavior.seed}:{key}:{attempt}")
+
+    def _fault(self, rng: random.Random) -> Optional[str]:
+        draw = rng.random()
+        for outcome, chance in self._faults:
+            if draw < chance:
+                return outcome
+            draw -= chance
+        return None
+
+    async def render(self, text, voice, speed, audio_format, dst_path, pitch="+0Hz") -> bool:
+        self.calls += 1
+        rng = self._rng(voice, text)
+        delay = self.latency + self._sample_latency(rng)
+        if delay:
+            await asyncio.sleep(delay)
+
+        fault = self._fault(rng)
+        if fault == "empty":
+            return False
+        if fault is not None:
+            status = int(fault)
+            raise UpstreamError(
+                f"{self.display_name} TTS failed (injected {status})",
+                retryable=is_retryable_status(status),
+                status=status,
+            )
+
+        audio = mp3_silence(int(len(text) * MS_PER_CHAR / speed))
+        with open(dst_path, "wb") as f:
+            if not self.behavior.chunk_ms:
+                f.write(audio)
+                return True
+            # Whole frames per chunk, so every prefix of the file is valid MP3
+            step = len(mp3_silence(self.behavior.chunk_ms))
+            for start in range(0, len(audio), step):
+                if start and self.behavior.chunk_interval_ms:
+                    await asyncio.sleep(self.behavior.chunk_interval_ms / 1000)
+                f.write(audio[start:start + step])
+                f.flush()
+        return True
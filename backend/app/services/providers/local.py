@@ -0,0 +1,123 @@
+import asyncio
+import glob
+import json
+import multiprocessing
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from app.services.providers.base import ProviderCapabilities, TTSProvider, VoiceInfo
+from app.services.retry import RetryPolicy
+
+# Piper voices loaded in this worker process, by voice name
+_loaded: Dict = {}
+
+
+def _load_voices(model_paths: Dict[str, str]):
+    """Pool initializer: load every model once so workers stay warm"""
+    from piper import PiperVoice
+
+    for voice, path in model_paths.items():
+        _loaded[voice] = PiperVoice.load(path)
+
+
+def _warm() -> int:
+    return os.getpid()
+
+
+def _synthesize(voice: str, text: str, length_scale: float, dst_path: str) -> bool:
+    model = _loaded.get(voice)
+    if model is None:
+        return False
+    with wave.open(dst_path, "wb") as wav_file:
+        model.synthesize(text, wav_file, length_scale=length_scale)
+    return True
+
+
+def discover_voices(model_dir: str) -> Dict[str, dict]:
+    """Piper models in ``model_dir``: ``<voice>.onnx`` with a ``<voice>.onnx.json`` config"""
+    voices = {}
+    for path in sorted(glob.glob(os.path.join(model_dir, "*.onnx"))):
+        config_path = f"{path}.json"
+        if not os.path.exists(config_path):
+            continue
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+        voices[os.path.basename(path)[:-len(".onnx")]] = {"path": path, "config": config}
+    return voices
+
+
+class LocalProvider(TTSProvider):
+    """Offline CPU synthesis with Piper voices.
+
+    Inference is CPU-bound, so it runs in a process pool with one worker
+    per core by default. Each worker loads every model once when it starts
+    and keeps it for its lifetime; ``preload`` starts all workers up front.
+    Voices are the models found in ``model_dir``.
+    """
+
+    name = "local"
+    display_name = "Local"
+
+    def __init__(self, model_dir: str, workers: int = 0):
+        self.model_dir = model_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.capabilities = ProviderCapabilities(
+            max_chars=2000,
+            formats=frozenset({"wav"}),
+            max_concurrency=self.workers,
+        )
+        self._models = discover_voices(model_dir)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def has_voice(self, voice: str) -> bool:
+        return voice in self._models
+
+    def voices(self) -> List[VoiceInfo]:
+        voices = []
+        for voice, model in self._models.items():
+            config = model["config"]
+            language = config.get("language", {})
+            dataset = config.get("dataset", voice)
+            quality = config.get("audio", {}).get("quality")
+            voices.append(VoiceInfo(
+                voice=voice,
+                name=dataset.replace("_", " ").title(),
+                gender="neutral",
+                language=language.get("name_english", "English"),
+                locale=language.get("code", "en_US").replace("_", "-"),
+                description=f"Offline voice ({quality})" if quality else "Offline voice",
+            ))
+        return voices
+
+    def retry_policy(self) -> RetryPolicy:
+        # Failures here are deterministic; there is no upstream to recover
+        return RetryPolicy(max_attempts=1)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: the parent has an event loop and threads running
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_voices,
+                initargs=({voice: model["path"] for voice, model in self._models.items()},),
+            )
+        return self._pool
+
+    def preload(self):
+        # Workers start on demand; one task per worker brings them all up
+        pool = self._executor()
+        for future in [pool.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def render(self, text, voice, speed, audio_format, dst_path, pitch="+0Hz") -> bool:
+        loop = asyncio.get_running_loop()
+        # Piper's length_scale is duration, the inverse of speed
+        return await loop.run_in_executor(self._executor(), _synthesize, voice, text, 1 / speed, dst_path)
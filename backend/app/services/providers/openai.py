@@ -0,0 +1,85 @@
+from typing import List
+
+from app.config import get_settings
+from app.services.http_client import get_http_client
+from app.services.providers.base import ProviderCapabilities, TTSProvider, VoiceInfo
+from app.services.retry import UpstreamError, is_retryable_status, parse_retry_after
+from app.tracing import inject_headers
+
+settings = get_settings()
+
+
+class OpenAIProvider(TTSProvider):
+    """OpenAI TTS through the LLM proxy"""
+
+    name = "openai"
+    display_name = "OpenAI"
+    capabilities = ProviderCapabilities(
+        max_chars=4096,
+        formats=frozenset({"mp3", "opus", "aac", "wav", "pcm"}),
+        streaming=True,
+        max_concurrency=16,
+    )
+
+    VOICES = {
+        "alloy": {"name": "Alloy", "gender": "neutral", "description": "Balanced and versatile"},
+        "echo": {"name": "Echo", "gender": "male", "description": "Clear and confident"},
+        "fable": {"name": "Fable", "gender": "female", "description": "Warm and expressive"},
+        "onyx": {"name": "Onyx", "gender": "male", "description": "Deep and authoritative"},
+        "nova": {"name": "Nova", "gender": "female", "description": "Friendly and upbeat"},
+        "shimmer": {"name": "Shimmer", "gender": "female", "description": "Soft and soothing"},
+    }
+
+    def has_voice(self, voice: str) -> bool:
+        return voice in self.VOICES
+
+    def voices(self) -> List[VoiceInfo]:
+        return [
+            VoiceInfo(
+                voice=voice_id,
+                name=info["name"],
+                gender=info["gender"],
+                language="English",
+                locale="en-US",
+                description=info["description"],
+            )
+            for voice_id, info in self.VOICES.items()
+        ]
+
+    def preload(self):
+        import httpx  # noqa
+
+    async def render(self, text, voice, speed, audio_format, dst_path, pitch="+0Hz") -> bool:
+        import httpx
+
+        try:
+            response = await get_http_client().post(
+                f"{settings.LLM_PROXY_URL}/v1/audio/speech",
+                headers=inject_headers({
+                    "Authorization": f"Bearer {settings.LLM_PROXY_KEY}",
+                    "Content-Type": "application/json",
+                }),
+                json={
+                    "model": "tts-1",
+                    "input": text,
+                    "voice": voice,
+                    "response_format": audio_format,
+                    "speed": speed,
+                },
+            )
+        except httpx.TransportError as e:
+            # Connect/read failures, timeouts and bodies cut short by a reset
+            raise UpstreamError(f"OpenAI TTS request failed: {e!r}", retryable=True)
+
+        if response.status_code != 200:
+            raise UpstreamError(
+                f"OpenAI TTS error: {response.status_code} - {response.text[:200]}",
+                retryable=is_retryable_status(response.status_code),
+                status=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("retry-after")),
+            )
+        if not response.content:
+            raise UpstreamError("OpenAI TTS returned no audio", retryable=True, status=200)
+        with open(dst_path, "wb") as f:
+            f.write(response.content)
+        return True
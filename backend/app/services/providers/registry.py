@@ -0,0 +1,28 @@
+from typing import Dict, List, Optional
+
+from app.services.providers.base import TTSProvider
+
+
+class ProviderRegistry:
+    """Providers by name; routers, the voice catalog and TTSService look them up here"""
+
+    def __init__(self):
+        self._providers: Dict[str, TTSProvider] = {}
+
+    def register(self, provider: TTSProvider):
+        self._providers[provider.name] = provider
+
+    def unregister(self, name: str):
+        self._providers.pop(name, None)
+
+    def get(self, name: str) -> Optional[TTSProvider]:
+        return self._providers.get(name.lower())
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._providers
+
+    def all(self) -> List[TTSProvider]:
+        return list(self._providers.values())
+
+    def names(self) -> List[str]:
+        return list(self._providers)
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.metrics import free_trial_used, tokens_consumed, TOOL_NAME
+from app.models import CHARACTERS_PER_TOKEN, CreditHold, FreeTrialUsage, GenerationToken
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Upstream cost relative to Edge, keyed by registry name; providers missing
+# here are priced at the top tier
+PROVIDER_TIERS = {"openai": "premium", "edge": "standard", "local": "economy", "fake": "standard"}
+TIER_RATES = {"premium": 2.0, "standard": 1.0, "economy": 0.5}
+
+NO_TOKENS = "No tokens remaining. Please purchase more to continue."
+
+
+class QuotaExceeded(Exception):
+    """Raised when a device can't cover a request; ``detail`` is user-facing"""
+
+    def __init__(self, detail: str = NO_TOKENS):
+        super().__init__(detail)
+        self.detail = detail
+
+
+@dataclass
+class Reservation:
+    """Credits held for one request until it's settled or released.
+
+    ``access_type`` is ``free_trial`` (nothing is held or charged) or ``paid``;
+    a paid hold is the ``CreditHold`` row ``hold_id``.
+    """
+    device_id: str
+    access_type: str
+    credits: int = 0
+    hold_id: Optional[int] = None
+
+
+def tier_for(provider: str) -> str:
+    return PROVIDER_TIERS.get(provider.lower(), "premium")
+
+
+def cost(usage: Dict[str, int]) -> int:
+    """Credits for ``{provider: characters}``; one credit is one standard-tier character"""
+    return sum(math.ceil(characters * TIER_RATES[tier_for(provider)]) for provider, characters in usage.items())
+
+
+def _claim_free_trial(db: Session, device_id: str) -> bool:
+    free_trial = db.query(FreeTrialUsage).filter(FreeTrialUsage.device_id == device_id).first()
+    if free_trial and free_trial.used:
+        return False
+    if free_trial:
+        free_trial.used = True
+    else:
+        db.add(FreeTrialUsage(device_id=device_id, used=True))
+    db.commit()
+    free_trial_used.labels(tool=TOOL_NAME).inc()
+    return True
+
+
+def reserve(db: Session, device_id: str, credits: int, use_free_trial: bool = True) -> Reservation:
+    """Hold ``credits`` before synthesis.
+
+    A device's first generation is covered by its free trial regardless of
+    length. Otherwise the hold is one conditional UPDATE, so concurrent
+    requests can't both spend the same balance. Commits immediately; the
+    hold must be visible to other requests while this one synthesizes.
+    It's leased for ``CREDIT_HOLD_LEASE_SECONDS`` in case the worker dies
+    before settling.
+    """
+    if use_free_trial and _claim_free_trial(db, device_id):
+        return Reservation(device_id, "free_trial")
+    reservation = Reservation(device_id, "paid")
+    if _hold(db, reservation, credits):
+        return reservation
+    _raise_exceeded(db, device_id, credits)
+
+
+def extend(db: Session, reservation: Reservation, credits: int):
+    """Add ``credits`` to a paid hold, e.g. as a streaming session grows.
+
+    Commits like ``reserve`` and renews the lease; raises ``QuotaExceeded``
+    and leaves the hold as it was when the balance can't cover the extra
+    credits.
+    """
+    if reservation.access_type != "paid":
+        return
+    if not _hold(db, reservation, credits):
+        _raise_exceeded(db, reservation.device_id, credits)
+
+
+def renew(db: Session, reservation: Reservation):
+    """Push a paid hold's lease out again, for work that outlasts one lease"""
+    if reservation.hold_id is None:
+        return
+    db.execute(
+        update(CreditHold)
+        .where(CreditHold.id == reservation.hold_id)
+        .values(expires_at=datetime.utcnow() + timedelta(seconds=settings.CREDIT_HOLD_LEASE_SECONDS))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def _hold(db: Session, reservation: Reservation, credits: int) -> bool:
+    available = (
+        GenerationToken.total_tokens * CHARACTERS_PER_TOKEN
+        - GenerationToken.used_credits
+        - GenerationToken.reserved_credits
+    )
+    result = db.execute(
+        update(GenerationToken)
+        .where(GenerationToken.device_id == reservation.device_id, available >= max(credits, 1))
+        .values(reserved_credits=GenerationToken.reserved_credits + credits)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        db.commit()
+        return False
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.CREDIT_HOLD_LEASE_SECONDS)
+    if reservation.hold_id is None:
+        hold = CreditHold(device_id=reservation.device_id, credits=credits, expires_at=expires_at)
+        db.add(hold)
+        db.flush()
+        reservation.hold_id = hold.id
+    else:
+        db.execute(
+            update(CreditHold)
+            .where(CreditHold.id == reservation.hold_id)
+            .values(credits=CreditHold.credits + credits, expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    reservation.credits += credits
+    return True
+
+
+def _raise_exceeded(db: Session, device_id: str, credits: int):
+    record = db.query(GenerationToken).filter(GenerationToken.device_id == device_id).first()
+    if record and record.remaining_credits > 0:
+        raise QuotaExceeded(
+            f"Not enough tokens for this request ({credits / CHARACTERS_PER_TOKEN:.2f} needed, "
+            f"{record.remaining_credits / CHARACTERS_PER_TOKEN:.2f} left). Please purchase more to continue."
+        )
+    raise QuotaExceeded()
+
+
+def settle(db: Session, reservation: Reservation, credits: int):
+    """Replace the hold with the final charge in the caller's transaction.
+
+    Doesn't commit: callers commit it together with the generation rows
+    and rollups, so billing adds no round trip of its own. ``used_tokens``
+    is kept as the whole tokens started, for display. A hold that already
+    expired was handed back by ``release_expired_holds``; only the charge
+    applies then.
+    """
+    if reservation.access_type != "paid":
+        return
+    held = reservation.credits
+    if reservation.hold_id is not None:
+        removed = db.execute(delete(CreditHold).where(CreditHold.id == reservation.hold_id))
+        held = held if removed.rowcount else 0
+        reservation.hold_id = None
+    db.execute(
+        update(GenerationToken)
+        .where(GenerationToken.device_id == reservation.device_id)
+        .values(
+            reserved_credits=GenerationToken.reserved_credits - held,
+            used_credits=GenerationToken.used_credits + credits,
+            used_tokens=(GenerationToken.used_credits + credits + CHARACTERS_PER_TOKEN - 1) // CHARACTERS_PER_TOKEN,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    reservation.credits = 0
+    if credits:
+        tokens_consumed.labels(tool=TOOL_NAME).inc(credits / CHARACTERS_PER_TOKEN)
+
+
+def release(db: Session, reservation: Reservation, restore_free_trial: bool = False):
+    """Drop a hold without charging (synthesis failed or was abandoned).
+
+    With ``restore_free_trial`` a free trial claimed for the request is
+    handed back too, for requests the server cut off (e.g. at shutdown).
+    """
+    if restore_free_trial and reservation.access_type == "free_trial":
+        db.query(FreeTrialUsage).filter(FreeTrialUsage.device_id == reservation.device_id).update(
+            {FreeTrialUsage.used: False}, synchronize_session=False
+        )
+    settle(db, reservation, 0)
+
+
+def release_expired_holds(db: Session, now: Optional[datetime] = None) -> int:
+    """Hand back holds whose lease ran out, e.g. after a worker was killed
+    between ``reserve`` and ``settle``. Returns how many were released.
+    """
+    expired = db.query(CreditHold).filter(CreditHold.expires_at <= (now or datetime.utcnow())).all()
+    released = 0
+    for hold in expired:
+        # Deleting by id first means a request settling concurrently either
+        # removes the hold itself or finds it gone; credits are returned once
+        if not db.execute(delete(CreditHold).where(CreditHold.id == hold.id)).rowcount:
+            continue
+        db.execute(
+            update(GenerationToken)
+            .where(GenerationToken.device_id == hold.device_id)
+            .values(reserved_credits=GenerationToken.reserved_credits - hold.credits)
+            .execution_options(synchronize_session=False)
+        )
+        released += 1
+    db.commit()
+    return released
+
+
+async def run_hold_sweeper():
+    """Background task: release expired holds at startup, then periodically"""
+    while True:
+        db = SessionLocal()
+        try:
+            released = await asyncio.to_thread(release_expired_holds, db)
+            if released:
+                logger.warning("released %d expired credit holds", released)
+        except Exception:
+            logger.exception("credit hold sweep failed")
+        finally:
+            db.close()
+        await asyncio.sleep(settings.CREDIT_HOLD_SWEEP_SECONDS)
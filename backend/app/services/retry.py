@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.metrics import tts_upstream_retries, TOOL_NAME
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Statuses worth another attempt; everything else (bad voice, auth, 4xx) is final
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class UpstreamError(Exception):
+    """A failed upstream call, classified for the retry policy.
+
+    ``retry_after`` is the server's requested delay in seconds, if it sent one.
+    """
+
+    def __init__(self, message: str, retryable: bool, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+        self.retry_after = retry_after
+
+
+def is_retryable_status(status: int) -> bool:
+    return status in RETRYABLE_STATUSES
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a ``Retry-After`` header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return max(0.0, (at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent traffic.
+
+    Every first attempt deposits ``ratio`` tokens and every retry spends one,
+    so during an outage retries add at most ``ratio`` extra load instead of
+    multiplying it by the attempt count. ``min_per_second`` keeps a trickle
+    of retries available when traffic is low.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+
+    def _refill(self, amount: float = 0.0):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second + amount)
+        self._updated = now
+
+    def deposit(self):
+        self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by a shared budget.
+
+    A server ``Retry-After`` overrides the computed delay. One longer than
+    ``max_delay`` is not cut short, since retrying early would only be
+    throttled again; the call fails fast instead so the caller can fall back.
+    """
+    max_attempts: int = 3
+    base_delay: float = 0.25
+    max_delay: float = 8.0
+    budget: RetryBudget = field(default_factory=RetryBudget)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    async def run(self, call: Callable[[], Awaitable[T]], provider: str) -> T:
+        """Await ``call()`` until it succeeds, fails fatally or retries run out"""
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                return await call()
+            except UpstreamError as e:
+                error = e
+            if not error.retryable:
+                raise error
+            if attempt >= self.max_attempts:
+                tts_upstream_retries.labels(tool=TOOL_NAME, provider=provider, result="exhausted").inc()
+                raise error
+            if error.retry_after is not None and error.retry_after > self.max_delay:
+                tts_upstream_retries.labels(tool=TOOL_NAME, provider=provider, result="retry_after").inc()
+                logger.warning(
+                    "upstream asked to wait longer than max_delay",
+                    extra={"provider": provider, "attempt": attempt, "status": error.status, "retry_after": error.retry_after},
+                )
+                raise error
+            if not self.budget.withdraw():
+                tts_upstream_retries.labels(tool=TOOL_NAME, provider=provider, result="budget").inc()
+                logger.warning(
+                    "upstream retry budget exhausted",
+                    extra={"provider": provider, "attempt": attempt, "status": error.status, "error": str(error)},
+                )
+                raise error
+
+            delay = self.backoff(attempt) if error.retry_after is None else error.retry_after
+            tts_upstream_retries.labels(tool=TOOL_NAME, provider=provider, result="retried").inc()
+            logger.info(
+                "retrying upstream call",
+                extra={
+                    "provider": provider,
+                    "attempt": attempt,
+                    "status": error.status,
+                    "delay": round(delay, 3),
+                    "error": str(error),
+                },
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
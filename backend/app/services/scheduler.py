@@ -0,0 +1,134 @@
+import asyncio
+import json
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, Optional
+
+from app.config import get_settings
+from app.metrics import tts_priority_latency, tts_queue_wait, TOOL_NAME
+
+settings = get_settings()
+
+# Scheduling classes, highest priority first
+PRIORITY_CLASSES = ("paid", "free_trial", "preview")
+DEFAULT_PRIORITY = "paid"
+
+_priority: ContextVar[str] = ContextVar("priority_class", default=DEFAULT_PRIORITY)
+
+
+def load_weights(raw: str = settings.TTS_PRIORITY_WEIGHTS) -> Dict[str, float]:
+    weights = {name: float(weight) for name, weight in json.loads(raw).items()}
+    unknown = set(weights) - set(PRIORITY_CLASSES)
+    if unknown or any(weight <= 0 for weight in weights.values()):
+        raise ValueError(f"Invalid TTS_PRIORITY_WEIGHTS: {raw}")
+    return {name: weights.get(name, 1.0) for name in PRIORITY_CLASSES}
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """Schedule provider calls made in this block as class ``name``.
+
+    Rides a contextvar like tracing spans, so it reaches provider calls in
+    tasks started inside the block. Also times the block per class.
+    """
+    if name not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class: {name}")
+    token = _priority.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+        tts_priority_latency.labels(tool=TOOL_NAME, priority=name).observe(time.perf_counter() - start)
+
+
+class FairLimiter:
+    """A concurrency limit whose waiters are served by weighted fair queueing.
+
+    Below ``capacity`` callers go straight through. Once it is saturated,
+    each class waits in its own FIFO queue and freed slots go to the class
+    with the lowest virtual finish time (stride scheduling): under load a
+    class with weight 8 gets eight slots for every one a weight-1 class
+    gets, and no backlogged class is starved. A class returning from idle
+    starts at the current virtual time, so idling doesn't bank credit.
+    """
+
+    def __init__(self, capacity: int, weights: Dict[str, float], provider: str = ""):
+        self.capacity = capacity
+        self.weights = weights
+        self.provider = provider
+        self.active = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {name: deque() for name in weights}
+        self._pass: Dict[str, float] = {name: 0.0 for name in weights}
+        self._vtime = 0.0
+
+    def waiting(self, name: Optional[str] = None) -> int:
+        if name is not None:
+            return len(self._queues[name])
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _charge(self, name: str):
+        self._vtime = max(self._vtime, self._pass[name])
+        self._pass[name] = max(self._pass[name], self._vtime) + 1 / self.weights[name]
+
+    def _dispatch(self):
+        while self.active < self.capacity:
+            backlogged = [name for name, queue in self._queues.items() if queue]
+            if not backlogged:
+                return
+            # Lowest virtual finish time wins; ties go to the higher class
+            name = min(
+                backlogged,
+                key=lambda n: (self._pass[n] + 1 / self.weights[n], PRIORITY_CLASSES.index(n)),
+            )
+            waiter = self._queues[name].popleft()
+            if waiter.done():
+                # Cancelled before its task got to leave the queue
+                continue
+            self.active += 1
+            self._charge(name)
+            waiter.set_result(None)
+
+    async def acquire(self, name: str):
+        start = time.perf_counter()
+        if self.active < self.capacity and not self.waiting():
+            self.active += 1
+            self._charge(name)
+        else:
+            if not self._queues[name]:
+                self._pass[name] = max(self._pass[name], self._vtime)
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues[name].append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted just as we were cancelled; hand the slot on
+                    self.release()
+                elif waiter in self._queues[name]:
+                    # _dispatch may already have dropped it
+                    self._queues[name].remove(waiter)
+                raise
+        tts_queue_wait.labels(tool=TOOL_NAME, provider=self.provider, priority=name).observe(
+            time.perf_counter() - start
+        )
+
+    def release(self):
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, name: Optional[str] = None):
+        """Hold a slot for the current (or given) priority class"""
+        name = name or current_priority()
+        await self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,69 @@
+import re
+from typing import List
+
+# Terminal punctuation that ends a sentence once followed by whitespace
+_TERMINATORS = ".!?…"
+# CJK full-width terminators end a sentence on their own
+_CJK_TERMINATORS = "。！？"
+_CLOSERS = "\"'”’)]」』"
+
+# Abbreviations whose trailing period does not end a sentence
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc",
+    "e.g", "i.e", "no", "fig", "inc", "ltd", "co", "mt",
+}
+
+_SENTENCE_END = re.compile(
+    rf"[{re.escape(_TERMINATORS)}]+[{re.escape(_CLOSERS)}]*(?=\s)"
+    rf"|[{re.escape(_CJK_TERMINATORS)}]+[{re.escape(_CLOSERS)}]*"
+)
+
+
+class SentenceSplitter:
+    """Incrementally split streamed text into complete sentences.
+
+    ``feed`` returns every sentence completed by the new text and keeps the
+    unfinished tail buffered; ``flush`` returns whatever is left at the end of
+    the stream. A sentence that grows past ``max_length`` without a boundary
+    is cut at the last whitespace so synthesis can start anyway.
+    """
+
+    def __init__(self, max_length: int = 400):
+        self.max_length = max_length
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            end = match.end()
+            candidate = self._buffer[start:end]
+            if self._ends_with_abbreviation(candidate):
+                continue
+            sentence = candidate.strip()
+            if sentence:
+                sentences.append(sentence)
+            start = end
+        self._buffer = self._buffer[start:]
+
+        while len(self._buffer) > self.max_length:
+            cut = self._buffer.rfind(" ", 0, self.max_length)
+            if cut <= 0:
+                cut = self.max_length
+            head, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if head:
+                sentences.append(head)
+        return sentences
+
+    def flush(self) -> List[str]:
+        tail, self._buffer = self._buffer.strip(), ""
+        return [tail] if tail else []
+
+    @staticmethod
+    def _ends_with_abbreviation(candidate: str) -> bool:
+        stripped = candidate.rstrip(_CLOSERS)
+        if not stripped.endswith(".") or stripped.endswith(".."):
+            return False
+        words = stripped[:-1].split()
+        return bool(words) and words[-1].lower() in _ABBREVIATIONS
@@ -0,0 +1,190 @@
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import List, Optional
+
+MAX_SEGMENTS = 50
+MAX_BREAK_MS = 10_000
+MIN_SPEED = 0.5
+MAX_SPEED = 2.0
+
+_RATE_KEYWORDS = {"x-slow": 0.5, "slow": 0.75, "medium": 1.0, "default": 1.0, "fast": 1.25, "x-fast": 1.5}
+_PITCH_KEYWORDS = {"x-low": "-20Hz", "low": "-10Hz", "medium": "+0Hz", "default": "+0Hz", "high": "+10Hz", "x-high": "+20Hz"}
+_STRENGTH_MS = {"none": 0, "x-weak": 100, "weak": 200, "medium": 400, "strong": 700, "x-strong": 1000}
+_HZ = re.compile(r"^[+-]\d+Hz$")
+_TIME = re.compile(r"^(\d+(?:\.\d+)?)(ms|s)$")
+# Entities can only be declared in a DTD, so refusing DOCTYPE rules out
+# entity expansion ("billion laughs") and external entity fetches
+_DTD = re.compile(r"<!\s*(?:DOCTYPE|ENTITY)", re.IGNORECASE)
+# Elements whose content is spoken with the inherited settings
+_CONTAINERS = {"speak", "p", "s", "emphasis", "say-as", "sub", "lang", "mark", "audio"}
+# Elements whose text never runs into the text around them
+_BLOCKS = {"p", "s"}
+
+
+class SSMLError(ValueError):
+    """Raised for markup we cannot turn into segments"""
+
+
+@dataclass
+class Segment:
+    """A run of text spoken with one voice and prosody, or a pause.
+
+    Speech segments have ``text`` set; breaks have ``break_ms`` and no text.
+    ``pitch`` is an Edge-style offset (``+5Hz``); OpenAI voices ignore it.
+    """
+    voice_id: str
+    text: str = ""
+    speed: float = 1.0
+    pitch: str = "+0Hz"
+    break_ms: int = 0
+
+    @property
+    def is_break(self) -> bool:
+        return not self.text
+
+    @property
+    def provider(self) -> str:
+        return self.voice_id.split(":", 1)[0].lower()
+
+    @property
+    def voice_name(self) -> str:
+        return self.voice_id.split(":", 1)[1]
+
+
+def is_ssml(text: str) -> bool:
+    return text.lstrip().startswith("<speak")
+
+
+def _parse_rate(value: str, base: float) -> float:
+    value = value.strip().lower()
+    if value in _RATE_KEYWORDS:
+        speed = base * _RATE_KEYWORDS[value]
+    elif value.endswith("%"):
+        try:
+            number = float(value[:-1])
+        except ValueError:
+            raise SSMLError(f"Invalid prosody rate: {value}")
+        # "+20%" is relative to the current rate, "80%" is a fraction of it
+        speed = base * (1 + number / 100 if value[0] in "+-" else number / 100)
+    else:
+        try:
+            speed = base * float(value)
+        except ValueError:
+            raise SSMLError(f"Invalid prosody rate: {value}")
+    return min(max(speed, MIN_SPEED), MAX_SPEED)
+
+
+def _parse_pitch(value: str) -> str:
+    value = value.strip()
+    if value.lower() in _PITCH_KEYWORDS:
+        return _PITCH_KEYWORDS[value.lower()]
+    if _HZ.match(value):
+        return value
+    raise SSMLError(f"Invalid prosody pitch: {value}. Use +NHz/-NHz or x-low..x-high")
+
+
+def _parse_break(element: ET.Element) -> int:
+    time = element.get("time")
+    if time:
+        match = _TIME.match(time.strip().lower())
+        if not match:
+            raise SSMLError(f"Invalid break time: {time}")
+        amount, unit = match.groups()
+        ms = float(amount) * (1000 if unit == "s" else 1)
+    else:
+        ms = _STRENGTH_MS.get(element.get("strength", "medium"), 400)
+    return int(min(ms, MAX_BREAK_MS))
+
+
+def _resolve_voice(name: str) -> str:
+    """Accept ``provider:voice`` or a bare Edge short name like ``en-US-GuyNeural``"""
+    name = name.strip()
+    if ":" in name:
+        return name
+    return f"edge:{name}"
+
+
+def _local(tag: str) -> str:
+    # Strip the SSML namespace, "{http://www.w3.org/2001/10/synthesis}voice" -> "voice"
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_ssml(markup: str, default_voice_id: str, default_speed: float = 1.0) -> List[Segment]:
+    """Turn SSML-like markup into ordered speech and break segments.
+
+    Supports ``<voice name="openai:nova">`` switches (bare Edge short names
+    are accepted), ``<prosody rate=... pitch=...>``, ``<break time=...>`` and
+    ``<sub alias=...>`` (the alias is spoken). Other standard elements are
+    read as plain text. Adjacent text with identical settings is merged into
+    one segment, with a space where a ``<p>`` or ``<s>`` starts or ends.
+    """
+    if _DTD.search(markup):
+        raise SSMLError("SSML must not contain a DOCTYPE or entity declarations")
+    try:
+        root = ET.fromstring(markup.strip())
+    except ET.ParseError as e:
+        raise SSMLError(f"Invalid SSML: {e}")
+    if _local(root.tag) != "speak":
+        raise SSMLError("SSML must have a <speak> root element")
+
+    segments: List[Segment] = []
+    # Set at block boundaries so merged text from either side gets a space
+    boundary = False
+
+    def emit_text(text: Optional[str], voice_id: str, speed: float, pitch: str):
+        nonlocal boundary
+        if not text or not text.strip():
+            return
+        last = segments[-1] if segments else None
+        if last and not last.is_break and (last.voice_id, last.speed, last.pitch) == (voice_id, speed, pitch):
+            if boundary and not last.text[-1].isspace() and not text[0].isspace():
+                last.text += " "
+            last.text += text
+        else:
+            segments.append(Segment(voice_id=voice_id, text=text, speed=speed, pitch=pitch))
+        boundary = False
+
+    # ElementTree keeps text following a child on the child's ``tail``, so
+    # walk children ourselves to emit tails in the parent's context.
+    def visit(element: ET.Element, voice_id: str, speed: float, pitch: str):
+        nonlocal boundary
+        tag = _local(element.tag)
+        if tag == "break":
+            segments.append(Segment(voice_id=voice_id, break_ms=_parse_break(element)))
+        elif tag == "sub" and element.get("alias") is not None:
+            emit_text(element.get("alias"), voice_id, speed, pitch)
+        else:
+            if tag == "voice":
+                name = element.get("name")
+                if not name:
+                    raise SSMLError("<voice> requires a name attribute")
+                voice_id = _resolve_voice(name)
+            elif tag == "prosody":
+                if element.get("rate"):
+                    speed = _parse_rate(element.get("rate"), speed)
+                if element.get("pitch"):
+                    pitch = _parse_pitch(element.get("pitch"))
+            elif tag not in _CONTAINERS:
+                raise SSMLError(f"Unsupported SSML element: <{tag}>")
+            if tag in _BLOCKS:
+                boundary = True
+            emit_text(element.text, voice_id, speed, pitch)
+            for child in element:
+                visit(child, voice_id, speed, pitch)
+                emit_text(child.tail, voice_id, speed, pitch)
+            if tag in _BLOCKS:
+                boundary = True
+        if len(segments) > MAX_SEGMENTS:
+            raise SSMLError(f"Too many segments (max {MAX_SEGMENTS})")
+
+    visit(root, default_voice_id, default_speed, "+0Hz")
+
+    # Drop leading/trailing pauses; they only add silence
+    while segments and segments[0].is_break:
+        segments.pop(0)
+    while segments and segments[-1].is_break:
+        segments.pop()
+    if not any(not s.is_break for s in segments):
+        raise SSMLError("SSML contains no text")
+    return segments
@@ -0,0 +1,271 @@
+import html
+import re
+import unicodedata
+
+# Characters that render as nothing but change the string (and the cache key)
+_INVISIBLE = re.compile("[\u00ad\u200b-\u200f\u2060-\u2064\ufeff]")
+_CONTROL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+
+# SSML / HTML markup: a name right after "<" (or "</"), so "a < b and c > d" is text
+_TAG = re.compile(r"<!--.*?-->|</?[A-Za-z][\w:.-]*(?:\s[^<>]*)?/?>", re.DOTALL)
+
+# Markdown
+_CODE_FENCE = re.compile(r"^\s*(```|~~~).*$", re.MULTILINE)
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+", re.MULTILINE)
+_BLOCKQUOTE = re.compile(r"^\s{0,3}>\s?", re.MULTILINE)
+_LIST_MARKER = re.compile(r"^\s*[-*+]\s+", re.MULTILINE)
+# Numbered items keep their number, read as "1. First"
+_NUMBERED_ITEM = re.compile(r"^\s*(\d+)[.)]\s+", re.MULTILINE)
+_RULE = re.compile(r"^\s*(?:[-*_]\s*){3,}$", re.MULTILINE)
+_EMPHASIS = re.compile(
+    r"(\*{1,3}|~~)(?=\S)(.+?)(?<=\S)\1"
+    r"|(?<!\w)(_{1,3})(?=\S)(.+?)(?<=\S)\3(?!\w)"
+)
+_INLINE_CODE = re.compile(r"`([^`]*)`")
+
+_SPACE_BEFORE_PUNCTUATION = re.compile(r" ([,.;:!?])")
+
+# Abbreviations expanded per language. Keys are matched case-sensitively as
+# whole words including their trailing period.
+ABBREVIATIONS = {
+    "en": {
+        "Mr.": "Mister", "Mrs.": "Missus", "Dr.": "Doctor", "Prof.": "Professor",
+        "St.": "Saint", "Jr.": "Junior", "Sr.": "Senior", "vs.": "versus",
+        "etc.": "et cetera", "e.g.": "for example", "i.e.": "that is",
+        "approx.": "approximately", "No.": "Number",
+    },
+    "de": {
+        "z.B.": "zum Beispiel", "d.h.": "das heißt", "usw.": "und so weiter",
+        "Dr.": "Doktor", "Hr.": "Herr", "Fr.": "Frau", "bzw.": "beziehungsweise",
+    },
+    "fr": {
+        "M.": "Monsieur", "Mme": "Madame", "Mlle": "Mademoiselle", "Dr": "Docteur",
+        "etc.": "et cetera", "p.ex.": "par exemple",
+    },
+    "es": {
+        "Sr.": "Señor", "Sra.": "Señora", "Srta.": "Señorita", "Dr.": "Doctor",
+        "etc.": "etcétera", "p.ej.": "por ejemplo",
+    },
+}
+
+
+def _abbreviation_pattern(table: dict) -> re.Pattern:
+    alternatives = "|".join(re.escape(k) for k in sorted(table, key=len, reverse=True))
+    return re.compile(rf"(?<![\w.])(?:{alternatives})(?!\w)")
+
+
+_ABBREVIATION_PATTERNS = {lang: _abbreviation_pattern(table) for lang, table in ABBREVIATIONS.items()}
+
+_ONES = [
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine",
+    "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen",
+    "seventeen", "eighteen", "nineteen",
+]
+_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+_SCALES = [(10**12, "trillion"), (10**9, "billion"), (10**6, "million"), (1000, "thousand")]
+_ORDINAL_IRREGULAR = {
+    "one": "first", "two": "second", "three": "third", "five": "fifth",
+    "eight": "eighth", "nine": "ninth", "twelve": "twelfth",
+}
+
+_DIGIT = re.compile(r"\d")
+# Decades: 1990s, 80s, '80s
+_DECADE = re.compile(r"(?<![\w.$])'?(?P<digits>\d{1,3}0)s\b")
+# Hyphenated digit groups (phone and account numbers), read digit by digit.
+# Groups of exactly four digits on their own are left to the year reading (1990-1995).
+_DIGIT_GROUPS = re.compile(r"(?<![\w.$-])(?:\(\d{2,4}\)\s?)?\d{3,}(?:-\d{3,})+(?![\w-])")
+_NUMBER = re.compile(
+    r"(?=[-$\d])(?<![\w.$])"
+    r"(?:(?P<currency>\$)|(?P<sign>-))?"
+    r"(?P<int>\d{1,3}(?:,\d{3})+|\d+)"
+    r"(?:\.(?P<frac>\d+))?"
+    r"(?:(?P<ordinal>st|nd|rd|th)\b|(?P<percent>%))?"
+)
+
+
+def _under_thousand(n: int) -> str:
+    words = []
+    if n >= 100:
+        words.append(f"{_ONES[n // 100]} hundred")
+        n %= 100
+    if n >= 20:
+        words.append(_TENS[n // 10] + (f"-{_ONES[n % 10]}" if n % 10 else ""))
+    elif n or not words:
+        words.append(_ONES[n])
+    return " ".join(words)
+
+
+def number_to_words(n: int) -> str:
+    """Spell out a non-negative integer in English"""
+    if n < 1000:
+        return _under_thousand(n)
+    words = []
+    for scale, name in _SCALES:
+        if n >= scale:
+            words.append(f"{number_to_words(n // scale)} {name}")
+            n %= scale
+    if n:
+        words.append(_under_thousand(n))
+    return " ".join(words)
+
+
+def _year_to_words(n: int) -> str:
+    high, low = divmod(n, 100)
+    if low == 0:
+        return f"{_under_thousand(high)} hundred"
+    if low < 10:
+        return f"{_under_thousand(high)} oh {_ONES[low]}"
+    return f"{_under_thousand(high)} {_under_thousand(low)}"
+
+
+def _ordinal(words: str) -> str:
+    head, _, last = words.rpartition(" ")
+    if "-" in last:
+        prefix, _, last = last.rpartition("-")
+        head = f"{head} {prefix}-".strip() if head else f"{prefix}-"
+        joiner = ""
+    else:
+        joiner = " " if head else ""
+    if last in _ORDINAL_IRREGULAR:
+        last = _ORDINAL_IRREGULAR[last]
+    elif last.endswith("y"):
+        last = last[:-1] + "ieth"
+    else:
+        last += "th"
+    return f"{head}{joiner}{last}"
+
+
+def _is_year(raw: str) -> bool:
+    return len(raw) == 4 and raw.isdigit() and (1100 <= int(raw) <= 1999 or 2010 <= int(raw) <= 2099)
+
+
+def _plural(words: str) -> str:
+    if words.endswith("y"):
+        return words[:-1] + "ies"
+    if words.endswith("x"):
+        return words + "es"
+    return words + "s"
+
+
+def _expand_decade_en(match: re.Match) -> str:
+    digits = match.group("digits")
+    if len(digits) not in (2, 4):
+        return match.group(0)
+    value = int(digits)
+    return _plural(_year_to_words(value) if _is_year(digits) else number_to_words(value))
+
+
+def _expand_digit_groups_en(match: re.Match) -> str:
+    groups = re.findall(r"\d+", match.group(0))
+    if not match.group(0).startswith("(") and all(len(group) == 4 for group in groups):
+        return match.group(0)
+    return ", ".join(" ".join(_ONES[int(d)] for d in group) for group in groups)
+
+
+def _expand_number_en(match: re.Match) -> str:
+    raw_int = match.group("int")
+    value = int(raw_int.replace(",", ""))
+    frac = match.group("frac")
+
+    if match.group("ordinal") and not frac:
+        return _ordinal(number_to_words(value))
+
+    if match.group("currency") and frac and len(frac) == 2 and not match.group("sign"):
+        dollars = "dollar" if value == 1 else "dollars"
+        cents = int(frac)
+        if not cents:
+            return f"{number_to_words(value)} {dollars}"
+        return f"{number_to_words(value)} {dollars} and {number_to_words(cents)} {'cent' if cents == 1 else 'cents'}"
+
+    if (
+        not frac
+        and not match.group("currency")
+        and not match.group("percent")
+        and _is_year(raw_int)
+    ):
+        words = _year_to_words(value)
+    else:
+        words = number_to_words(value)
+        if frac:
+            words += " point " + " ".join(_ONES[int(d)] for d in frac)
+
+    if match.group("sign"):
+        words = f"minus {words}"
+    if match.group("percent"):
+        words += " percent"
+    if match.group("currency"):
+        words += " dollar" if value == 1 and not frac else " dollars"
+    return words
+
+
+def _strip_markup(text: str) -> str:
+    # Each pass is gated on a cheap substring check; most scripts need few of them
+    if "<" in text:
+        text = _TAG.sub(" ", text)
+    if "&" in text:
+        text = html.unescape(text)
+    if "```" in text or "~~~" in text:
+        text = _CODE_FENCE.sub(" ", text)
+    if "](" in text:
+        text = _IMAGE.sub(r"\1", text)
+        text = _LINK.sub(r"\1", text)
+    if "#" in text:
+        text = _HEADING.sub("", text)
+    if ">" in text:
+        text = _BLOCKQUOTE.sub("", text)
+    text = _RULE.sub(" ", text)
+    text = _LIST_MARKER.sub("", text)
+    text = _NUMBERED_ITEM.sub(r"\1. ", text)
+    if "*" in text or "_" in text or "~~" in text:
+        text = _EMPHASIS.sub(lambda m: m.group(2) or m.group(4), text)
+    if "`" in text:
+        text = _INLINE_CODE.sub(r"\1", text)
+    return text
+
+
+def language_for_voice(provider: str, voice: str) -> str:
+    """Language code for a voice (``en-US-GuyNeural`` -> ``en``), or ``""`` when unknown.
+
+    OpenAI voices speak whatever language they're given, so they have none.
+    """
+    if provider.lower() == "edge" and "-" in voice:
+        return voice.split("-", 1)[0].lower()
+    if provider.lower() == "local" and "_" in voice:
+        # Piper model names: en_US-lessac-medium
+        return voice.split("_", 1)[0].lower()
+    return ""
+
+
+def normalize_text(text: str, language: str = "en") -> str:
+    """Canonicalize text before synthesis.
+
+    Applies Unicode NFKC, drops invisible and control characters, strips
+    SSML/HTML tags and Markdown syntax, expands abbreviations for
+    ``language`` and collapses whitespace. Numbers are spelled out for
+    English only; other and unknown (``""``) languages keep digits, which
+    the providers already read correctly in their own locale. The result is
+    what gets synthesized and used as the cache key, so formatting variants
+    of one script share a single cached file.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    if not text.isascii():
+        text = _INVISIBLE.sub("", text)
+    text = _CONTROL.sub(" ", text)
+    if any(c in text for c in "<&#*_`[>~-+") or _NUMBERED_ITEM.search(text):
+        text = _strip_markup(text)
+
+    table = ABBREVIATIONS.get(language)
+    if table and any(abbreviation in text for abbreviation in table):
+        text = _ABBREVIATION_PATTERNS[language].sub(lambda m: table[m.group(0)], text)
+
+    if language == "en" and _DIGIT.search(text):
+        if "s" in text:
+            text = _DECADE.sub(_expand_decade_en, text)
+        if "-" in text:
+            text = _DIGIT_GROUPS.sub(_expand_digit_groups_en, text)
+        text = _NUMBER.sub(_expand_number_en, text)
+
+    text = " ".join(text.split())
+    return _SPACE_BEFORE_PUNCTUATION.sub(r"\1", text)
@@ -1,86 +1,413 @@
-import httpx
-import edge_tts
-import uuid
+import asyncio
+import logging
 import os
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, Dict, List
 from app.config import get_settings
+from app.metrics import tts_cache_lookups, tts_coalesced_requests, tts_fallbacks, TOOL_NAME
+from app.services.audio_cache import audio_cache, AudioCache
+from app.services.audio_formats import transcode, can_transcode
+from app.services.text_normalizer import normalize_text, language_for_voice
+from app.services.audio_merge import merge_audio
+from app.services.cache_warmer import warm_set
+from app.services.edge_voices import edge_voices
+from app.services.sentence_splitter import SentenceSplitter
+from app.services.ssml import Segment
+from app.services.providers import registry, ProviderRegistry, TTSProvider, OpenAIProvider
+from app.services.retry import RetryPolicy, UpstreamError
+from app.services.scheduler import FairLimiter, load_weights
+from app.tracing import span
+
+if TYPE_CHECKING:
+    # Post-processing (and NumPy) is only loaded once a request asks for it
+    from app.services.audio_post import PostProcess
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 
 class TTSService:
-    """Multi-provider TTS service"""
+    """Multi-provider TTS service.
+
+    Providers come from the registry; this class adds what every provider
+    shares: the audio cache, format conversion, per-provider concurrency
+    limits, splitting of over-long text, multi-segment merging and falling
+    back to ``fallback_voice`` (``provider:voice``) when a provider fails.
+    Concurrent requests for the same cache key share one synthesis, which
+    runs at the priority class of the request that started it. Provider
+    slots are handed out by weighted fair queueing across priority classes
+    (see ``scheduler.priority``).
+    """
     
     # OpenAI voices
-    OPENAI_VOICES = {
-        "alloy": {"name": "Alloy", "gender": "neutral", "description": "Balanced and versatile"},
-        "echo": {"name": "Echo", "gender": "male", "description": "Clear and confident"},
-        "fable": {"name": "Fable", "gender": "female", "description": "Warm and expressive"},
-        "onyx": {"name": "Onyx", "gender": "male", "description": "Deep and authoritative"},
-        "nova": {"name": "Nova", "gender": "female", "description": "Friendly and upbeat"},
-        "shimmer": {"name": "Shimmer", "gender": "female", "description": "Soft and soothing"},
-    }
+    OPENAI_VOICES = OpenAIProvider.VOICES
+    
+    def __init__(self, providers: ProviderRegistry = registry, fallback_voice: str = settings.TTS_FALLBACK_VOICE):
+        self.providers = providers
+        self.fallback_voice = fallback_voice
+        self.priority_weights = load_weights()
+        self._limits: Dict[str, FairLimiter] = {}
+        self._retry_policies: Dict[str, RetryPolicy] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    def get_provider(self, name: str) -> Optional[TTSProvider]:
+        return self.providers.get(name)
+    
+    def supports_format(self, provider: str, audio_format: str, bitrate: Optional[int] = None) -> bool:
+        """Whether ``provider`` output can be served as ``audio_format``"""
+        backend = self.providers.get(provider)
+        if backend and backend.native_format(audio_format, bitrate):
+            return True
+        return can_transcode()
+    
+    def supports_postprocess(self, provider: str, audio_format: str) -> bool:
+        """Whether ``provider`` output can be post-processed into ``audio_format``.
+
+        Needs ffmpeg to decode and re-encode, unless the provider renders WAV
+        and WAV is what was asked for.
+        """
+        backend = self.providers.get(provider)
+        if audio_format == "wav" and backend and backend.native_format("wav"):
+            return True
+        return can_transcode()
+    
+    def preload(self):
+        """Import provider SDKs ahead of the first request (they're imported lazily)"""
+        for provider in self.providers.all():
+            provider.preload()
+    
+    async def cancel_inflight(self, timeout: float = 5.0) -> int:
+        """Cancel shared syntheses still running after the shutdown drain.
+
+        They're shielded from their callers, so cancelling a request leaves
+        them running; cancelling here lets their cleanup remove scratch files.
+        """
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        return len(tasks)
+    
+    def close(self):
+        for provider in self.providers.all():
+            provider.close()
+        from app.services.audio_post import shutdown_pool
+        shutdown_pool()
+    
+    @staticmethod
+    def prepare_text(provider: str, voice: str, text: str) -> str:
+        """Canonical form of ``text`` for this voice; what we synthesize and cache"""
+        return normalize_text(text, language_for_voice(provider, voice))
     
     @staticmethod
-    async def generate_openai(text: str, voice: str, speed: float = 1.0) -> Optional[str]:
-        """Generate TTS using OpenAI via llm-proxy"""
+    async def _publish(
+        temp_path: str,
+        source_format: str,
+        key: str,
+        audio_format: str,
+        bitrate: Optional[int],
+        post: Optional["PostProcess"] = None,
+    ) -> Optional[str]:
+        """Move a provider's output into the cache, post-processing and transcoding if needed"""
+        if post is not None:
+            processed_path = await TTSService._postprocess(temp_path, source_format, post)
+            if processed_path is None:
+                return None
+            return await TTSService._publish(processed_path, "wav", key, audio_format, bitrate)
+        
+        if source_format == audio_format and bitrate is None:
+            return audio_cache.commit(temp_path, key, audio_format)
+        
+        encoded_path = audio_cache.temp_path()
+        try:
+            if not await transcode(temp_path, encoded_path, audio_format, bitrate):
+                return None
+            return audio_cache.commit(encoded_path, key, audio_format)
+        finally:
+            for path in (temp_path, encoded_path):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    @staticmethod
+    async def _postprocess(temp_path: str, source_format: str, post: "PostProcess") -> Optional[str]:
+        """Decode to WAV if needed and run ``post`` in the worker pool; the processed WAV's path"""
+        from app.services.audio_post import postprocess
+
+        decoded_path = temp_path
+        processed_path = audio_cache.temp_path()
+        ok = False
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{settings.LLM_PROXY_URL}/v1/audio/speech",
-                    headers={
-                        "Authorization": f"Bearer {settings.LLM_PROXY_KEY}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": "tts-1",
-                        "input": text,
-                        "voice": voice,
-                        "response_format": "mp3",
-                        "speed": speed,
-                    },
-                )
-                
-                if response.status_code == 200:
-                    # Save audio file
-                    filename = f"{uuid.uuid4()}.mp3"
-                    filepath = f"audio_output/{filename}"
-                    with open(filepath, "wb") as f:
-                        f.write(response.content)
-                    return filename
-                else:
-                    print(f"OpenAI TTS error: {response.status_code} - {response.text}")
+            if source_format != "wav":
+                decoded_path = audio_cache.temp_path()
+                if not await transcode(temp_path, decoded_path, "wav"):
                     return None
-        except Exception as e:
-            print(f"OpenAI TTS exception: {e}")
-            return None
+            with span("tts.postprocess", source_format=source_format):
+                ok = await postprocess(decoded_path, processed_path, post)
+            return processed_path if ok else None
+        finally:
+            if decoded_path != temp_path and os.path.exists(decoded_path):
+                os.remove(decoded_path)
+            if not ok and os.path.exists(processed_path):
+                os.remove(processed_path)
     
     @staticmethod
-    async def generate_edge_tts(text: str, voice: str, rate: str = "+0%") -> Optional[str]:
-        """Generate TTS using Edge TTS (free)"""
+    def _cached(provider: str, key: str, audio_format: str) -> Optional[str]:
+        filename = audio_cache.get(key, audio_format)
+        result = "hit" if filename else "miss"
+        warm_set.observe(audio_cache.filename(key, audio_format), filename is not None)
+        tts_cache_lookups.labels(tool=TOOL_NAME, provider=provider, result=result).inc()
+        return filename
+    
+    def _limit(self, provider: TTSProvider) -> FairLimiter:
+        if provider.name not in self._limits:
+            self._limits[provider.name] = FairLimiter(
+                provider.capabilities.max_concurrency, self.priority_weights, provider.name
+            )
+        return self._limits[provider.name]
+    
+    def _retry_policy(self, provider: TTSProvider) -> RetryPolicy:
+        # One per provider so its retry budget tracks that upstream's traffic
+        if provider.name not in self._retry_policies:
+            self._retry_policies[provider.name] = provider.retry_policy()
+        return self._retry_policies[provider.name]
+    
+    async def _single_flight(
+        self,
+        key: str,
+        provider: str,
+        produce: Callable[[], Awaitable[Optional[str]]],
+    ) -> Optional[str]:
+        """Run ``produce`` once per ``key`` and hand its result to every waiter.
+
+        The work runs in its own task and callers await it shielded, so a
+        disconnecting client doesn't cancel synthesis others are waiting on.
+        Billing stays with the callers; this only dedupes upstream work.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            tts_coalesced_requests.labels(tool=TOOL_NAME, provider=provider).inc()
+            return await asyncio.shield(task)
+        
+        task = asyncio.ensure_future(produce())
+        self._inflight[key] = task
+        
+        def forget(done: asyncio.Future):
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+        
+        task.add_done_callback(forget)
+        return await asyncio.shield(task)
+    
+    def cache_key(
+        self,
+        provider: TTSProvider,
+        voice: str,
+        text: str,
+        speed: float = 1.0,
+        audio_format: str = "mp3",
+        bitrate: Optional[int] = None,
+        pitch: str = "+0Hz",
+        post: Optional["PostProcess"] = None,
+    ) -> str:
+        return AudioCache.make_key(
+            provider.name,
+            voice,
+            text,
+            provider.speed_setting(speed),
+            audio_format,
+            bitrate,
+            pitch if provider.capabilities.pitch else "",
+            post.cache_token() if post else "",
+        )
+    
+    async def synthesize(
+        self,
+        provider: str,
+        voice: str,
+        text: str,
+        speed: float = 1.0,
+        audio_format: str = "mp3",
+        bitrate: Optional[int] = None,
+        pitch: str = "+0Hz",
+        post: Optional["PostProcess"] = None,
+    ) -> Optional[str]:
+        """Generate audio with whichever provider ``provider`` names.
+
+        ``pitch`` is ignored by providers without pitch control. Text longer
+        than the provider accepts is split at sentence boundaries and merged.
+        ``post`` runs loudness normalization, trimming and fades on the result.
+        """
+        backend = self.providers.get(provider)
+        if backend is None:
+            raise ValueError(f"Unknown provider: {provider}")
+        
+        if len(text) > backend.capabilities.max_chars:
+            splitter = SentenceSplitter(max_length=backend.capabilities.max_chars)
+            chunks = splitter.feed(text) + splitter.flush()
+            return await self.synthesize_segments(
+                [Segment(f"{backend.name}:{voice}", chunk, speed, pitch) for chunk in chunks],
+                audio_format,
+                bitrate,
+                post,
+            )
+        
+        key = self.cache_key(backend, voice, text, speed, audio_format, bitrate, pitch, post)
+        cached = self._cached(backend.name, key, audio_format)
+        if cached:
+            return cached
+        
+        return await self._single_flight(
+            key,
+            backend.name,
+            lambda: self._render_with_fallback(backend, voice, text, speed, audio_format, bitrate, pitch, key, post),
+        )
+    
+    async def _render_with_fallback(
+        self,
+        backend: TTSProvider,
+        voice: str,
+        text: str,
+        speed: float,
+        audio_format: str,
+        bitrate: Optional[int],
+        pitch: str,
+        key: str,
+        post: Optional["PostProcess"] = None,
+    ) -> Optional[str]:
+        filename = await self._render(backend, voice, text, speed, audio_format, bitrate, pitch, key, post)
+        if filename or not self.fallback_voice:
+            return filename
+        
+        fallback_provider, _, fallback_voice = self.fallback_voice.partition(":")
+        if fallback_provider == backend.name or fallback_provider not in self.providers:
+            return None
+        tts_fallbacks.labels(tool=TOOL_NAME, provider=backend.name).inc()
+        # Cached under the fallback voice's key, so a recovered provider is used again
+        return await self.synthesize(
+            fallback_provider, fallback_voice, text, speed, audio_format, bitrate, pitch, post
+        )
+    
+    async def _render(
+        self,
+        backend: TTSProvider,
+        voice: str,
+        text: str,
+        speed: float,
+        audio_format: str,
+        bitrate: Optional[int],
+        pitch: str,
+        key: str,
+        post: Optional["PostProcess"] = None,
+    ) -> Optional[str]:
+        # Post-processing decodes anyway, so ask for lossless audio where offered
+        source_format = backend.source_format("wav" if post else audio_format, None if post else bitrate)
+        temp_path = audio_cache.temp_path()
+        
+        async def attempt():
+            # The concurrency slot is released while backing off between attempts
+            async with self._limit(backend).slot():
+                with span(
+                    "tts.provider.render",
+                    provider=backend.name,
+                    voice=voice,
+                    characters=len(text),
+                    format=source_format,
+                ) as render:
+                    try:
+                        ok = await backend.render(text, voice, speed, source_format, temp_path, pitch)
+                    except UpstreamError as e:
+                        render.set(upstream_status=e.status, retryable=e.retryable)
+                        raise
+                if not ok:
+                    raise UpstreamError(f"{backend.display_name} TTS produced no audio", retryable=False)
+        
         try:
-            filename = f"{uuid.uuid4()}.mp3"
-            filepath = f"audio_output/{filename}"
-            
-            communicate = edge_tts.Communicate(text, voice, rate=rate)
-            await communicate.save(filepath)
-            
-            if os.path.exists(filepath):
-                return filename
+            await self._retry_policy(backend).run(attempt, backend.name)
+            with span("tts.publish", source_format=source_format, format=audio_format):
+                return await self._publish(temp_path, source_format, key, audio_format, bitrate, post)
+        except UpstreamError as e:
+            logger.warning(
+                "synthesis failed",
+                extra={"provider": backend.name, "voice": voice, "status": e.status, "error": str(e)},
+            )
             return None
-        except Exception as e:
-            print(f"Edge TTS exception: {e}")
+        except Exception:
+            logger.exception("synthesis error", extra={"provider": backend.name, "voice": voice})
             return None
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
     
-    @staticmethod
-    async def get_edge_voices() -> list:
-        """Get all available Edge TTS voices"""
+    async def synthesize_segments(
+        self,
+        segments: List[Segment],
+        audio_format: str = "mp3",
+        bitrate: Optional[int] = None,
+        post: Optional["PostProcess"] = None,
+    ) -> Optional[str]:
+        """Synthesize multi-voice segments concurrently and merge them in order.
+
+        Parts are rendered losslessly when ffmpeg is available so the merged
+        track is encoded only once; otherwise MP3 parts are frame-concatenated.
+        ``post`` is applied to the merged track, not to each part.
+        """
+        key = AudioCache.make_key(
+            "ssml",
+            "",
+            "\x1e".join(
+                f"{s.voice_id}\x1d{s.speed:.2f}\x1d{s.pitch}\x1d{s.break_ms}\x1d{s.text}" for s in segments
+            ),
+            "",
+            audio_format,
+            bitrate,
+            post=post.cache_token() if post else "",
+        )
+        cached = self._cached("ssml", key, audio_format)
+        if cached:
+            return cached
+        return await self._single_flight(
+            key, "ssml", lambda: self._merge_segments(segments, audio_format, bitrate, key, post)
+        )
+    
+    async def _merge_segments(
+        self,
+        segments: List[Segment],
+        audio_format: str,
+        bitrate: Optional[int],
+        key: str,
+        post: Optional["PostProcess"] = None,
+    ) -> Optional[str]:
+        part_format = "wav" if can_transcode() else "mp3"
+        speech = [s for s in segments if not s.is_break]
+        filenames = await asyncio.gather(*(
+            self.synthesize(s.provider, s.voice_name, s.text, s.speed, part_format, None, s.pitch)
+            for s in speech
+        ))
+        if not all(filenames):
+            return None
+        
+        rendered = iter(filenames)
+        parts = [s.break_ms if s.is_break else audio_cache.path(next(rendered)) for s in segments]
+        temp_path = audio_cache.temp_path()
         try:
-            voices = await edge_tts.list_voices()
-            return voices
-        except Exception as e:
-            print(f"Error getting Edge voices: {e}")
-            return []
+            if post:
+                # Merge losslessly, then post-process and encode the whole track once
+                with span("tts.merge", parts=len(parts), format="wav"):
+                    if not await merge_audio(parts, temp_path, "wav"):
+                        return None
+                return await self._publish(temp_path, "wav", key, audio_format, bitrate, post)
+            with span("tts.merge", parts=len(parts), format=audio_format):
+                if not await merge_audio(parts, temp_path, audio_format, bitrate):
+                    return None
+                return audio_cache.commit(temp_path, key, audio_format)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    async def get_edge_voices(self) -> list:
+        """Get all available Edge TTS voices from the cached snapshot"""
+        await edge_voices.ensure_fresh()
+        return edge_voices.filter()
 
 
 # Singleton instance
@@ -0,0 +1,158 @@
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import UsageRollup, VoiceGeneration
+
+ROLLUP_PERIODS = ("hour", "day", "total")
+# Marks rows aggregated over all devices; never a valid device id
+ALL_DEVICES = "*"
+EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(period: str, at: datetime) -> datetime:
+    if period == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    if period == "day":
+        return at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return EPOCH
+
+
+def _rollup_rows(generation: VoiceGeneration) -> List[dict]:
+    rows = []
+    for period in ROLLUP_PERIODS:
+        for device_id in (generation.device_id, ALL_DEVICES):
+            rows.append({
+                "period": period,
+                "bucket_start": bucket_start(period, generation.created_at),
+                "provider": generation.provider,
+                "voice_id": generation.voice_id,
+                "device_id": device_id,
+                "generations": 1,
+                "characters": generation.text_length,
+            })
+    return rows
+
+
+def _increment(db: Session, rows: List[dict]):
+    """Add ``rows`` onto existing buckets in one statement where the dialect allows"""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(UsageRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["period", "device_id", "bucket_start", "provider", "voice_id"],
+            set_={
+                "generations": UsageRollup.generations + stmt.excluded.generations,
+                "characters": UsageRollup.characters + stmt.excluded.characters,
+            },
+        )
+        db.execute(stmt, rows)
+        return
+
+    for row in rows:
+        existing = db.query(UsageRollup).filter_by(
+            period=row["period"],
+            device_id=row["device_id"],
+            bucket_start=row["bucket_start"],
+            provider=row["provider"],
+            voice_id=row["voice_id"],
+        ).with_for_update().first()
+        if existing:
+            existing.generations += row["generations"]
+            existing.characters += row["characters"]
+        else:
+            db.add(UsageRollup(**row))
+
+
+def record_generation(
+    db: Session,
+    device_id: str,
+    voice_id: str,
+    provider: str,
+    text_length: int,
+    audio_url: Optional[str] = None,
+    request_hash: Optional[str] = None,
+) -> VoiceGeneration:
+    """Add a generation row and bump its rollups in the caller's transaction"""
+    generation = VoiceGeneration(
+        device_id=device_id,
+        voice_id=voice_id,
+        provider=provider.lower(),
+        text_length=text_length,
+        audio_url=audio_url,
+        request_hash=request_hash,
+        created_at=datetime.utcnow(),
+    )
+    db.add(generation)
+    _increment(db, _rollup_rows(generation))
+    return generation
+
+
+def rebuild_rollups(db: Session, batch_size: int = 1000) -> int:
+    """Recompute every rollup from ``voice_generations``.
+
+    Used to backfill history written before rollups existed; streams the
+    table in batches so memory stays flat. Returns the rows scanned.
+    """
+    db.query(UsageRollup).delete()
+    totals: dict = {}
+    scanned = 0
+    query = db.query(VoiceGeneration).order_by(VoiceGeneration.id).yield_per(batch_size)
+    for generation in query:
+        scanned += 1
+        for row in _rollup_rows(generation):
+            key = (row["period"], row["device_id"], row["bucket_start"], row["provider"], row["voice_id"])
+            counts = totals.setdefault(key, [0, 0])
+            counts[0] += 1
+            counts[1] += row["characters"]
+    db.bulk_insert_mappings(UsageRollup, [
+        {
+            "period": period,
+            "device_id": device_id,
+            "bucket_start": start,
+            "provider": provider,
+            "voice_id": voice_id,
+            "generations": generations,
+            "characters": characters,
+        }
+        for (period, device_id, start, provider, voice_id), (generations, characters) in totals.items()
+    ])
+    db.commit()
+    return scanned
+
+
+def query_rollups(
+    db: Session,
+    period: str,
+    device_id: str = ALL_DEVICES,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    provider: Optional[str] = None,
+) -> Iterable[UsageRollup]:
+    query = db.query(UsageRollup).filter(
+        UsageRollup.period == period,
+        UsageRollup.device_id == device_id,
+    )
+    if start is not None:
+        query = query.filter(UsageRollup.bucket_start >= start)
+    if end is not None:
+        query = query.filter(UsageRollup.bucket_start < end)
+    if provider:
+        query = query.filter(UsageRollup.provider == provider)
+    return query.order_by(UsageRollup.bucket_start, UsageRollup.provider, UsageRollup.voice_id)
+
+
+def device_totals(db: Session, device_id: str) -> dict:
+    """All-time generations and characters for a device from its ``total`` rows"""
+    generations, characters = db.query(
+        func.coalesce(func.sum(UsageRollup.generations), 0),
+        func.coalesce(func.sum(UsageRollup.characters), 0),
+    ).filter(
+        UsageRollup.period == "total",
+        UsageRollup.device_id == device_id,
+    ).one()
+    return {"generations": generations, "characters": characters}
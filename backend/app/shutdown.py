@@ -0,0 +1,138 @@
+"""Graceful shutdown: stop taking work, drain what's running, clean up.
+
+Once draining, ``/ready`` answers 503 so load balancers stop routing here,
+new requests get 503 with ``Retry-After`` (WebSockets are closed with 1012,
+service restart) and requests already running get until the deadline to
+finish. Whatever is still running then is cancelled; cancelled generations
+release their credit holds on the way out and their scratch files are
+removed by the lifespan shutdown.
+
+Uvicorn only runs the lifespan shutdown after its own connection drain.
+On SIGTERM the order is: uvicorn stops listening and waits up to
+``--timeout-graceful-shutdown`` for open requests, then cancels them; the
+lifespan then drains for ``SHUTDOWN_DRAIN_SECONDS`` and gives cancelled
+requests ``CANCEL_GRACE_SECONDS``. The three together must fit in the
+container's stop grace period. To fail ``/ready`` before SIGTERM (load
+balancers), call ``POST /api/v1/admin/drain`` from a pre-stop hook.
+"""
+import asyncio
+import logging
+import os
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+
+from app.metrics import requests_in_flight, shutdown_cancelled_requests, TOOL_NAME
+
+logger = logging.getLogger(__name__)
+
+# Probes and scrapes keep working while the instance drains
+EXEMPT_PATHS = frozenset({"/health", "/ready", "/metrics"})
+RETRY_AFTER_SECONDS = 5
+# Time cancelled requests get to release holds and delete scratch files
+CANCEL_GRACE_SECONDS = 5.0
+
+
+class Drain:
+    """Tracks in-flight requests and drains them on shutdown"""
+
+    def __init__(self):
+        self.draining = False
+        # Resolved when its request finishes -> the task serving it
+        self._requests: Dict[asyncio.Future, asyncio.Task] = {}
+
+    def reset(self):
+        self.draining = False
+        self._requests.clear()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._requests)
+
+    @contextmanager
+    def track(self) -> Iterator[bool]:
+        """Track the current request; yields False (untracked) once draining"""
+        if self.draining:
+            yield False
+            return
+        done = asyncio.get_running_loop().create_future()
+        self._requests[done] = asyncio.current_task()
+        requests_in_flight.labels(tool=TOOL_NAME).set(len(self._requests))
+        try:
+            yield True
+        finally:
+            self._requests.pop(done, None)
+            done.set_result(None)
+            requests_in_flight.labels(tool=TOOL_NAME).set(len(self._requests))
+
+    async def wait(self, timeout: float) -> Set[asyncio.Future]:
+        """Stop admitting requests and wait up to ``timeout`` for running ones.
+
+        Returns the requests still running. The calling task is never waited
+        on, so an admin request can trigger this.
+        """
+        self.draining = True
+        current = asyncio.current_task()
+        pending = {done for done, task in self._requests.items() if task is not current}
+        logger.info("draining", extra={"in_flight": len(pending), "timeout": timeout})
+        if pending and timeout > 0:
+            _, pending = await asyncio.wait(pending, timeout=timeout)
+        return pending
+
+    async def drain(self, timeout: float) -> int:
+        """``wait``, then cancel what's left; returns how many were cancelled"""
+        pending = await self.wait(timeout)
+        if not pending:
+            return 0
+        for done in pending:
+            task = self._requests.get(done)
+            if task is not None:
+                task.cancel()
+        await asyncio.wait(pending, timeout=CANCEL_GRACE_SECONDS)
+        shutdown_cancelled_requests.labels(tool=TOOL_NAME).inc(len(pending))
+        logger.warning("cancelled requests at shutdown", extra={"cancelled": len(pending)})
+        return len(pending)
+
+
+drain = Drain()
+
+
+def flush_telemetry():
+    """Flush log handlers and retire this process's multiprocess metrics"""
+    multiproc_dir: Optional[str] = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid(), multiproc_dir)
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+
+class DrainMiddleware:
+    """Counts requests in flight and turns new ones away while draining"""
+
+    def __init__(self, app, tracker: Drain = drain):
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        with self.tracker.track() as admitted:
+            if admitted:
+                await self.app(scope, receive, send)
+                return
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1012, "reason": "Server restarting"})
+        else:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(RETRY_AFTER_SECONDS).encode()),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server is restarting, please retry"}'})
@@ -0,0 +1,218 @@
+"""Lightweight request tracing with OpenTelemetry-style spans.
+
+Spans live in a contextvar, so they follow asyncio tasks and threadpool
+calls without being passed around. Trace ids travel in W3C ``traceparent``
+headers: accepted from clients, sent to upstream HTTP APIs and added to
+log records. Finished spans go to an exporter: none (the default, where a
+span costs a few microseconds), structured log lines, or memory for
+tests.
+"""
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "attributes", "start", "end_time", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end_time: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.error = repr(error)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_time or time.perf_counter()) - self.start) * 1000
+
+    def end(self):
+        if self.end_time is None:
+            self.end_time = time.perf_counter()
+            if self.sampled:
+                tracer.export(self)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+class InMemoryExporter:
+    """Keeps finished spans in a list; for tests"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def names(self) -> List[str]:
+        return [span.name for span in self.spans]
+
+    def clear(self):
+        self.spans.clear()
+
+
+class LogExporter:
+    """Writes each finished span as a structured log line"""
+
+    def export(self, span: Span):
+        logger.info(
+            "span",
+            extra={
+                "span": span.name,
+                "trace_id": span.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "duration_ms": round(span.duration_ms, 3),
+                "status": span.status,
+                **({"error": span.error} if span.error else {}),
+                **span.attributes,
+            },
+        )
+
+
+EXPORTERS = {"log": LogExporter, "memory": InMemoryExporter}
+
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, exporter=None, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def configure(self, exporter: str = "", sample_rate: float = 1.0):
+        self.exporter = EXPORTERS[exporter]() if exporter else None
+        self.sample_rate = sample_rate
+
+    def export(self, span: Span):
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def start_span(self, name: str, parent: Optional[Span] = None, traceparent: Optional[str] = None, **attributes) -> Span:
+        """Start a span without making it current; call ``end()`` on it.
+
+        For spans that begin and finish in different frames (SQLAlchemy
+        events, generator dependencies). A ``traceparent`` continues a
+        remote trace when there's no local parent.
+        """
+        parent = parent or _current.get()
+        if parent is not None:
+            return Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+        remote = _TRACEPARENT.match(traceparent or "")
+        if remote:
+            trace_id, parent_id, flags = remote.groups()
+            return Span(name, trace_id, parent_id, flags == "01" and self.exporter is not None, attributes)
+        sampled = self.exporter is not None and random.random() < self.sample_rate
+        return Span(name, f"{random.getrandbits(128):032x}", None, sampled, attributes)
+
+    @contextmanager
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Span]:
+        """Time a block as a child of the current span"""
+        span = self.start_span(name, traceparent=traceparent, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end()
+
+
+tracer = Tracer()
+span = tracer.span
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def inject_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Add ``traceparent`` for the current span to outgoing request headers"""
+    current = _current.get()
+    if current is not None:
+        headers["traceparent"] = current.traceparent()
+    return headers
+
+
+class TraceLogFilter(logging.Filter):
+    """Stamps log records with the active trace and span ids"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        current = _current.get()
+        if current is not None and not hasattr(record, "trace_id"):
+            record.trace_id = current.trace_id
+            record.span_id = current.span_id
+        return True
+
+
+def instrument_engine(engine):
+    """Record a ``db.query`` span for every statement run on ``engine``"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("trace_spans", []).append(
+                tracer.start_span("db.query", operation=statement.split(None, 1)[0].upper())
+            )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            spans.pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+        if spans:
+            failed = spans.pop()
+            failed.record_error(context.original_exception)
+            failed.end()
+
+
+class TracingMiddleware:
+    """Wraps each HTTP request in a root span and returns its trace id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1")
+        with tracer.span(f"{scope['method']} {scope['path']}", traceparent=traceparent) as root:
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    root.set(status=message["status"])
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-trace-id", root.trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
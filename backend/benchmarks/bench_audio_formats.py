@@ -0,0 +1,87 @@
+"""File size and encode latency per output format.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_audio_formats [source.wav] [--seconds 30]
+
+Without a source file a synthetic speech-band signal is rendered with ffmpeg.
+Requires ffmpeg on PATH.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from app.services.audio_formats import AUDIO_FORMATS, can_transcode, transcode
+
+BITRATES = {
+    "mp3": [None, 64, 32],
+    "opus": [None, 24, 16],
+    "aac": [None, 48],
+    "wav": [None],
+    "pcm": [None],
+}
+
+
+def render_source(path: str, seconds: int):
+    # Amplitude-modulated tones roughly in the speech band
+    subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}:sample_rate=24000",
+            "-af", "tremolo=f=4:d=0.8", "-ac", "1", path,
+        ],
+        check=True,
+    )
+
+
+async def run(source: str, repeat: int):
+    source_size = os.path.getsize(source)
+    print(f"source: {source} ({source_size / 1024:.1f} KiB)")
+    print(f"{'format':<8}{'kbps':>6}{'size KiB':>12}{'ratio':>8}{'encode ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for audio_format, bitrates in BITRATES.items():
+            for bitrate in bitrates:
+                dst = os.path.join(tmp, f"out.{AUDIO_FORMATS[audio_format]['ext']}")
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    ok = await transcode(source, dst, audio_format, bitrate)
+                    timings.append(time.perf_counter() - start)
+                    if not ok:
+                        break
+                if not ok:
+                    print(f"{audio_format:<8}{'-':>6}  encode failed")
+                    continue
+                size = os.path.getsize(dst)
+                kbps = bitrate or AUDIO_FORMATS[audio_format]["bitrate"] or "-"
+                print(
+                    f"{audio_format:<8}{kbps:>6}{size / 1024:>12.1f}"
+                    f"{size / source_size:>8.2f}{min(timings) * 1000:>12.1f}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", nargs="?")
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not can_transcode():
+        sys.exit("ffmpeg not found on PATH")
+
+    if args.source:
+        asyncio.run(run(args.source, args.repeat))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.wav")
+        render_source(source, args.seconds)
+        asyncio.run(run(source, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
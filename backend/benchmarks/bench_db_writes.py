@@ -0,0 +1,77 @@
+"""SQLite write throughput: default pragmas vs the tuned engine profile.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_db_writes [--writers 8] [--writes 200]
+
+Each writer thread records generations (row plus rollup upserts) in its
+own session and commits each one, like concurrent /generate requests, on
+a temporary database file.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from app.config import Settings
+from app.database import Base, make_engine
+from app.services.usage_rollup import record_generation
+
+PROFILES = {
+    "default (journal=DELETE, synchronous=FULL)": Settings(
+        SQLITE_JOURNAL_MODE="DELETE", SQLITE_SYNCHRONOUS="FULL", SQLITE_MMAP_SIZE=0
+    ),
+    "tuned (journal=WAL, synchronous=NORMAL)": Settings(),
+}
+
+
+def run(config: Settings, writers: int, writes: int, path: str):
+    engine = make_engine(f"sqlite:///{path}", config)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    latencies = []
+    lock = threading.Lock()
+
+    def writer(n: int):
+        db = Session()
+        try:
+            for i in range(writes):
+                start = time.perf_counter()
+                record_generation(db, f"device-{n}", "edge:en-US-GuyNeural", "edge", 100 + i, "/audio/x.mp3")
+                db.commit()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+
+    latencies.sort()
+    return len(latencies) / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200)
+    args = parser.parse_args()
+
+    for label, config in PROFILES.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            throughput, p50, p95 = run(config, args.writers, args.writes, os.path.join(tmp, "bench.db"))
+        print(f"{label}: {throughput:.0f} commits/s, p50={p50 * 1000:.2f}ms p95={p95 * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
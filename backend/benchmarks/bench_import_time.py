@@ -0,0 +1,61 @@
+"""Import-time profile of the application, based on ``python -X importtime``.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_import_time [--module app.main] [--top 20] [--max-ms 800]
+
+Prints the slowest imports by cumulative time. With ``--max-ms`` the exit
+status is non-zero when the total exceeds the budget, so it can gate CI.
+Provider SDKs (``edge_tts``, ``httpx``) and NumPy (audio post-processing)
+are imported lazily and should not appear in the profile of ``app.main``.
+"""
+import argparse
+import subprocess
+import sys
+
+LAZY_MODULES = ("edge_tts", "httpx", "numpy")
+
+
+def profile(module: str) -> list[tuple[int, int, str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    runs = [profile(args.module) for _ in range(args.repeat)]
+    best = min(runs, key=lambda rows: sum(r[0] for r in rows))
+    total_ms = sum(r[0] for r in best) / 1000
+
+    print(f"{args.module}: {total_ms:.1f} ms total (best of {args.repeat})")
+    print(f"{'self ms':>9}{'cumul ms':>10}  module")
+    for self_us, cumulative_us, name in sorted(best, key=lambda r: r[1], reverse=True)[: args.top]:
+        print(f"{self_us / 1000:>9.1f}{cumulative_us / 1000:>10.1f}  {name}")
+
+    eager = sorted({r[2].strip() for r in best if r[2].strip().split(".")[0] in LAZY_MODULES})
+    if eager:
+        print(f"warning: lazily loaded modules imported at startup: {', '.join(eager)}")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        sys.exit(f"import time {total_ms:.1f} ms exceeds budget {args.max_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
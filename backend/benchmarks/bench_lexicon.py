@@ -0,0 +1,96 @@
+"""Lexicon substitution on long inputs against a large lexicon.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_lexicon [--entries 10000] [--chars 5000] [--iterations 50]
+
+Compares the Aho-Corasick matcher with one regex alternation over all
+terms and with a regex substitution per entry. Build is the one-off cost of
+compiling the lexicon (paid again only after an edit); apply is per request.
+"""
+import argparse
+import random
+import re
+import string
+import time
+
+from app.services.lexicon import Matcher
+
+
+def make_lexicon(entries: int, rng: random.Random) -> dict:
+    lexicon = {}
+    while len(lexicon) < entries:
+        words = rng.choice([1, 1, 1, 2])
+        term = " ".join(
+            "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(words)
+        )
+        lexicon[term] = term.upper()
+    return lexicon
+
+
+def make_text(lexicon: dict, chars: int, rng: random.Random, hit_rate: float = 0.05) -> str:
+    terms = list(lexicon)
+    words = []
+    length = 0
+    while length < chars:
+        if rng.random() < hit_rate:
+            word = rng.choice(terms).capitalize()
+        else:
+            word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:chars]
+
+
+def timed(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--chars", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    lexicon = make_lexicon(args.entries, rng)
+    text = make_text(lexicon, args.chars, rng)
+
+    start = time.perf_counter()
+    matcher = Matcher(lexicon)
+    ac_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    alternation = re.compile(
+        r"\b(?:" + "|".join(re.escape(t) for t in sorted(lexicon, key=len, reverse=True)) + r")\b",
+        re.IGNORECASE,
+    )
+    regex_build = time.perf_counter() - start
+
+    def per_entry():
+        result = text
+        for term, replacement in lexicon.items():
+            result = re.sub(rf"\b{re.escape(term)}\b", replacement, result, flags=re.IGNORECASE)
+        return result
+
+    def regex_alternation():
+        return alternation.sub(lambda m: lexicon[m.group(0).lower()], text)
+
+    assert matcher.apply(text) == regex_alternation()
+    rows = [
+        ("aho-corasick", ac_build, timed(lambda: matcher.apply(text), args.iterations)),
+        ("regex alternation", regex_build, timed(regex_alternation, args.iterations)),
+        ("regex per entry", 0.0, timed(per_entry, max(1, args.iterations // 25))),
+    ]
+    print(f"{args.entries} entries, {len(text)} chars, {len(matcher.find(text))} matches")
+    print(f"{'method':<20} {'build ms':>10} {'apply ms':>10}")
+    for name, build, apply in rows:
+        print(f"{name:<20} {build * 1000:>10.1f} {apply * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
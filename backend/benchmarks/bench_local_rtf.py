@@ -0,0 +1,78 @@
+"""Real-time factor of the local Piper provider per worker count.
+
+Run from ``backend/`` (needs ``pip install -r requirements-local.txt`` and
+downloaded models):
+
+    python -m benchmarks.bench_local_rtf --model-dir models/ [--voice en_US-lessac-medium] [--workers 1,2,4]
+
+RTF is wall-clock synthesis time divided by audio duration (below 1 is
+faster than real time). RTF per core multiplies by the worker count, i.e.
+CPU-seconds spent per second of audio, which should stay flat as workers
+are added if the pool scales.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import wave
+
+from app.services.providers.local import LocalProvider
+
+SENTENCES = [
+    "The quick brown fox jumps over the lazy dog while the farmer watches from the porch.",
+    "Offline synthesis keeps working when the upstream services are slow or unavailable.",
+    "Each worker process loads its models once and keeps them in memory for later requests.",
+    "Real-time factor compares how long synthesis takes with how long the audio lasts.",
+]
+
+
+def _duration(path: str) -> float:
+    with wave.open(path, "rb") as wav_file:
+        return wav_file.getnframes() / wav_file.getframerate()
+
+
+async def run(provider: LocalProvider, voice: str, jobs: int, tmp: str):
+    paths = [os.path.join(tmp, f"{i}.wav") for i in range(jobs)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        provider.render(SENTENCES[i % len(SENTENCES)], voice, 1.0, "wav", path)
+        for i, path in enumerate(paths)
+    ))
+    elapsed = time.perf_counter() - start
+    assert all(results)
+    return elapsed, sum(_duration(path) for path in paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", required=True)
+    parser.add_argument("--voice", default=None)
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, os.cpu_count() or 1})))
+    parser.add_argument("--jobs-per-worker", type=int, default=4)
+    args = parser.parse_args()
+
+    for workers in [int(n) for n in args.workers.split(",")]:
+        provider = LocalProvider(args.model_dir, workers)
+        voice = args.voice or next(iter(v.voice for v in provider.voices()), None)
+        if voice is None:
+            raise SystemExit(f"No Piper models found in {args.model_dir}")
+
+        start = time.perf_counter()
+        provider.preload()
+        warm = time.perf_counter() - start
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                elapsed, audio = asyncio.run(run(provider, voice, workers * args.jobs_per_worker, tmp))
+        finally:
+            provider.close()
+
+        rtf = elapsed / audio
+        print(
+            f"workers={workers} voice={voice} warm-up={warm:.1f}s audio={audio:.1f}s wall={elapsed:.2f}s "
+            f"RTF={rtf:.3f} RTF/core={rtf * workers:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Music mixing time against voiceover length.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_mix [--minutes 0.5,2,10,30] [--music-seconds 90] [--repeat 3]
+
+Mixes speech-like test audio (24 kHz mono) over a shorter 44.1 kHz stereo
+bed, which is resampled and looped, ducked under the speech and faded out.
+Reports best-of-``--repeat`` milliseconds for the in-process stages (music
+decode, mix, encode) and for the whole job through the post-processing
+worker pool, plus the pool's speed as a multiple of realtime.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.services import audio_post
+from app.services.audio_mix import Mix
+from app.services.audio_post import PostProcess, process_file, write_wav
+from benchmarks.bench_postprocess import speech_like
+
+STAGES = ("music_decode", "mix", "encode")
+
+
+def music_bed(seconds: float, rate: int = 44100) -> np.ndarray:
+    """A chord with a slow tremolo, stereo"""
+    t = np.arange(int(rate * seconds)) / rate
+    chord = sum(np.sin(2 * np.pi * f * t) for f in (220.0, 277.2, 329.6)) / 3
+    tremolo = 0.75 + 0.25 * np.sin(2 * np.pi * 0.5 * t)
+    left = (0.5 * chord * tremolo).astype(np.float32)
+    return np.stack([left, np.roll(left, rate // 100)], axis=1)
+
+
+async def pooled(src: str, dst: str, post: PostProcess) -> float:
+    started = time.perf_counter()
+    if not await audio_post.postprocess(src, dst, post):
+        raise RuntimeError("mix failed in the worker pool")
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", default="0.5,2,10,30")
+    parser.add_argument("--music-seconds", type=float, default=90)
+    parser.add_argument("--rate", type=int, default=24000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        music_path = os.path.join(tmp, "bed.wav")
+        write_wav(music_path, music_bed(args.music_seconds), 44100)
+        post = PostProcess(target_lufs=None, trim_silence=False, mix=Mix(music_path, "bench"))
+        src = os.path.join(tmp, "voice.wav")
+        dst = os.path.join(tmp, "mixed.wav")
+
+        print(f"{'minutes':>8} " + " ".join(f"{stage:>13}" for stage in STAGES) + f" {'pool ms':>10} {'x realtime':>11}")
+        for minutes in [float(m) for m in args.minutes.split(",")]:
+            samples = speech_like(minutes * 60, args.rate)
+            write_wav(src, samples, args.rate)
+            duration = samples.shape[0] / args.rate
+
+            best = {}
+            for _ in range(args.repeat):
+                timings = process_file(src, dst, post)
+                timings["pool"] = asyncio.run(pooled(src, dst, post))
+                for stage in STAGES + ("pool",):
+                    best[stage] = min(best.get(stage, float("inf")), timings[stage])
+            audio_post.shutdown_pool()
+
+            print(
+                f"{minutes:>8g} "
+                + " ".join(f"{best[stage] * 1000:>13.1f}" for stage in STAGES)
+                + f" {best['pool'] * 1000:>10.1f} {duration / best['pool']:>11.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
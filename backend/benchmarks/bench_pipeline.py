@@ -0,0 +1,88 @@
+"""End-to-end TTSService throughput against the fake provider.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_pipeline [--requests 500] [--concurrency 32] [--latency 0.05]
+        [--latency lognormal:0.05:0.5] [--chunk-ms 200 --chunk-interval-ms 20] [--faults 503:0.05] [--seed 0]
+
+Exercises caching, per-provider concurrency limits, retries and file
+publishing with no network. ``--latency``, ``--chunk-ms``, ``--faults`` and
+``--seed`` take the same values as the ``FAKE_TTS_*`` settings; a run with
+the same seed makes the same requests and sees the same faults. Each
+request uses distinct text so nothing is a cache hit unless
+``--repeat-ratio`` is set.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+
+from app.services.audio_cache import audio_cache
+from app.services.providers import FakeBehavior, FakeProvider, registry
+from app.services.tts_service import tts_service
+
+
+async def run(args):
+    behavior = FakeBehavior(
+        latency=args.latency,
+        chunk_ms=args.chunk_ms,
+        chunk_interval_ms=args.chunk_interval_ms,
+        faults=args.faults,
+        seed=args.seed,
+    )
+    provider = FakeProvider(behavior=behavior)
+    registry.register(provider)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    rng = random.Random(args.seed)
+    latencies = []
+    failures = 0
+
+    async def one(i: int):
+        # A share of requests repeat one of a few popular texts
+        nonlocal failures
+        n = rng.randrange(10) if rng.random() < args.repeat_ratio else 10 + i
+        text = f"Benchmark sentence number {n}. " * 4
+        async with semaphore:
+            start = time.perf_counter()
+            filename = await tts_service.synthesize("fake", "default", text)
+            latencies.append(time.perf_counter() - start)
+            failures += filename is None
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(
+        f"requests={args.requests} concurrency={args.concurrency} latency={args.latency} "
+        f"faults={args.faults or 'none'} seed={args.seed}"
+    )
+    print(f"throughput: {args.requests / elapsed:.1f} req/s, upstream calls: {provider.calls}, failed: {failures}")
+    print(
+        f"latency ms: p50={statistics.median(latencies) * 1000:.1f} "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} "
+        f"max={latencies[-1] * 1000:.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", default="0.05")
+    parser.add_argument("--chunk-ms", type=int, default=0)
+    parser.add_argument("--chunk-interval-ms", type=float, default=0.0)
+    parser.add_argument("--faults", default="")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat-ratio", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_cache.directory = tmp
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
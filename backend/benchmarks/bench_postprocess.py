@@ -0,0 +1,65 @@
+"""Per-stage throughput of audio post-processing on long files.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_postprocess [--minutes 1,10,30] [--rate 24000] [--repeat 3]
+
+Synthesizes speech-like test audio (tone bursts with pauses and padding
+silence), then times decode, silence trimming, loudness normalization,
+fades and encode separately. Throughput is seconds of audio processed per
+wall-clock second ("x realtime"), best of ``--repeat`` runs, in a single
+process; the server runs the same code in a worker pool.
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from app.services.audio_post import PostProcess, process_file, write_wav
+
+STAGES = ("decode", "trim", "loudness", "fades", "encode")
+
+
+def speech_like(seconds: float, rate: int) -> np.ndarray:
+    """Half-second tone bursts at varying levels, 0.2 s gaps, 1 s of silence either side"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(rate * 0.5)) / rate
+    gap = np.zeros(int(rate * 0.2), dtype=np.float32)
+    bursts = []
+    for _ in range(int(seconds / 0.7)):
+        tone = np.sin(2 * np.pi * rng.uniform(120, 400) * t) * rng.uniform(0.05, 0.3)
+        bursts += [tone.astype(np.float32), gap]
+    pad = np.zeros(rate, dtype=np.float32)
+    return np.concatenate([pad, *bursts, pad])[:, None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", default="1,10,30")
+    parser.add_argument("--rate", type=int, default=24000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    post = PostProcess(target_lufs=-16.0, trim_silence=True, fade_in_ms=200, fade_out_ms=500)
+    print(f"{'minutes':>8} " + " ".join(f"{stage:>10}" for stage in STAGES) + f" {'total':>10}  (x realtime)")
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src.wav")
+        dst = os.path.join(tmp, "dst.wav")
+        for minutes in [float(m) for m in args.minutes.split(",")]:
+            samples = speech_like(minutes * 60, args.rate)
+            write_wav(src, samples, args.rate)
+            duration = samples.shape[0] / args.rate
+
+            best = {}
+            for _ in range(args.repeat):
+                timings = process_file(src, dst, post)
+                timings["total"] = sum(timings[stage] for stage in STAGES)
+                for stage in STAGES + ("total",):
+                    best[stage] = min(best.get(stage, float("inf")), timings[stage])
+
+            print(f"{minutes:>8g} " + " ".join(f"{duration / best[stage]:>10.0f}" for stage in STAGES + ("total",)))
+
+
+if __name__ == "__main__":
+    main()
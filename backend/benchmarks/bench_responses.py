@@ -0,0 +1,83 @@
+"""Payload size and JSON serialization time per API endpoint.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_responses [--edge-voices 450] [--repeat 200]
+
+For each endpoint, reports the uncompressed, gzip and (when the ``brotli``
+package is installed) Brotli body sizes, and the best-of-``--repeat``
+microseconds to serialize its payload with the stdlib encoder (the old
+default response class) and with orjson (the current one). The Edge voice
+list is synthetic, sized like the real one, so nothing goes upstream.
+"""
+import argparse
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.testclient import TestClient
+
+from app.compression import brotli, compress
+from app.config import get_settings
+from app.main import app
+from app.services.edge_voices import edge_voices
+
+ENDPOINTS = ("/api/v1/voices/", "/api/v1/voices/all", "/api/v1/payment/products")
+LOCALES = ("en-US", "en-GB", "de-DE", "fr-FR", "es-ES", "ja-JP", "zh-CN", "pt-BR", "hi-IN")
+
+
+def synthetic_voices(count: int) -> list:
+    voices = []
+    for i in range(count):
+        locale = LOCALES[i % len(LOCALES)]
+        short_name = f"{locale}-Voice{i}Neural"
+        voices.append({
+            "Name": f"Microsoft Server Speech Text to Speech Voice ({locale}, Voice{i}Neural)",
+            "ShortName": short_name,
+            "Gender": "Female" if i % 2 else "Male",
+            "Locale": locale,
+            "SuggestedCodec": "audio-24khz-48kbitrate-mono-mp3",
+            "FriendlyName": f"Microsoft Voice{i} Online (Natural) - {locale}",
+            "Status": "GA",
+            "VoiceTag": {"ContentCategories": ["General"], "VoicePersonalities": ["Friendly", "Positive"]},
+        })
+    return voices
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--edge-voices", type=int, default=450)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    edge_voices.apply(synthetic_voices(args.edge_voices))
+    edge_voices.fetched_at = time.time()
+    settings = get_settings()
+    client = TestClient(app)
+
+    print(f"{'endpoint':<28} {'raw B':>8} {'gzip B':>8} {'br B':>8} {'json µs':>9} {'orjson µs':>10}")
+    for endpoint in ENDPOINTS:
+        response = client.get(endpoint, headers={"Accept-Encoding": "identity"})
+        response.raise_for_status()
+        content = response.json()
+        body = response.content
+        gzipped = len(compress(body, "gzip", settings.COMPRESSION_GZIP_LEVEL))
+        brotlied = len(compress(body, "br", brotli_quality=settings.COMPRESSION_BROTLI_QUALITY)) if brotli else None
+        stdlib = best_of(args.repeat, lambda: JSONResponse(content))
+        fast = best_of(args.repeat, lambda: ORJSONResponse(content))
+        print(
+            f"{endpoint:<28} {len(body):>8} {gzipped:>8} {brotlied if brotlied else '-':>8} "
+            f"{stdlib * 1e6:>9.1f} {fast * 1e6:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Per-span overhead of app.tracing.
+
+Run from ``backend/``:
+
+    python -m benchmarks.bench_tracing [--spans 200000]
+
+Compares an empty block with the same block inside a span, with no
+exporter (the production default) and with the in-memory exporter.
+"""
+import argparse
+import time
+
+from app.tracing import InMemoryExporter, span, tracer
+
+
+def timed(n: int, traced: bool) -> float:
+    start = time.perf_counter()
+    if traced:
+        with span("request"):
+            for _ in range(n):
+                with span("stage", step=1):
+                    pass
+    else:
+        for _ in range(n):
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spans", type=int, default=200_000)
+    args = parser.parse_args()
+
+    baseline = timed(args.spans, traced=False)
+    for label, exporter in (("no exporter", None), ("memory exporter", InMemoryExporter())):
+        tracer.exporter = exporter
+        elapsed = timed(args.spans, traced=True)
+        print(f"{label}: {(elapsed - baseline) / args.spans * 1e6:.2f} µs per span")
+
+
+if __name__ == "__main__":
+    main()
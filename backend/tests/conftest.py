@@ -1,3 +1,9 @@
+import os
+
+# Offline stand-ins for every provider: the suite never needs keys or network
+os.environ.setdefault("TTS_PROVIDER_MODE", "fake")
+os.environ.setdefault("AUDIO_URL_SECRET", "test-secret")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -6,6 +12,8 @@ from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.database import Base, get_db
+from app.services.audio_cache import audio_cache
+from app.services.providers import FakeProvider, registry
 
 
 # Create in-memory test database
@@ -46,3 +54,28 @@ def client():
 @pytest.fixture
 def device_id():
     return "test-device-12345"
+
+
+@pytest.fixture
+def register_provider():
+    """Register providers for one test, putting back whatever held their names before"""
+    previous = []
+
+    def register(provider):
+        previous.append((provider.name, registry.get(provider.name)))
+        registry.register(provider)
+        return provider
+
+    yield register
+    for name, provider in reversed(previous):
+        if provider is None:
+            registry.unregister(name)
+        else:
+            registry.register(provider)
+
+
+@pytest.fixture
+def fake_provider(register_provider, monkeypatch, tmp_path):
+    """A fresh fake provider, caching its audio under tmp_path"""
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+    return register_provider(FakeProvider())
@@ -138,3 +138,53 @@ def test_tts_generate_speed_out_of_range(client, device_id):
         headers={"X-Device-Id": device_id}
     )
     assert response.status_code == 422
+
+
+def test_ready_endpoint_turns_green(client):
+    """Test readiness reports ready once warm-up finishes"""
+    import time
+    for _ in range(100):
+        response = client.get("/ready")
+        if response.status_code == 200:
+            break
+        time.sleep(0.02)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    assert all(data["checks"].values())
+
+
+def test_ensure_schema_skips_when_unchanged(client):
+    """Test startup DDL is skipped once the schema fingerprint is stored"""
+    from app.database import ensure_schema
+    ensure_schema()
+    assert ensure_schema() is False
+
+
+@pytest.mark.asyncio
+async def test_upstream_warm_up_does_not_gate_readiness(monkeypatch):
+    """Test the upstream connection is retried in the background while the app is ready"""
+    import httpx
+    from app import readiness as ready_module
+    from app.services import http_client
+
+    attempts = []
+
+    def upstream(request):
+        attempts.append(request.method)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(404)
+
+    async def no_sleep(delay):
+        assert ready_module.readiness.ready
+        assert not ready_module.readiness.details["upstream"]
+
+    monkeypatch.setattr(http_client, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+    monkeypatch.setattr(ready_module.settings, "TTS_PROVIDER_MODE", "live")
+    monkeypatch.setattr(ready_module.settings, "LLM_PROXY_KEY", "key")
+    monkeypatch.setattr(ready_module.asyncio, "sleep", no_sleep)
+    monkeypatch.setattr(ready_module, "readiness", ready_module.Readiness(["http_pool"], details=["upstream"]))
+    await ready_module._warm_http_pool()
+    assert attempts == ["HEAD"] * 3
+    assert ready_module.readiness.details["upstream"]
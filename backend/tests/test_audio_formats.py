@@ -0,0 +1,105 @@
+import pytest
+from app.services.audio_cache import AudioCache, load_secret
+from app.services.audio_formats import (
+    FormatNotAcceptable, negotiate_format, normalize_bitrate, ffmpeg_args
+)
+from app.services.providers import OpenAIProvider, EdgeProvider
+
+
+def test_negotiate_body_format_wins():
+    """Test explicit format overrides Accept header"""
+    assert negotiate_format("opus", "audio/mpeg") == "opus"
+
+
+def test_negotiate_default_without_audio_accept():
+    """Test JSON-only Accept falls back to mp3"""
+    assert negotiate_format(None, None) == "mp3"
+    assert negotiate_format(None, "application/json") == "mp3"
+
+
+def test_negotiate_accept_q_values():
+    """Test highest q-value supported audio type is chosen"""
+    accept = "audio/mpeg;q=0.5, audio/ogg;codecs=opus, audio/flac;q=0.9"
+    assert negotiate_format(None, accept) == "opus"
+
+
+def test_negotiate_unsupported_accept():
+    """Test unsupported audio Accept raises"""
+    with pytest.raises(FormatNotAcceptable):
+        negotiate_format(None, "audio/flac")
+    with pytest.raises(FormatNotAcceptable):
+        negotiate_format("flac", None)
+    # Same codecs, but containers we don't produce
+    for container in ("audio/webm", "audio/mp4"):
+        with pytest.raises(FormatNotAcceptable):
+            negotiate_format(None, container)
+
+
+def test_normalize_bitrate():
+    """Test bitrate validation and lossless handling"""
+    assert normalize_bitrate("wav", 128) is None
+    assert normalize_bitrate("opus", 24) == 24
+    with pytest.raises(ValueError):
+        normalize_bitrate("mp3", 1000)
+
+
+def test_ffmpeg_args_bitrate_before_muxer():
+    """Test bitrate is placed before the output muxer"""
+    args = ffmpeg_args("in.wav", "out.opus", "opus", 24)
+    assert args[-5:] == ["-b:a", "24k", "-f", "ogg", "out.opus"]
+
+
+def test_ffmpeg_args_output_limits():
+    """Test output options follow -vn so they bound what's decoded"""
+    args = ffmpeg_args("in.mp3", "out.wav", "wav", output_args=("-t", "600"))
+    assert args[args.index("-vn") + 1:args.index("-vn") + 3] == ["-t", "600"]
+
+
+def test_cache_key_includes_format():
+    """Test format and bitrate change the cache key"""
+    base = AudioCache.make_key("openai", "alloy", "Hello", "1.00", "mp3")
+    assert base == AudioCache.make_key("openai", "alloy", "Hello", "1.00", "mp3")
+    assert base != AudioCache.make_key("openai", "alloy", "Hello", "1.00", "opus")
+    assert base != AudioCache.make_key("openai", "alloy", "Hello", "1.00", "mp3", 64)
+
+
+def test_audio_names_need_the_secret(tmp_path):
+    """Test public file names can't be computed from the cache key alone"""
+    path = str(tmp_path / "secret")
+    assert load_secret("", path) == load_secret("", path) != load_secret("", str(tmp_path / "other"))
+    assert load_secret("configured", path) == b"configured"
+    key = AudioCache.make_key("openai", "alloy", "Hello", "1.00", "mp3")
+    name = AudioCache(secret=b"one").filename(key, "mp3")
+    assert name == AudioCache(secret=b"one").filename(key, "mp3")
+    assert name != AudioCache(secret=b"two").filename(key, "mp3")
+    assert not name.startswith(key[:32])
+
+
+def test_native_formats():
+    """Test which formats are requested natively from each provider"""
+    assert OpenAIProvider().native_format("opus") == "opus"
+    assert OpenAIProvider().native_format("opus", 24) is None
+    assert OpenAIProvider().source_format("opus", 24) == "wav"
+    assert EdgeProvider().native_format("mp3") == "mp3"
+    assert EdgeProvider().native_format("aac") is None
+
+
+def test_generate_rejects_unacceptable_accept(client, device_id):
+    """Test 406 when Accept names only unsupported audio types"""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello", "voice_id": "openai:alloy"},
+        headers={"X-Device-Id": device_id, "Accept": "audio/flac"},
+    )
+    assert response.status_code == 406
+    assert isinstance(response.json()["detail"], str)
+
+
+def test_generate_rejects_unknown_format(client, device_id):
+    """Test 400 for an unknown body format"""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello", "voice_id": "openai:alloy", "format": "flac"},
+        headers={"X-Device-Id": device_id},
+    )
+    assert response.status_code == 400
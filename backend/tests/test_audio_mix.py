@@ -0,0 +1,183 @@
+import io
+
+import numpy as np
+import pytest
+from app.services import audio_post
+from app.services.audio_cache import audio_cache
+from app.config import get_settings
+from app.services.audio_formats import can_transcode
+from app.services.audio_mix import Mix, fit_music, mix_music, speech_envelope
+from app.services.audio_post import PostProcess, read_wav, write_wav
+from app.services.music import music_library
+from app.services.providers import FakeProvider, ProviderCapabilities
+
+RATE = 24000
+settings = get_settings()
+
+
+def tone(seconds: float, amplitude: float = 0.3, frequency: float = 200.0, rate: int = RATE) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)[:, None]
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros((int(RATE * seconds), 1), dtype=np.float32)
+
+
+def level_db(samples: np.ndarray) -> float:
+    return float(20 * np.log10(np.sqrt((samples ** 2).mean())))
+
+
+class WavProvider(FakeProvider):
+    """Renders a tone as WAV so mixing doesn't need ffmpeg"""
+
+    name = "wavmix"
+    capabilities = ProviderCapabilities(max_chars=5000, formats=frozenset({"wav"}), max_concurrency=4)
+
+    async def render(self, text, voice, speed, audio_format, dst_path, pitch="+0Hz") -> bool:
+        self.calls += 1
+        write_wav(dst_path, tone(1.0), RATE)
+        return True
+
+
+def test_envelope_anticipates_and_holds():
+    """Test ducking ramps down before speech, rides short pauses and releases after long ones"""
+    voice = np.concatenate([silence(1), tone(1), silence(0.2), tone(1), silence(2)])
+    envelope = speech_envelope(voice, RATE, attack_ms=150, release_ms=600)
+
+    def at(seconds):
+        return envelope[int(seconds * RATE)]
+
+    assert at(0.5) == 0
+    assert 0 < at(0.92) < 1
+    assert at(1.0) == pytest.approx(1, abs=0.05)
+    assert at(2.1) == 1
+    assert 0 < at(3.8) < 1
+    assert at(4.3) == 0
+    assert speech_envelope(silence(1), RATE).max() == 0
+
+
+def test_fit_music_loops_and_resamples():
+    """Test short music loops and its rate and channels follow the voice"""
+    music = np.repeat(tone(0.5, frequency=441.0, rate=44100), 2, axis=1)
+    fitted = fit_music(music, 44100, RATE, 2, RATE * 2)
+    assert fitted.shape == (RATE * 2, 2)
+    assert level_db(fitted[RATE:]) == pytest.approx(level_db(music), abs=0.5)
+    assert fit_music(music, 44100, RATE, 1, 10).shape == (10, 1)
+
+
+def test_mix_music_levels():
+    """Test the bed sits at its gain in the gaps and drops by the duck amount under speech"""
+    music = np.repeat(tone(5, amplitude=0.5, frequency=1000.0), 2, axis=1)
+    mix = Mix("", "", music_gain_db=-18, duck_db=-12, lead_in_ms=1000, tail_ms=1000)
+    voice = tone(3, amplitude=0.001)  # below the gate: nothing ducks
+    mixed = mix_music(voice, RATE, music, RATE, mix)
+    assert mixed.shape == (RATE * 5, 2)
+    assert level_db(mixed[: RATE // 2]) == pytest.approx(level_db(music) - 18, abs=0.3)
+
+    speech = tone(3, amplitude=0.3, frequency=3000.0)
+    ducked = mix_music(speech, RATE, music, RATE, mix)
+    bed_under_speech = ducked[RATE * 2: RATE * 3] - speech[RATE: RATE * 2]
+    assert level_db(bed_under_speech) == pytest.approx(level_db(music) - 30, abs=0.5)
+    assert np.abs(ducked[-10:]).max() < 0.01
+
+
+def test_mix_respects_peak_ceiling():
+    """Test a loud voice over a loud bed is scaled under the ceiling"""
+    music = tone(2, amplitude=0.9)
+    mixed = mix_music(tone(2, amplitude=0.95), RATE, music, RATE, Mix("", "", music_gain_db=0, duck_db=0))
+    assert np.abs(mixed).max() <= 10 ** (-1 / 20) + 1e-6
+
+
+def test_cache_token_includes_mix():
+    """Test mixed audio is cached apart from unmixed and per track"""
+    plain = PostProcess()
+    first = PostProcess(mix=Mix("a.wav", "key-a"))
+    assert len({plain.cache_token(), first.cache_token(), PostProcess(mix=Mix("b.wav", "key-b")).cache_token()}) == 3
+
+
+@pytest.fixture
+def music_dirs(monkeypatch, tmp_path):
+    monkeypatch.setattr(music_library, "library_dir", str(tmp_path / "library"))
+    monkeypatch.setattr(music_library, "upload_dir", str(tmp_path / "uploads"))
+    (tmp_path / "library").mkdir()
+    stereo = np.repeat(tone(3, amplitude=0.2, rate=44100), 2, axis=1)
+    write_wav(str(tmp_path / "library" / "calm-piano.wav"), stereo, 44100)
+    return tmp_path
+
+
+def test_music_library_and_upload(client, device_id, music_dirs):
+    """Test library tracks are listed and uploads are stored by content"""
+    tracks = client.get("/api/v1/music/").json()["tracks"]
+    assert [(t["music_id"], t["rate"]) for t in tracks] == [("library:calm-piano", 44100)]
+
+    wav = io.BytesIO()
+    write_wav(wav, tone(1), RATE)
+    headers = {"X-Device-Id": device_id}
+    first = client.post("/api/v1/music/", files={"file": ("bed.wav", wav.getvalue())}, headers=headers).json()
+    again = client.post("/api/v1/music/", files={"file": ("copy.wav", wav.getvalue())}, headers=headers).json()
+    assert first["music_id"].startswith("upload:")
+    assert again["music_id"] == first["music_id"]
+    assert not list((music_dirs / "uploads").glob("*.part"))
+
+    if not can_transcode():
+        response = client.post("/api/v1/music/", files={"file": ("bed.mp3", b"ID3 not wav")}, headers=headers)
+        assert response.status_code == 400
+
+
+def test_uploads_belong_to_the_device(client, device_id, music_dirs, register_provider, monkeypatch):
+    """Test other devices can't mix or delete an upload, and the per-device quota holds"""
+    register_provider(WavProvider())
+    monkeypatch.setattr(settings, "MUSIC_MAX_UPLOADS_PER_DEVICE", 1)
+    headers = {"X-Device-Id": device_id}
+    other = {"X-Device-Id": "other-device"}
+
+    def upload(seconds: float, who: dict):
+        wav = io.BytesIO()
+        write_wav(wav, tone(seconds), RATE)
+        return client.post("/api/v1/music/", files={"file": ("bed.wav", wav.getvalue())}, headers=who)
+
+    music_id = upload(1, headers).json()["music_id"]
+    assert upload(2, headers).status_code == 400
+    request = {"text": "Hello.", "voice_id": "wavmix:default", "format": "wav", "music": {"music_id": music_id}}
+    response = client.post("/api/v1/tts/generate", json=request, headers=other)
+    assert response.status_code == 400
+    assert "Unknown music track" in response.json()["detail"]
+    assert client.get("/api/v1/music/uploads", headers=other).json()["tracks"] == []
+    assert client.delete(f"/api/v1/music/{music_id}", headers=other).status_code == 404
+
+    # The same audio uploaded elsewhere shares the file until both let go
+    assert upload(1, other).json()["music_id"] == music_id
+    assert [t["music_id"] for t in client.get("/api/v1/music/uploads", headers=headers).json()["tracks"]] == [music_id]
+    assert client.delete(f"/api/v1/music/{music_id}", headers=headers).status_code == 204
+    assert [t["music_id"] for t in client.get("/api/v1/music/uploads", headers=other).json()["tracks"]] == [music_id]
+    assert client.delete(f"/api/v1/music/{music_id}", headers=other).status_code == 204
+    assert not list((music_dirs / "uploads").glob("*.wav"))
+    assert upload(2, headers).status_code == 200
+
+
+def test_generate_with_music(client, device_id, music_dirs, register_provider, monkeypatch, tmp_path):
+    """Test a generation is mixed over the bed in the worker pool"""
+    register_provider(WavProvider())
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+    request = {
+        "text": "Hello.",
+        "voice_id": "wavmix:default",
+        "format": "wav",
+        "music": {"music_id": "library:calm-piano", "lead_in_ms": 500, "tail_ms": 500},
+    }
+    try:
+        response = client.post("/api/v1/tts/generate", json=request, headers={"X-Device-Id": device_id})
+        unknown = client.post(
+            "/api/v1/tts/generate",
+            json={**request, "music": {"music_id": "library:nope"}},
+            headers={"X-Device-Id": device_id},
+        )
+    finally:
+        audio_post.shutdown_pool()
+
+    assert response.status_code == 200
+    samples, rate = read_wav(audio_cache.path(response.json()["audio_url"].rsplit("/", 1)[1]))
+    assert rate == RATE
+    assert samples.shape == (RATE * 2, 2)
+    assert unknown.status_code == 400
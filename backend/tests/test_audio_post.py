@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+from app.services import audio_post
+from app.services.audio_cache import audio_cache
+from app.services.audio_formats import can_transcode
+from app.services.audio_post import (
+    PostProcess,
+    apply_fades,
+    integrated_loudness,
+    k_weighting_taps,
+    normalize_loudness,
+    process_file,
+    read_wav,
+    trim_silence,
+    write_wav,
+)
+from app.services.providers import FakeProvider, ProviderCapabilities
+from app.services.tts_service import TTSService
+
+RATE = 24000
+
+
+def tone(seconds: float, amplitude: float = 0.1, frequency: float = 997.0) -> np.ndarray:
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)[:, None]
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros((int(RATE * seconds), 1), dtype=np.float32)
+
+
+class WavProvider(FakeProvider):
+    """Renders a quiet tone padded with silence as WAV"""
+
+    name = "wavfake"
+    capabilities = ProviderCapabilities(max_chars=5000, formats=frozenset({"wav"}), max_concurrency=4)
+
+    async def render(self, text, voice, speed, audio_format, dst_path, pitch="+0Hz") -> bool:
+        self.calls += 1
+        write_wav(dst_path, np.concatenate([silence(1), tone(2, amplitude=0.02), silence(1)]), RATE)
+        return True
+
+
+def test_integrated_loudness_reference():
+    """Test a -20 dBFS 1 kHz sine measures about -23 LUFS (BS.1770)"""
+    assert integrated_loudness(tone(5), RATE) == pytest.approx(-23.0, abs=0.1)
+    assert integrated_loudness(silence(5), RATE) == float("-inf")
+    assert integrated_loudness(tone(0.1), RATE) == float("-inf")
+
+
+def test_blockwise_filtering_matches_whole_signal():
+    """Test overlap-add across FFT blocks equals filtering the file in one go"""
+    samples = np.random.default_rng(0).standard_normal((3 * audio_post.FFT_SIZE, 2)).astype(np.float32)
+    step = RATE // 10
+    taps = k_weighting_taps(RATE)
+    delay = taps.size // 2
+    whole = np.stack([np.convolve(channel, taps)[delay:delay + samples.shape[0]] for channel in samples.T])
+    squares = (whole ** 2).sum(axis=0)
+    expected = np.bincount(np.arange(samples.shape[0]) // step, weights=squares)
+    energy = audio_post.weighted_step_energy(samples, RATE, step)
+    assert energy[: expected.size] == pytest.approx(expected, rel=1e-4)
+
+
+def test_loudness_gating_ignores_pauses():
+    """Test silence between speech doesn't drag the measurement down"""
+    speech = np.concatenate([tone(2), silence(6), tone(2)])
+    # Ungated, 6 s of silence in 10 would read about 4 LU quieter
+    assert integrated_loudness(speech, RATE) == pytest.approx(integrated_loudness(tone(4), RATE), abs=0.5)
+
+
+def test_normalize_to_target():
+    """Test gain brings audio to the target and respects the peak ceiling"""
+    quiet, gain_db = normalize_loudness(tone(5, amplitude=0.01), RATE, -16.0)
+    assert integrated_loudness(quiet, RATE) == pytest.approx(-16.0, abs=0.1)
+    assert gain_db > 0
+
+    loud, _ = normalize_loudness(tone(5, amplitude=0.5), RATE, -5.0)
+    assert np.abs(loud).max() <= 10 ** (audio_post.PEAK_CEILING_DB / 20) + 1e-6
+
+
+def test_trim_silence_keeps_padding():
+    """Test leading and trailing silence is cut down to the padding"""
+    trimmed = trim_silence(np.concatenate([silence(1), tone(2), silence(1.5)]), RATE)
+    pad = 2 * audio_post.TRIM_PAD_MS / 1000
+    assert trimmed.shape[0] / RATE == pytest.approx(2 + pad, abs=0.02)
+    # Nothing above the threshold: kept whole rather than emptied
+    assert trim_silence(silence(1), RATE).shape[0] == RATE
+
+
+def test_fades():
+    """Test fades start and end at zero and leave the middle alone"""
+    faded = apply_fades(np.full((RATE, 1), 0.5, dtype=np.float32), RATE, 100, 200)
+    assert faded[0, 0] == 0
+    assert faded[-1, 0] == 0
+    assert faded[RATE // 2, 0] == 0.5
+    assert faded[RATE // 20, 0] == pytest.approx(0.25, abs=0.01)
+
+
+def test_process_file_round_trip(tmp_path):
+    """Test a WAV file goes through every stage and stays valid"""
+    src, dst = str(tmp_path / "src.wav"), str(tmp_path / "dst.wav")
+    write_wav(src, np.concatenate([silence(1), tone(2, amplitude=0.02), silence(1)]), RATE)
+    timings = process_file(src, dst, PostProcess(target_lufs=-18.0, fade_in_ms=50, fade_out_ms=50))
+    assert set(timings) >= {"decode", "trim", "loudness", "fades", "encode", "gain_db"}
+
+    samples, rate = read_wav(dst)
+    assert rate == RATE
+    assert samples.shape[0] / RATE < 2.2
+    assert integrated_loudness(samples, rate) == pytest.approx(-18.0, abs=0.3)
+
+
+def test_cache_key_includes_postprocessing():
+    """Test processed audio is cached apart from raw audio"""
+    provider = FakeProvider()
+    service = TTSService()
+    raw = service.cache_key(provider, "default", "Hello.")
+    assert service.cache_key(provider, "default", "Hello.", post=PostProcess()) != raw
+    assert service.cache_key(provider, "default", "Hello.", post=PostProcess(fade_in_ms=10)) != \
+        service.cache_key(provider, "default", "Hello.", post=PostProcess())
+
+
+@pytest.mark.asyncio
+async def test_synthesize_with_postprocessing(register_provider, monkeypatch, tmp_path):
+    """Test synthesis output is processed in the worker pool before caching"""
+    register_provider(WavProvider())
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+    try:
+        filename = await TTSService().synthesize("wavfake", "default", "Hello.", audio_format="wav", post=PostProcess())
+    finally:
+        audio_post.shutdown_pool()
+
+    samples, rate = read_wav(audio_cache.path(filename))
+    assert samples.shape[0] / rate < 2.2
+    assert integrated_loudness(samples, rate) == pytest.approx(-16.0, abs=0.3)
+
+
+@pytest.mark.skipif(can_transcode(), reason="ffmpeg can decode MP3 for post-processing")
+def test_postprocess_needs_decoder(client, device_id, fake_provider):
+    """Test post-processing MP3-only voices is refused without ffmpeg"""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello.", "voice_id": "fake:default", "postprocess": {"target_lufs": -16}},
+        headers={"X-Device-Id": device_id},
+    )
+    assert response.status_code == 400
+    assert "Post-processing" in response.json()["detail"]
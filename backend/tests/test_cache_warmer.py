@@ -0,0 +1,108 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from app.api.v1 import admin
+from app.database import get_db
+from app.models import CachedRequest, GenerationToken, VoiceGeneration
+from app.services.cache_warmer import (
+    cache_warmer, parse_hours, popular_requests, remember_request, seconds_until, warm_set
+)
+
+
+@pytest.fixture(autouse=True)
+def admin_key(monkeypatch):
+    monkeypatch.setattr(admin.settings, "ADMIN_API_KEY", "secret")
+
+
+def generation(voice_id: str, request_hash: str, age_days: float = 0) -> VoiceGeneration:
+    return VoiceGeneration(
+        device_id="d",
+        voice_id=voice_id,
+        provider=voice_id.split(":")[0],
+        text_length=5,
+        audio_url=f"/audio/{request_hash}.mp3",
+        request_hash=request_hash,
+        created_at=datetime.utcnow() - timedelta(days=age_days),
+    )
+
+
+def test_popular_requests_per_voice(client):
+    """Test hashes are ranked per voice within the history window"""
+    db = next(client.app.dependency_overrides[get_db]())
+    history = [("edge:a", "a1", 0, 3), ("edge:a", "a2", 0, 2), ("edge:a", "a3", 0, 1), ("edge:b", "b1", 0, 4)]
+    # Busier, but before the window
+    history.append(("edge:a", "a3", 30, 5))
+    for voice_id, request_hash, age_days, count in history:
+        db.add_all(generation(voice_id, request_hash, age_days) for _ in range(count))
+    db.add(CachedRequest(request_hash="a1", provider="edge", voice="a", text="Hi", audio_format="mp3"))
+    db.commit()
+
+    top = popular_requests(db, 2, datetime.utcnow() - timedelta(days=7))
+    assert [(c.request_hash, c.uses) for c in top] == [("b1", 4), ("a1", 3), ("a2", 2)]
+    assert top[1].filename == "a1.mp3"
+    assert top[1].recipe.text == "Hi"
+    assert top[0].recipe is None
+
+
+def test_warm_restores_popular_requests(client, device_id, fake_provider, tmp_path):
+    """Test a warm-up re-renders the top requests only and counts warm-set hits"""
+    db = next(client.app.dependency_overrides[get_db]())
+    db.add(GenerationToken(device_id=device_id, total_tokens=10))
+    db.commit()
+    headers = {"X-Device-Id": device_id}
+    urls = {}
+    for text, times in (("Hello there.", 3), ("Good night.", 2), ("Good morning.", 1)):
+        for _ in range(times):
+            response = client.post(
+                "/api/v1/tts/generate", json={"text": text, "voice_id": "fake:default"}, headers=headers
+            )
+            urls[text] = response.json()["audio_url"]
+    for path in tmp_path.iterdir():
+        os.remove(path)
+
+    admin_headers = {"X-Admin-Key": "secret"}
+    report = client.post("/api/v1/admin/cache/warm?top_n=2&rate=100", headers=admin_headers).json()
+    assert (report["candidates"], report["restored"], report["cached"], report["failed"]) == (2, 2, 0, 0)
+    cached = sorted(path.name for path in tmp_path.iterdir())
+    assert cached == sorted(urls[text].rsplit("/", 1)[1] for text in ("Hello there.", "Good night."))
+    calls = fake_provider.calls
+
+    again = client.post("/api/v1/admin/cache/warm?top_n=2&rate=100", headers=admin_headers).json()
+    assert (again["cached"], again["restored"], again["hit_rate"]) == (2, 0, 1.0)
+
+    client.post("/api/v1/tts/generate", json={"text": "Hello there.", "voice_id": "fake:default"}, headers=headers)
+    client.post("/api/v1/tts/generate", json={"text": "Good morning.", "voice_id": "fake:default"}, headers=headers)
+    assert fake_provider.calls == calls + 1
+    status = client.get("/api/v1/admin/cache/warm", headers=admin_headers).json()
+    assert status["warm_set"] == {"files": 2, "lookups": 2, "hits": 1, "hit_rate": 0.5}
+    assert warm_set.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_warm_forgets_stale_requests(client, fake_provider):
+    """Test a warm-up deletes recipes not requested within the window"""
+    db = next(client.app.dependency_overrides[get_db]())
+    old = datetime.utcnow() - timedelta(days=30)
+    for request_hash in ("stale", "again"):
+        db.add(CachedRequest(
+            request_hash=request_hash, provider="fake", voice="default", text="Hi", audio_format="mp3", created_at=old
+        ))
+    db.commit()
+    # Asked for again, so it stays
+    remember_request(db, "again", "fake", "default", "Hi", 1.0, "mp3", None)
+    db.commit()
+
+    await cache_warmer.warm(None, db=db, window_days=7)
+    assert [row.request_hash for row in db.query(CachedRequest).all()] == ["again"]
+
+
+def test_off_peak_window():
+    """Test the window setting parses and the wait reaches its next start"""
+    assert parse_hours("") is None
+    assert parse_hours("2-5") == (2, 5)
+    with pytest.raises(ValueError):
+        parse_hours("5-5")
+    now = datetime(2024, 1, 1, 3, 30)
+    assert seconds_until(2, now) == 22.5 * 3600
+    assert seconds_until(4, now) == 1800
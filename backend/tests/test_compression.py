@@ -0,0 +1,80 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, choose_encoding
+
+BIG = {"items": [{"id": i, "name": f"voice-{i}"} for i in range(200)]}
+
+
+@pytest.fixture
+def compressed_client():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    async def big():
+        return BIG
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/pregzipped")
+    async def pregzipped():
+        body = gzip.compress(b'{"a": 1}' * 200)
+        return Response(body, media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"x" * 1000, b"y" * 1000]), media_type="text/plain")
+
+    @app.get("/audio/clip.json")
+    async def audio():
+        return BIG
+
+    return TestClient(app)
+
+
+def test_choose_encoding(monkeypatch):
+    """Test q-values are honoured and Brotli wins only when it's installed"""
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding("gzip, deflate, br") == "gzip"
+    assert choose_encoding("br;q=1.0, gzip;q=0") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") == "gzip"
+    monkeypatch.setattr(compression, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+
+
+def test_compresses_only_eligible_responses(compressed_client):
+    """Test large JSON is gzipped; small, streamed, pre-encoded and /audio bodies aren't"""
+    gzip_only = {"Accept-Encoding": "gzip"}
+    response = compressed_client.get("/big", headers=gzip_only)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json() == BIG
+
+    assert "content-encoding" not in compressed_client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in compressed_client.get("/small", headers=gzip_only).headers
+    assert "content-encoding" not in compressed_client.get("/stream", headers=gzip_only).headers
+    assert "content-encoding" not in compressed_client.get("/audio/clip.json", headers=gzip_only).headers
+
+    # Compressed once, by the route
+    response = compressed_client.get("/pregzipped", headers=gzip_only)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == b'{"a": 1}' * 200
+
+
+def test_products_are_preserialized(client):
+    """Test /payment/products serves its prebuilt body with a validator"""
+    response = client.get("/api/v1/payment/products")
+    assert [p["id"] for p in response.json()["products"]] == ["basic", "standard", "pro"]
+    assert response.json()["products"][0]["price_formatted"] == "$4.99"
+    response = client.get("/api/v1/payment/products", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
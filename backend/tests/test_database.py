@@ -0,0 +1,52 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.config import Settings
+from app.database import TimedQueuePool, engine_options, make_engine
+
+
+def checkout_count() -> float:
+    return REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"tool": "voiceover"}) or 0
+
+
+def test_sqlite_file_profile(tmp_path):
+    """Test file-backed SQLite gets WAL, NORMAL sync, busy timeout and mmap"""
+    engine = make_engine(f"sqlite:///{tmp_path / 'app.db'}", Settings(SQLITE_BUSY_TIMEOUT_MS=2500))
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 2500
+        assert conn.execute(text("PRAGMA mmap_size")).scalar() == 256 * 1024 * 1024
+    assert isinstance(engine.pool, TimedQueuePool)
+    engine.dispose()
+
+
+def test_memory_sqlite_keeps_default_pool():
+    """Test in-memory SQLite isn't given a multi-connection pool"""
+    options = engine_options("sqlite://")
+    assert "poolclass" not in options
+    assert options["connect_args"]["check_same_thread"] is False
+
+
+def test_server_profile():
+    """Test server databases get a sized, pre-pinged, recycled pool"""
+    config = Settings(DB_POOL_SIZE=20, DB_MAX_OVERFLOW=5, DB_POOL_RECYCLE=600)
+    options = engine_options("postgresql://user:pass@db/voiceover", config)
+    assert options["poolclass"] is TimedQueuePool
+    assert (options["pool_size"], options["max_overflow"], options["pool_recycle"]) == (20, 5, 600)
+    assert options["pool_pre_ping"] is True
+    assert "connect_args" not in options
+
+
+def test_checkout_wait_metrics(tmp_path):
+    """Test checkouts are timed and pool timeouts counted"""
+    config = Settings(DB_POOL_SIZE=1, DB_MAX_OVERFLOW=0, DB_POOL_TIMEOUT=0.05)
+    engine = make_engine(f"sqlite:///{tmp_path / 'app.db'}", config)
+    before = checkout_count()
+    with engine.connect():
+        assert checkout_count() == before + 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    assert REGISTRY.get_sample_value("db_pool_checkout_timeouts_total", {"tool": "voiceover"}) >= 1
+    engine.dispose()
@@ -0,0 +1,249 @@
+import asyncio
+import io
+import time
+import tracemalloc
+import zipfile
+
+import httpx
+import pytest
+from app.api.v1 import documents as document_api
+from app.config import get_settings
+from app.database import get_db
+from app.models import GenerationToken, VoiceGeneration
+from app.services import documents
+from app.services.documents import DocumentError, detect_kind, iter_chapters
+
+settings = get_settings()
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def chapters(data: bytes, kind: str, max_chars: int = 1000):
+    return [(c.title, c.text) for c in iter_chapters(io.BytesIO(data), kind, max_chars)]
+
+
+def make_docx(paragraphs) -> bytes:
+    body = "".join(
+        f'<w:p><w:pPr><w:pStyle w:val="{style}"/></w:pPr><w:r><w:t>{text}</w:t></w:r></w:p>'
+        if style else f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+        for text, style in paragraphs
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("word/document.xml", f'<w:document xmlns:w="{W}"><w:body>{body}</w:body></w:document>')
+    return buffer.getvalue()
+
+
+def make_epub(documents_by_id: dict, spine: list) -> bytes:
+    manifest = "".join(
+        f'<item id="{item}" href="text/{item}.xhtml" media-type="application/xhtml+xml"/>' for item in documents_by_id
+    )
+    itemrefs = "".join(f'<itemref idref="{item}"/>' for item in spine)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("mimetype", "application/epub+zip")
+        archive.writestr(
+            "META-INF/container.xml",
+            '<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container" version="1.0"><rootfiles>'
+            '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles></container>',
+        )
+        archive.writestr(
+            "OEBPS/content.opf",
+            f'<package xmlns="http://www.idpf.org/2007/opf" version="3.0"><manifest>{manifest}</manifest>'
+            f"<spine>{itemrefs}</spine></package>",
+        )
+        for item, html in documents_by_id.items():
+            archive.writestr(f"OEBPS/text/{item}.xhtml", html)
+    return buffer.getvalue()
+
+
+def test_detect_kind():
+    """Test the extension decides the reader, then the content type"""
+    assert detect_kind("book.EPUB") == "epub"
+    assert detect_kind("upload", "text/markdown; charset=utf-8") == "markdown"
+    with pytest.raises(DocumentError):
+        detect_kind("slides.pptx", "application/octet-stream")
+
+
+def test_markdown_chapters():
+    """Test headings start chapters and code blocks are skipped"""
+    data = b"# Part One\n## The Start\n\nIt was *dark*.\nVery dark.\n\n```\nprint(1)\n```\n\n# Part Two\n\nLight.\n"
+    assert chapters(data, "markdown") == [
+        ("Part One. The Start", "Part One. The Start\n\nIt was *dark*. Very dark."),
+        ("Part Two", "Part Two\n\nLight."),
+    ]
+
+
+def test_plain_text_chapters_and_splitting():
+    """Test "Chapter" lines start chapters and long chapters continue in another"""
+    data = b"Preface text.\n\nCHAPTER I. Loomings\n\n" + b"Call me Ishmael. " * 10 + b"\n\nChapter 2\n\nThe end.\n"
+    result = chapters(data, "text", max_chars=100)
+    assert [title for title, _ in result] == [
+        "Section 1", "CHAPTER I. Loomings", "CHAPTER I. Loomings (continued)", "Chapter 2"
+    ]
+    assert all(len(text) <= 100 + len(title) + 2 for title, text in result)
+
+
+def test_docx_chapters():
+    """Test Word heading styles start chapters"""
+    data = make_docx([("My Book", "Title"), ("Foreword.", None), ("One", "Heading1"), ("It began.", None)])
+    assert chapters(data, "docx") == [("My Book", "My Book\n\nForeword."), ("One", "One\n\nIt began.")]
+
+
+def test_epub_chapters_follow_spine():
+    """Test EPUB content documents are read in spine order without markup"""
+    data = make_epub(
+        {
+            "c1": "<html><head><title>x</title><style>p{}</style></head>"
+                  "<body><h1>Arrival &amp; Rest</h1><p>Hello <i>there</i>.</p></body></html>",
+            "c2": "<html><body><p>Untitled opening.</p></body></html>",
+        },
+        ["c2", "c1"],
+    )
+    assert chapters(data, "epub") == [
+        ("Section 1", "Untitled opening."),
+        ("Arrival & Rest", "Arrival & Rest\n\nHello there."),
+    ]
+
+
+def test_zip_limits(monkeypatch):
+    """Test broken and oversized containers are rejected"""
+    with pytest.raises(DocumentError):
+        chapters(b"not a zip", "docx")
+    monkeypatch.setattr(documents, "MAX_INFLATED_BYTES", 1000)
+    with pytest.raises(DocumentError):
+        chapters(make_docx([("word " * 1000, None)]), "docx")
+
+
+def test_extraction_memory_is_bounded(tmp_path):
+    """Test a large upload streams through without being loaded whole"""
+    path = tmp_path / "big.txt"
+    with open(path, "wb") as f:
+        for i in range(20000):
+            f.write(b"Chapter %d\n\n" % i if i % 500 == 0 else b"A line of narration for the book. " * 12 + b"\n\n")
+    assert path.stat().st_size > 7_000_000
+
+    tracemalloc.start()
+    with open(path, "rb") as f:
+        count = sum(1 for _ in iter_chapters(f, "text", 20000))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert count > 40
+    assert peak < 1_000_000
+
+
+def upload(client, data: bytes, filename: str, device_id: str):
+    return client.post(
+        "/api/v1/documents/generate",
+        files={"file": (filename, data)},
+        data={"voice_id": "fake:default"},
+        headers={"X-Device-Id": device_id},
+    )
+
+
+def wait_for_document(client, job_id: str, device_id: str) -> dict:
+    for _ in range(200):
+        response = client.get(f"/api/v1/documents/{job_id}", headers={"X-Device-Id": device_id})
+        assert response.status_code == 200
+        if response.json()["status"] != "processing":
+            return response.json()
+        time.sleep(0.01)
+    raise AssertionError("document narration didn't finish")
+
+
+def test_generate_document(client, device_id, fake_provider):
+    """Test an upload is narrated per chapter in the background and billed for what was spoken"""
+    db = next(client.app.dependency_overrides[get_db]())
+    db.add(GenerationToken(device_id=device_id, total_tokens=1))
+    db.commit()
+
+    response = upload(client, b"# One\n\nFirst chapter.\n\n# Two\n\nSecond chapter.\n", "book.md", device_id)
+    assert response.status_code == 202
+    started = response.json()
+    assert started["status"] == "processing"
+    assert [(c["title"], c["status"]) for c in started["chapters"]] == [("One", "pending"), ("Two", "pending")]
+
+    manifest = wait_for_document(client, started["job_id"], device_id)
+    assert manifest["status"] == "completed"
+    assert [(c["title"], c["status"]) for c in manifest["chapters"]] == [("One", "completed"), ("Two", "completed")]
+    assert all(c["audio_url"].startswith("/audio/") for c in manifest["chapters"])
+    assert manifest["characters_used"] == len("One First chapter.") + len("Two Second chapter.")
+
+    db.expire_all()
+    tokens = db.query(GenerationToken).filter(GenerationToken.device_id == device_id).one()
+    assert tokens.used_credits == manifest["characters_used"]
+    assert tokens.reserved_credits == 0
+    assert db.query(VoiceGeneration).count() == 2
+    # Only the device that uploaded it can poll it
+    assert client.get(
+        f"/api/v1/documents/{started['job_id']}", headers={"X-Device-Id": "another-device"}
+    ).status_code == 404
+
+
+def test_document_billed_as_submitted(client, device_id, fake_provider):
+    """Test numbers spelled out for speech don't cost more, like /generate"""
+    db = next(client.app.dependency_overrides[get_db]())
+    db.add(GenerationToken(device_id=device_id, total_tokens=1))
+    db.commit()
+
+    text = b"It cost 1999 dollars in 1984."
+    response = upload(client, text, "note.txt", device_id)
+    assert response.status_code == 202
+    assert response.json()["chapters"][0]["characters"] == len(text)
+    manifest = wait_for_document(client, response.json()["job_id"], device_id)
+    assert manifest["characters_used"] == len(text)
+
+
+def test_document_upload_cap(client, device_id, fake_provider, monkeypatch, tmp_path):
+    """Test an upload over the cap is refused while it's copied, leaving nothing behind"""
+    monkeypatch.setattr(settings, "DOCUMENT_MAX_UPLOAD_MB", 1)
+    response = upload(client, b"Words. " * 200_000, "big.txt", device_id)
+    assert response.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+    assert fake_provider.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_document_charges_spoken_chapters(client, device_id, fake_provider, monkeypatch):
+    """Test a narration cut off at shutdown charges finished chapters and releases the rest"""
+    db = next(client.app.dependency_overrides[get_db]())
+    db.add(GenerationToken(device_id=device_id, total_tokens=1))
+    db.commit()
+    render = fake_provider.render
+    stalled = asyncio.Event()
+
+    async def stall_on_two(text, *args, **kwargs):
+        if "Two" in text:
+            stalled.set()
+            await asyncio.Event().wait()
+        return await render(text, *args, **kwargs)
+
+    monkeypatch.setattr(fake_provider, "render", stall_on_two)
+    monkeypatch.setattr(document_api, "DOCUMENT_MAX_IN_FLIGHT", 1)
+    transport = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        response = await http.post(
+            "/api/v1/documents/generate",
+            files={"file": ("book.md", b"# One\n\nFirst.\n\n# Two\n\nSecond.\n")},
+            data={"voice_id": "fake:default"},
+            headers={"X-Device-Id": device_id},
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        await asyncio.wait_for(stalled.wait(), timeout=5)
+        assert await document_api.document_jobs.cancel() == 1
+        manifest = (await http.get(f"/api/v1/documents/{job_id}", headers={"X-Device-Id": device_id})).json()
+
+    assert manifest["status"] == "completed"
+    assert [c["status"] for c in manifest["chapters"]] == ["completed", "failed"]
+    db.expire_all()
+    tokens = db.query(GenerationToken).filter(GenerationToken.device_id == device_id).one()
+    assert (tokens.used_credits, tokens.reserved_credits) == (len("One First."), 0)
+
+
+def test_generate_document_rejections(client, device_id, fake_provider):
+    """Test unsupported, empty and unpaid uploads are refused before synthesis"""
+    assert upload(client, b"slides", "deck.pptx", device_id).status_code == 415
+    assert upload(client, b"\n\n", "empty.txt", device_id).status_code == 400
+    # Documents need tokens; the free trial doesn't cover them
+    assert upload(client, b"Some text.", "note.txt", device_id).status_code == 402
+    assert fake_provider.calls == 0
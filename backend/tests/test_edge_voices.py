@@ -0,0 +1,180 @@
+import asyncio
+import gzip
+import json
+import time
+
+import pytest
+from app.services.edge_voices import EdgeVoiceSnapshot
+from app.services.providers import build_registry
+
+
+def voice(short_name, locale="en-US", gender="Female", **extra):
+    return {"ShortName": short_name, "Locale": locale, "Gender": gender, **extra}
+
+
+VOICES = [
+    voice("en-US-AriaNeural"),
+    voice("en-US-GuyNeural", gender="Male"),
+    voice("de-DE-KatjaNeural", locale="de-DE"),
+]
+
+
+class FakeUpstream:
+    def __init__(self, voices):
+        self.voices = voices
+        self.calls = 0
+        self.error = None
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0)
+        if self.error:
+            raise self.error
+        return list(self.voices)
+
+
+@pytest.fixture
+def upstream():
+    return FakeUpstream(VOICES)
+
+
+@pytest.fixture
+def snapshot(tmp_path, upstream):
+    return EdgeVoiceSnapshot(str(tmp_path / "edge_voices.json.gz"), max_age=3600, fetch=upstream)
+
+
+@pytest.mark.asyncio
+async def test_refresh_persists_snapshot(snapshot, upstream):
+    """Test a refresh is written to disk and loads without the network"""
+    diff = await snapshot.refresh()
+    assert sorted(diff.added) == sorted(v["ShortName"] for v in VOICES)
+
+    reloaded = EdgeVoiceSnapshot(snapshot.path, max_age=3600, fetch=upstream)
+    assert reloaded.load()
+    assert reloaded.voices == snapshot.voices
+    assert reloaded.body == snapshot.body
+    assert not reloaded.stale
+    assert upstream.calls == 1
+
+
+def test_load_missing_or_corrupt(tmp_path):
+    """Test a missing or unreadable snapshot is ignored"""
+    snapshot = EdgeVoiceSnapshot(str(tmp_path / "missing.json.gz"), max_age=3600)
+    assert not snapshot.load()
+    assert json.loads(snapshot.body) == {"voices": [], "total": 0}
+
+    (tmp_path / "missing.json.gz").write_bytes(b"not gzip")
+    assert not snapshot.load()
+
+
+@pytest.mark.asyncio
+async def test_diff_updates_only_changed_entries(snapshot, upstream):
+    """Test refreshes report what changed and keep indexes in step"""
+    await snapshot.refresh()
+    body = snapshot.body
+
+    assert not await snapshot.refresh()
+    assert snapshot.body is body
+
+    upstream.voices = [
+        voice("en-US-AriaNeural", locale="en-GB"),
+        voice("en-US-GuyNeural", gender="Male"),
+        voice("fr-FR-DeniseNeural", locale="fr-FR"),
+    ]
+    diff = await snapshot.refresh()
+    assert diff.added == ["fr-FR-DeniseNeural"]
+    assert diff.removed == ["de-DE-KatjaNeural"]
+    assert diff.changed == ["en-US-AriaNeural"]
+    assert snapshot.by_locale["en-US"] == {"en-US-GuyNeural"}
+    assert snapshot.by_locale["en-GB"] == {"en-US-AriaNeural"}
+    assert not snapshot.by_locale["de-DE"]
+    assert [v["ShortName"] for v in snapshot.filter(gender="female")] == ["en-US-AriaNeural", "fr-FR-DeniseNeural"]
+    assert json.loads(gzip.decompress(snapshot.body_gzip))["total"] == 3
+    assert snapshot.body is not body
+
+
+@pytest.mark.asyncio
+async def test_stale_snapshot_served_while_revalidating(snapshot, upstream):
+    """Test stale reads return at once and trigger a single refresh"""
+    await snapshot.refresh()
+    snapshot.fetched_at = time.time() - 7200
+    upstream.voices = VOICES + [voice("ja-JP-NanamiNeural", locale="ja-JP")]
+
+    await snapshot.ensure_fresh()
+    await snapshot.ensure_fresh()
+    assert len(snapshot.voices) == 3
+
+    await snapshot._refresh_task
+    assert upstream.calls == 2
+    assert "ja-JP-NanamiNeural" in snapshot.voices
+    assert not snapshot.stale
+
+
+@pytest.mark.asyncio
+async def test_warm_up_fetches_missing_snapshot(monkeypatch, snapshot, upstream):
+    """Test startup fetches the voice list in the background when none is on disk"""
+    from app import readiness
+
+    monkeypatch.setattr("app.services.edge_voices.edge_voices", snapshot)
+    monkeypatch.setattr(readiness.settings, "TTS_PROVIDER_MODE", "live")
+    monkeypatch.setattr(readiness, "readiness", readiness.Readiness(readiness.readiness.checks, ["upstream"]))
+    monkeypatch.setattr(readiness, "_warm_http_pool", _no_warm)
+    await readiness.warm_up()
+    await snapshot._refresh_task
+    assert upstream.calls == 1
+    assert len(snapshot.voices) == 3
+    assert b"de-DE-KatjaNeural" in snapshot.body
+
+
+async def _no_warm():
+    pass
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_keeps_snapshot(snapshot, upstream):
+    """Test upstream errors and empty lists don't wipe the snapshot"""
+    await snapshot.refresh()
+    upstream.error = ConnectionError("offline")
+    assert await snapshot.refresh() is None
+    upstream.error = None
+    upstream.voices = []
+    assert await snapshot.refresh() is None
+    assert len(snapshot.voices) == 3
+
+
+@pytest.mark.asyncio
+async def test_edge_voices_are_validated(monkeypatch, snapshot, upstream):
+    """Test Edge voices are checked against the snapshot, or by their shape before it loads"""
+    monkeypatch.setattr("app.services.edge_voices.edge_voices", snapshot)
+    upstream.voices = VOICES + [voice("fr-CA-SylvieNeural", locale="fr-CA")]
+    edge = build_registry("live").get("edge")
+    assert edge.has_voice("en-GB-RyanNeural")
+    assert edge.has_voice("zh-CN-liaoning-XiaobeiNeural")
+    assert not edge.has_voice("nobody")
+    assert not edge.has_voice("en-US-Guy")
+
+    await snapshot.refresh()
+    assert edge.has_voice("fr-CA-SylvieNeural")
+    assert not edge.has_voice("en-GB-RyanNeural")
+
+
+@pytest.fixture
+def served(monkeypatch, snapshot):
+    monkeypatch.setattr("app.api.v1.voices.edge_voices", snapshot)
+    return snapshot
+
+
+def test_all_voices_endpoint(client, served, upstream):
+    """Test /voices/all serves the compressed snapshot with validators"""
+    response = client.get("/api/v1/voices/all", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["total"] == 3
+    etag = response.headers["etag"]
+
+    response = client.get("/api/v1/voices/all", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = client.get("/api/v1/voices/all?locale=de-DE")
+    assert [v["ShortName"] for v in response.json()["voices"]] == ["de-DE-KatjaNeural"]
+    assert upstream.calls == 1
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+from app.database import get_db
+from app.models import VoiceGeneration
+from app.services import export
+from app.services.audio_cache import audio_cache
+
+
+@pytest.fixture
+def history(client, device_id, monkeypatch, tmp_path):
+    """Five generations over three files, one of which is no longer cached"""
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+    (tmp_path / "a.mp3").write_bytes(b"\xff\xfb" + b"a" * 5000)
+    (tmp_path / "b.mp3").write_bytes(b"\xff\xfb" + b"b" * 300)
+    db = next(client.app.dependency_overrides[get_db]())
+    start = datetime(2026, 1, 1)
+    for i, name in enumerate(["a", "b", "a", "gone", "b"]):
+        db.add(VoiceGeneration(
+            device_id=device_id,
+            voice_id="edge:en-US-JennyNeural",
+            provider="edge",
+            text_length=10 + i,
+            audio_url=f"/audio/{name}.mp3",
+            created_at=start + timedelta(minutes=i),
+        ))
+    db.add(VoiceGeneration(device_id="other", voice_id="edge:x", provider="edge", text_length=1, audio_url="/audio/a.mp3"))
+    db.commit()
+    return tmp_path
+
+
+def test_export_in_resumable_parts(client, device_id, history, monkeypatch):
+    """Test parts hold stored audio once each, a manifest, and chain by cursor"""
+    monkeypatch.setattr(export, "PAGE_SIZE", 2)
+    headers = {"X-Device-Id": device_id}
+    response = client.get("/api/v1/tts/export?limit=3", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    cursor = response.headers["x-export-next-cursor"]
+
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == ["audio/a.mp3", "audio/b.mp3", "manifest.csv"]
+    assert all(i.compress_type == zipfile.ZIP_STORED for i in archive.infolist())
+    assert archive.read("audio/a.mp3") == (history / "a.mp3").read_bytes()
+    rows = list(csv.DictReader(io.StringIO(archive.read("manifest.csv").decode())))
+    assert [(r["text_length"], r["file"]) for r in rows] == [("10", "audio/a.mp3"), ("11", "audio/b.mp3"), ("12", "audio/a.mp3")]
+
+    # Retrying a part gets the same generations
+    again = zipfile.ZipFile(io.BytesIO(client.get(f"/api/v1/tts/export?limit=3&cursor={cursor}", headers=headers).content))
+    assert again.namelist() == ["audio/b.mp3", "manifest.csv"]
+    response = client.get(f"/api/v1/tts/export?limit=3&cursor={cursor}&manifest=json", headers=headers)
+    assert "x-export-next-cursor" not in response.headers
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == ["audio/b.mp3", "manifest.json"]
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["next_cursor"] is None
+    assert [(g["text_length"], g["file"]) for g in manifest["generations"]] == [(13, None), (14, "audio/b.mp3")]
+
+
+def test_export_streams_in_chunks(client, device_id, history, monkeypatch):
+    """Test audio is sent a chunk at a time rather than buffered per file"""
+    monkeypatch.setattr(export, "CHUNK_SIZE", 1024)
+    db = next(client.app.dependency_overrides[get_db]())
+    through, more = export.plan_part(db, device_id, None, 10)
+    assert not more
+    pieces = list(export.stream_export(db, device_id, None, through))
+    assert len(pieces) > 5
+    assert max(len(p) for p in pieces) < 1024 + 200
+    assert zipfile.ZipFile(io.BytesIO(b"".join(pieces))).testzip() is None
+
+
+def test_export_empty_history(client):
+    """Test a device without generations gets an archive with an empty manifest"""
+    response = client.get("/api/v1/tts/export?manifest=json", headers={"X-Device-Id": "nobody"})
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert json.loads(archive.read("manifest.json"))["generations"] == []
+    assert client.get("/api/v1/tts/export?cursor=bogus", headers={"X-Device-Id": "nobody"}).status_code == 400
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+from app.services.audio_cache import audio_cache
+from app.services.providers import FakeBehavior, FakeProvider, build_registry
+from app.services.providers.fake import parse_faults, parse_latency
+from app.services.retry import UpstreamError
+from app.services.tts_service import TTSService
+
+FRAME = 144
+
+
+def test_parse_specs():
+    """Test latency distributions and fault mixes parse, and bad specs don't"""
+    rng = random.Random(0)
+    assert parse_latency("0.05")(rng) == 0.05
+    assert all(0.02 <= parse_latency("uniform:0.02:0.2")(rng) <= 0.2 for _ in range(100))
+    assert all(parse_latency("normal:0.01:1")(rng) >= 0 for _ in range(100))
+    assert parse_latency("lognormal:0.1:0")(rng) == pytest.approx(0.1)
+    assert parse_faults("503:0.05, empty:0.01") == [("503", 0.05), ("empty", 0.01)]
+    assert parse_faults("") == []
+    for spec in ("gamma:1:2", "uniform:1", "fast"):
+        with pytest.raises(ValueError):
+            parse_latency(spec)
+    for spec in ("oops:0.1", "503:2", "503:0.6,429:0.6"):
+        with pytest.raises(ValueError):
+            parse_faults(spec)
+
+
+@pytest.mark.asyncio
+async def test_chunked_audio_is_valid_mp3(tmp_path):
+    """Test streamed output is whole frames, proportional to the text"""
+    provider = FakeProvider(behavior=FakeBehavior(chunk_ms=100))
+    short, long = tmp_path / "short.mp3", tmp_path / "long.mp3"
+    assert await provider.render("Hi there.", "default", 1.0, "mp3", str(short))
+    assert await provider.render("Hi there. " * 10, "default", 1.0, "mp3", str(long))
+    audio = long.read_bytes()
+    assert len(audio) % FRAME == 0
+    assert all(audio[i:i + 2] == b"\xff\xf3" for i in range(0, len(audio), FRAME))
+    assert len(audio) > 9 * short.stat().st_size
+
+
+@pytest.mark.asyncio
+async def test_faults_are_deterministic(tmp_path):
+    """Test the same seed injects the same faults into the same requests"""
+
+    async def outcomes(seed):
+        provider = FakeProvider(behavior=FakeBehavior(faults="503:0.3,empty:0.2", seed=seed))
+        results = []
+        for i in range(30):
+            try:
+                results.append(await provider.render(f"Line {i % 10}", "default", 1.0, "mp3", str(tmp_path / "a.mp3")))
+            except UpstreamError as e:
+                assert e.retryable and e.status == 503
+                results.append(e.status)
+        return results
+
+    first = await outcomes(1)
+    assert first == await outcomes(1)
+    assert first != await outcomes(2)
+    assert {True, False, 503} == set(first)
+
+
+def test_fake_mode_registry():
+    """Test fake mode stands in for every provider, keeping voices and settings"""
+    live, fake = build_registry("live"), build_registry("fake")
+    assert set(fake.names()) == set(live.names()) | {"fake"}
+    openai = fake.get("openai")
+    assert isinstance(openai, FakeProvider)
+    assert openai.capabilities.formats == {"mp3"}
+    assert openai.capabilities.max_chars == live.get("openai").capabilities.max_chars
+    assert openai.has_voice("alloy") and not openai.has_voice("nobody")
+    assert fake.get("edge").speed_setting(1.5) == "+50%"
+    with pytest.raises(ValueError):
+        build_registry("staging")
+
+
+@pytest.mark.asyncio
+async def test_injected_faults_are_retried(monkeypatch, tmp_path):
+    """Test the pipeline retries injected 5xx like a real outage"""
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+    monkeypatch.setattr("app.services.retry.asyncio.sleep", _no_sleep)
+    registry = build_registry("fake")
+    provider = FakeProvider(behavior=FakeBehavior(faults="503:0.5", seed=3), imitating=registry.get("openai"))
+    registry.register(provider)
+    service = TTSService(registry)
+    for i in range(5):
+        assert await service.synthesize("openai", "alloy", f"Sentence number {i}.")
+    assert provider.calls > 5
+
+
+async def _no_sleep(delay):
+    pass
@@ -0,0 +1,114 @@
+import pytest
+from app.database import get_db
+from app.models import GenerationToken
+from app.services.lexicon import GLOBAL_SCOPE, LexiconStore, Matcher, lexicon_store, upsert_entry
+
+
+def test_matcher_whole_words():
+    """Test terms match case-insensitively on word boundaries only"""
+    matcher = Matcher({"AI": "A I", "Nginx": "engine x", "C++": "C plus plus"})
+    assert matcher.apply("ai on nginx, not AIR or plain") == "A I on engine x, not AIR or plain"
+    assert matcher.apply("Written in C++.") == "Written in C plus plus."
+
+
+def test_matcher_leftmost_longest():
+    """Test overlapping terms resolve to the longest match starting first"""
+    matcher = Matcher({"new york": "N Y C", "york": "yorrk", "he": "HE", "she": "SHE", "hers": "HERS"})
+    assert matcher.apply("New York and york") == "N Y C and yorrk"
+    assert matcher.apply("she says hers, ushers") == "SHE says HERS, ushers"
+    assert Matcher({}).apply("unchanged") == "unchanged"
+
+
+def test_matcher_length_changing_lowercase():
+    """Test offsets survive characters whose lowercase is longer"""
+    matcher = Matcher({"istanbul": "is-tan-bul"})
+    assert matcher.apply("İ Istanbul") == "İ is-tan-bul"
+
+
+def test_store_rebuilds_on_edit(client, device_id):
+    """Test compiled matchers are cached and refreshed after edits"""
+    db = next(client.app.dependency_overrides[get_db]())
+    store = LexiconStore()
+    upsert_entry(db, GLOBAL_SCOPE, "GIF", "jif")
+    first = store.matcher(db, device_id)
+    assert store.matcher(db, device_id) is first
+    assert first.apply("a GIF") == "a jif"
+
+    upsert_entry(db, device_id, "gif", "ghif")
+    assert store.matcher(db, device_id).apply("a GIF") == "a ghif"
+    assert store.matcher(db, "other-device").apply("a GIF") == "a jif"
+
+    upsert_entry(db, GLOBAL_SCOPE, "SQL", "sequel")
+    assert store.matcher(db, device_id).apply("SQL GIF") == "sequel ghif"
+
+
+def test_lexicon_crud(client, device_id):
+    """Test devices manage their own entries"""
+    headers = {"X-Device-Id": device_id}
+    body = {"term": "Kubernetes", "replacement": "koo-ber-net-eez"}
+    response = client.put("/api/v1/lexicon/", json=body, headers=headers)
+    assert response.status_code == 200
+    entry = response.json()
+    assert entry["scope"] == "device"
+
+    # Same term in another case updates the entry
+    client.put("/api/v1/lexicon/", json={"term": "kubernetes", "replacement": "koober netties"}, headers=headers)
+    entries = client.get("/api/v1/lexicon/", headers=headers).json()["entries"]
+    assert [(e["term"], e["replacement"]) for e in entries] == [("kubernetes", "koober netties")]
+
+    response = client.put("/api/v1/lexicon/", json={"term": "--", "replacement": "dash"}, headers=headers)
+    assert response.status_code == 400
+    assert client.delete(f"/api/v1/lexicon/{entry['id']}", headers={"X-Device-Id": "someone-else"}).status_code == 404
+    assert client.delete(f"/api/v1/lexicon/{entry['id']}", headers=headers).status_code == 204
+    assert client.get("/api/v1/lexicon/", headers=headers).json()["total"] == 0
+
+
+def test_global_lexicon_requires_admin(client, monkeypatch):
+    """Test global entries are managed through the admin API"""
+    monkeypatch.setattr("app.api.v1.admin.settings.ADMIN_API_KEY", "secret")
+    body = {"term": "SaaS", "replacement": "sass"}
+    assert client.put("/api/v1/admin/lexicon", json=body).status_code == 401
+    response = client.put("/api/v1/admin/lexicon", json=body, headers={"X-Admin-Key": "secret"})
+    assert response.json()["scope"] == "global"
+    entries = client.get("/api/v1/lexicon/?include_global=true", headers={"X-Device-Id": "d"}).json()["entries"]
+    assert [e["term"] for e in entries] == ["SaaS"]
+
+    # An empty device id can't reach the global scope
+    response = client.put("/api/v1/lexicon/", json={"term": "SaaS", "replacement": "x"}, headers={"X-Device-Id": ""})
+    assert response.status_code == 422
+    entries = client.get("/api/v1/admin/lexicon", headers={"X-Admin-Key": "secret"}).json()["entries"]
+    assert [e["replacement"] for e in entries] == ["sass"]
+
+
+@pytest.fixture
+def fake_provider(fake_provider):
+    lexicon_store.clear()
+    yield fake_provider
+    lexicon_store.clear()
+
+
+def test_generate_applies_lexicon(client, device_id, fake_provider, monkeypatch):
+    """Test respellings reach the provider, change the cache key and aren't billed"""
+    spoken = []
+    render = fake_provider.render
+
+    async def recording_render(text, *args, **kwargs):
+        spoken.append(text)
+        return await render(text, *args, **kwargs)
+
+    monkeypatch.setattr(fake_provider, "render", recording_render)
+    request = {"text": "Deploy with Nginx.", "voice_id": "fake:default"}
+    headers = {"X-Device-Id": device_id}
+
+    db = next(client.app.dependency_overrides[get_db]())
+    db.add(GenerationToken(device_id=device_id, total_tokens=1))
+    db.commit()
+
+    first = client.post("/api/v1/tts/generate", json=request, headers=headers).json()
+    client.put("/api/v1/lexicon/", json={"term": "nginx", "replacement": "engine x"}, headers=headers)
+    upsert_entry(db, device_id, "deploy", "dee ploy")
+    second = client.post("/api/v1/tts/generate", json=request, headers=headers).json()
+
+    assert spoken == ["Deploy with Nginx.", "dee ploy with engine x."]
+    assert second["audio_url"] != first["audio_url"]
+    assert second["characters_used"] == first["characters_used"]
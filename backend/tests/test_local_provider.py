@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+from app.services.providers import FakeProvider, LocalProvider
+from app.services.providers.local import discover_voices
+from app.services.text_normalizer import language_for_voice
+from app.services.tts_service import tts_service
+
+
+class FailingProvider(FakeProvider):
+    name = "failing"
+
+    async def render(self, text, voice, speed, audio_format, dst_path, pitch="+0Hz") -> bool:
+        self.calls += 1
+        return False
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    config = {
+        "dataset": "lessac",
+        "audio": {"sample_rate": 22050, "quality": "medium"},
+        "language": {"code": "en_US", "name_english": "English"},
+    }
+    (tmp_path / "en_US-lessac-medium.onnx").write_bytes(b"")
+    (tmp_path / "en_US-lessac-medium.onnx.json").write_text(json.dumps(config))
+    # A model without its config is ignored
+    (tmp_path / "de_DE-thorsten-low.onnx").write_bytes(b"")
+    return str(tmp_path)
+
+
+def test_discover_voices(model_dir):
+    """Test Piper models are found by their config files"""
+    assert list(discover_voices(model_dir)) == ["en_US-lessac-medium"]
+
+
+def test_local_provider_catalog(client, model_dir, register_provider):
+    """Test local voices are listed as local:<voice>"""
+    provider = LocalProvider(model_dir, workers=2)
+    assert provider.capabilities.max_concurrency == 2
+    assert provider.capabilities.formats == {"wav"}
+    assert provider.has_voice("en_US-lessac-medium")
+    assert not provider.has_voice("de_DE-thorsten-low")
+    assert language_for_voice("local", "en_US-lessac-medium") == "en"
+
+    register_provider(provider)
+    voices = client.get("/api/v1/voices/?provider=Local").json()["voices"]
+    assert [v["id"] for v in voices] == ["local:en_US-lessac-medium"]
+    assert voices[0]["locale"] == "en-US"
+
+
+def test_workers_default_to_core_count(model_dir):
+    """Test the process pool is sized to the machine"""
+    assert LocalProvider(model_dir).workers == (os.cpu_count() or 1)
+
+
+@pytest.mark.asyncio
+async def test_fallback_voice(fake_provider, register_provider, monkeypatch):
+    """Test a failing provider is retried with the fallback voice"""
+    failing = register_provider(FailingProvider())
+    monkeypatch.setattr(tts_service, "fallback_voice", "fake:default")
+    filename = await tts_service.synthesize("failing", "default", "Hello there.")
+    assert filename
+    assert failing.calls == 1
+    assert fake_provider.calls == 1
+
+    monkeypatch.setattr(tts_service, "fallback_voice", "")
+    assert await tts_service.synthesize("failing", "default", "Another line.") is None
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from app.api.v1 import admin
+from app.profiling import LoopLagMonitor, ProfilerBusy, _profile_lock, format_collapsed, sample_stacks
+
+
+@pytest.fixture
+def admin_key(monkeypatch):
+    monkeypatch.setattr(admin.settings, "ADMIN_API_KEY", "secret")
+    return {"X-Admin-Key": "secret"}
+
+
+def spin_in_busy_function(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sample_stacks_collapsed():
+    """Test samples are collapsed into flamegraph lines per thread"""
+    stop = threading.Event()
+    worker = threading.Thread(target=spin_in_busy_function, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        stacks = sample_stacks(0.1, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    busy = [s for s in stacks if s.startswith("busy-worker;")]
+    assert busy
+    assert any("spin_in_busy_function (test_profiling.py:" in s for s in busy)
+    line = format_collapsed(stacks).splitlines()[0]
+    stack, count = line.rsplit(" ", 1)
+    assert int(count) >= 1
+
+
+def test_one_profile_at_a_time():
+    """Test concurrent profiles are refused"""
+    with _profile_lock:
+        with pytest.raises(ProfilerBusy):
+            sample_stacks(0.01)
+
+
+def test_profile_endpoint(client, admin_key):
+    """Test the admin endpoint returns collapsed stacks including the loop"""
+    response = client.post("/api/v1/admin/profile?seconds=0.1&interval_ms=5", headers=admin_key)
+    assert response.status_code == 200
+    assert "profile.collapsed" in response.headers["content-disposition"]
+    assert "event-loop;" in response.text
+
+
+def test_profile_requires_admin(client, admin_key):
+    """Test profiling is admin-only"""
+    response = client.post("/api/v1/admin/profile?seconds=0.1", headers={"X-Admin-Key": "wrong"})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_loop_monitor_reports_blocking_callback(caplog):
+    """Test a callback that blocks the loop is counted and its stack logged"""
+    monitor = LoopLagMonitor(threshold=0.05, interval=0.01)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.03)
+        time.sleep(0.2)  # blocks the loop
+        await asyncio.sleep(0.03)
+    finally:
+        await monitor.stop()
+
+    blocked = [r for r in caplog.records if r.getMessage() == "event loop blocked"]
+    assert len(blocked) == 1
+    assert "test_loop_monitor_reports_blocking_callback" in blocked[0].stack
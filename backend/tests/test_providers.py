@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+import pytest
+from app.database import get_db
+from app.models import VoiceGeneration
+from app.services.providers import FakeProvider, ProviderCapabilities, build_registry, registry
+from app.services.tts_service import tts_service
+
+
+def test_default_registry():
+    """Test built-in providers are registered with capability metadata"""
+    live = build_registry("live")
+    assert {"openai", "edge"} <= set(live.names())
+    assert "fake" not in live.names()
+    openai = live.get("OpenAI")
+    assert isinstance(openai.capabilities, ProviderCapabilities)
+    assert "opus" in openai.capabilities.formats
+    assert live.get("edge").capabilities.pitch
+
+
+def test_speed_settings():
+    """Test speed is rendered per provider"""
+    assert registry.get("edge").speed_setting(1.5) == "+50%"
+    assert registry.get("openai").speed_setting(1.5) == "1.50"
+
+
+@pytest.mark.asyncio
+async def test_synthesize_uses_cache(fake_provider):
+    """Test identical requests are rendered once"""
+    first = await tts_service.synthesize("fake", "default", "Hello there.")
+    second = await tts_service.synthesize("fake", "default", "Hello there.")
+    assert first == second
+    assert fake_provider.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_synthesize_splits_long_text(monkeypatch, fake_provider):
+    """Test text over max_chars is split into several upstream calls"""
+    monkeypatch.setattr(FakeProvider, "capabilities", ProviderCapabilities(max_chars=20))
+    monkeypatch.setattr("app.services.tts_service.can_transcode", lambda: False)
+    monkeypatch.setattr("app.services.audio_merge.can_transcode", lambda: False)
+    filename = await tts_service.synthesize("fake", "default", "One sentence here. Another one here. And a third.")
+    assert filename
+    assert fake_provider.calls == 3
+
+
+def test_generate_with_registered_provider(client, device_id, fake_provider):
+    """Test routers dispatch through the registry"""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello from the fake provider.", "voice_id": "fake:default"},
+        headers={"X-Device-Id": device_id},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["provider"] == "fake"
+    assert data["audio_url"].endswith(".mp3")
+
+    voices = client.get("/api/v1/voices/?provider=Fake").json()
+    assert [v["id"] for v in voices["voices"]] == ["fake:default"]
+
+
+def test_unknown_voice_rejected_before_trial_used(client, device_id):
+    """Test voice validation happens before the free trial is consumed"""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello", "voice_id": "openai:nonexistent"},
+        headers={"X-Device-Id": device_id},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown OpenAI voice: nonexistent"
+    status = client.get("/api/v1/tokens/status", headers={"X-Device-Id": device_id}).json()
+    assert status["free_trial_available"] is True
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_coalesce(fake_provider):
+    """Test concurrent identical requests share one upstream call"""
+    fake_provider.latency = 0.05
+    results = await asyncio.gather(*(
+        tts_service.synthesize("fake", "default", "Same text for everyone.") for _ in range(5)
+    ))
+    assert len(set(results)) == 1
+    assert fake_provider.calls == 1
+    assert tts_service._inflight == {}
+
+    # Different text is not coalesced
+    await asyncio.gather(
+        tts_service.synthesize("fake", "default", "First text."),
+        tts_service.synthesize("fake", "default", "Second text."),
+    )
+    assert fake_provider.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_coalesced_requests_survive_cancellation(fake_provider):
+    """Test a cancelled caller doesn't cancel synthesis others wait on"""
+    fake_provider.latency = 0.05
+    first = asyncio.create_task(tts_service.synthesize("fake", "default", "Shared and cancelled."))
+    second = asyncio.create_task(tts_service.synthesize("fake", "default", "Shared and cancelled."))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second
+    assert fake_provider.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_are_each_charged(client, fake_provider):
+    """Test every caller of a coalesced generation is billed and recorded"""
+    fake_provider.latency = 0.05
+    transport = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        responses = await asyncio.gather(*(
+            http.post(
+                "/api/v1/tts/generate",
+                json={"text": "A viral preview line.", "voice_id": "fake:default"},
+                headers={"X-Device-Id": f"device-{i}"},
+            )
+            for i in range(3)
+        ))
+    assert [r.status_code for r in responses] == [200] * 3
+    assert len({r.json()["audio_url"] for r in responses}) == 1
+    assert fake_provider.calls == 1
+
+    db = next(client.app.dependency_overrides[get_db]())
+    assert db.query(VoiceGeneration).count() == 3
@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from app.database import add_missing_columns, get_db
+from app.models import CHARACTERS_PER_TOKEN, CreditHold, FreeTrialUsage, GenerationToken, VoiceGeneration
+from app.services import quota
+
+
+@pytest.fixture
+def db(client):
+    return next(client.app.dependency_overrides[get_db]())
+
+
+@pytest.fixture
+def paid_device(db, device_id):
+    db.add(FreeTrialUsage(device_id=device_id, used=True))
+    db.add(GenerationToken(device_id=device_id, total_tokens=2))
+    db.commit()
+    return device_id
+
+
+def test_cost_by_tier():
+    """Test characters are priced per provider tier"""
+    assert quota.cost({"edge": 1000}) == 1000
+    assert quota.cost({"openai": 1000}) == 2000
+    assert quota.cost({"local": 3}) == 2
+    assert quota.cost({"openai": 10, "edge": 10}) == 30
+    # Unknown providers fail closed to the top tier
+    assert quota.cost({"OpenAI": 1000}) == quota.cost({"mystery": 1000}) == 2000
+
+
+def test_reserve_and_settle(db, paid_device):
+    """Test a hold is replaced by the exact charge"""
+    reservation = quota.reserve(db, paid_device, 1500)
+    record = db.query(GenerationToken).filter_by(device_id=paid_device).one()
+    db.refresh(record)
+    assert record.reserved_credits == 1500
+    assert record.remaining_credits == 500
+
+    # Holds count against the balance for other requests
+    with pytest.raises(quota.QuotaExceeded):
+        quota.reserve(db, paid_device, 600)
+
+    quota.settle(db, reservation, 1200)
+    db.commit()
+    db.refresh(record)
+    assert (record.reserved_credits, record.used_credits, record.used_tokens) == (0, 1200, 2)
+    assert record.remaining_credits == 800
+
+
+def test_release_refunds_hold(db, paid_device):
+    """Test a failed generation charges nothing"""
+    quota.release(db, quota.reserve(db, paid_device, 2000))
+    db.commit()
+    record = db.query(GenerationToken).filter_by(device_id=paid_device).one()
+    db.refresh(record)
+    assert record.remaining_credits == 2 * CHARACTERS_PER_TOKEN
+    assert record.used_tokens == 0
+
+
+def test_generate_charges_by_characters(client, db, paid_device, fake_provider):
+    """Test /generate bills characters and records usage in one commit"""
+    text = "Hello there. " * 20
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": text, "voice_id": "fake:default"},
+        headers={"X-Device-Id": paid_device},
+    )
+    assert response.status_code == 200
+    characters = response.json()["characters_used"]
+
+    status = client.get("/api/v1/tokens/status", headers={"X-Device-Id": paid_device}).json()
+    assert status["used_tokens"] == 1
+    assert status["remaining_characters"] == 2 * CHARACTERS_PER_TOKEN - characters
+    assert db.query(VoiceGeneration).filter_by(device_id=paid_device).count() == 1
+
+
+def test_script_providers_billed_by_registry_name(client, db, paid_device, monkeypatch, fake_provider):
+    """Test a provider spelled in another case in SSML is priced and recorded as itself"""
+    monkeypatch.setattr(quota, "PROVIDER_TIERS", {**quota.PROVIDER_TIERS, "fake": "premium"})
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": '<speak><voice name="FAKE:default">Hello there.</voice></speak>', "voice_id": "fake:default"},
+        headers={"X-Device-Id": paid_device},
+    )
+    assert response.status_code == 200
+    status = client.get("/api/v1/tokens/status", headers={"X-Device-Id": paid_device}).json()
+    assert status["remaining_characters"] == 2 * CHARACTERS_PER_TOKEN - 2 * response.json()["characters_used"]
+    generation = db.query(VoiceGeneration).filter_by(device_id=paid_device).one()
+    assert (generation.provider, generation.voice_id) == ("fake", "fake:default")
+
+
+def test_expansion_is_not_billed(client, paid_device, fake_provider):
+    """Test numbers expanded by normalization are billed as submitted, and capped once expanded"""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Call 1234567 now.", "voice_id": "edge:en-US-GuyNeural"},
+        headers={"X-Device-Id": paid_device},
+    )
+    assert response.status_code == 200
+    assert response.json()["characters_used"] == len("Call 1234567 now.")
+
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "1234567 " * 600, "voice_id": "edge:en-US-GuyNeural"},
+        headers={"X-Device-Id": paid_device},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Text is too long once normalized")
+
+
+def test_generate_rejects_request_over_balance(client, paid_device):
+    """Test a request costing more than the balance is refused up front"""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "x" * 1100 + ".", "voice_id": "openai:alloy"},
+        headers={"X-Device-Id": paid_device},
+    )
+    assert response.status_code == 402
+    assert response.json()["detail"].startswith("Not enough tokens for this request")
+
+
+def test_failed_generation_is_not_charged(client, db, paid_device, monkeypatch, fake_provider):
+    """Test the hold is released when synthesis fails"""
+    async def fail(*args, **kwargs):
+        return False
+
+    monkeypatch.setattr(fake_provider, "render", fail)
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Hello", "voice_id": "fake:default"},
+        headers={"X-Device-Id": paid_device},
+    )
+    assert response.status_code == 500
+    record = db.query(GenerationToken).filter_by(device_id=paid_device).one()
+    db.refresh(record)
+    assert (record.reserved_credits, record.used_credits) == (0, 0)
+
+
+def test_missing_columns_backfilled(tmp_path):
+    """Test pre-existing balances keep their usage when credit columns are added"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE generation_tokens (id INTEGER PRIMARY KEY, device_id VARCHAR NOT NULL, "
+            "total_tokens INTEGER, used_tokens INTEGER, created_at DATETIME, updated_at DATETIME)"
+        ))
+        conn.execute(text("INSERT INTO generation_tokens (device_id, total_tokens, used_tokens) VALUES ('d', 10, 3)"))
+    GenerationToken.__table__.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+    columns = {c["name"] for c in inspect(engine).get_columns("generation_tokens")}
+    assert {"used_credits", "reserved_credits"} <= columns
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT used_credits, reserved_credits FROM generation_tokens")).one()
+    assert tuple(row) == (3 * CHARACTERS_PER_TOKEN, 0)
+
+
+def test_expired_holds_are_released(db, paid_device):
+    """Test a hold left by a killed worker is handed back after its lease"""
+    abandoned = quota.reserve(db, paid_device, 1500)
+    live = quota.reserve(db, paid_device, 300)
+    assert quota.release_expired_holds(db) == 0
+
+    db.query(CreditHold).filter_by(id=abandoned.hold_id).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    assert quota.release_expired_holds(db) == 1
+    record = db.query(GenerationToken).filter_by(device_id=paid_device).one()
+    db.refresh(record)
+    assert record.reserved_credits == 300
+
+    # Settling after the sweep charges without returning the hold twice
+    quota.settle(db, abandoned, 1000)
+    quota.settle(db, live, 300)
+    db.commit()
+    db.refresh(record)
+    assert (record.reserved_credits, record.used_credits) == (0, 1300)
+    assert db.query(CreditHold).count() == 0
+
+
+def test_extend_renews_lease(db, paid_device):
+    """Test a growing hold keeps one row with the summed credits"""
+    reservation = quota.reserve(db, paid_device, 100)
+    hold = db.get(CreditHold, reservation.hold_id)
+    first_expiry = hold.expires_at
+    quota.extend(db, reservation, 400)
+    db.refresh(hold)
+    assert (hold.credits, reservation.credits) == (500, 500)
+    assert hold.expires_at >= first_expiry
@@ -0,0 +1,167 @@
+import httpx
+import pytest
+from app.services import retry
+from app.services.providers import build_registry
+from app.services.retry import RetryBudget, RetryPolicy, UpstreamError, parse_retry_after
+from app.services.tts_service import TTSService
+from app.services.audio_cache import audio_cache
+
+# The real OpenAI client against a mock transport, whatever the suite's provider mode
+live = build_registry("live")
+
+
+class FakeUpstream:
+    """Speech endpoint that plays back a script of faults, then succeeds"""
+
+    def __init__(self, *faults):
+        self.faults = list(faults)
+        self.requests = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        fault = self.faults.pop(0) if self.faults else None
+        if fault == "reset":
+            raise httpx.ReadError("connection reset by peer", request=request)
+        if fault == "truncated":
+            # Content-Length promises more than the body delivers
+            return httpx.Response(200, headers={"Content-Length": "100"}, stream=_Truncated())
+        if isinstance(fault, tuple):
+            status, headers = fault
+            return httpx.Response(status, headers=headers, text="upstream error")
+        return httpx.Response(200, content=b"ID3audio")
+
+
+class _Truncated(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield b"ID3"
+        raise httpx.RemoteProtocolError("peer closed connection without sending complete message body")
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def record(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(retry.asyncio, "sleep", record)
+    return delays
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    def install(*faults):
+        fake = FakeUpstream(*faults)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+        monkeypatch.setattr("app.services.providers.openai.get_http_client", lambda: client)
+        return fake
+
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+    return install
+
+
+def test_parse_retry_after():
+    """Test Retry-After in seconds and as an HTTP date"""
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_budget():
+    """Test retries are limited to a share of traffic"""
+    budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("faults", [
+    [(503, {})],
+    [(429, {"Retry-After": "2"})],
+    ["reset"],
+    ["truncated"],
+])
+async def test_transient_faults_are_retried(upstream, sleeps, faults):
+    """Test 5xx, 429, connection resets and truncated bodies are retried"""
+    fake = upstream(*faults)
+    filename = await TTSService(live).synthesize("openai", "alloy", "Hello there.")
+    assert filename
+    assert fake.requests == 2
+    assert len(sleeps) == 1
+    if faults[0] == (429, {"Retry-After": "2"}):
+        assert sleeps == [2.0]
+
+
+@pytest.mark.asyncio
+async def test_fatal_errors_are_not_retried(upstream, sleeps):
+    """Test client errors fail without retrying"""
+    fake = upstream((400, {}))
+    assert await TTSService(live).synthesize("openai", "alloy", "Hello there.") is None
+    assert fake.requests == 1
+    assert sleeps == []
+
+
+@pytest.mark.asyncio
+async def test_attempts_are_bounded(upstream, sleeps):
+    """Test a persistent outage gives up after max_attempts"""
+    fake = upstream(*[(502, {})] * 10)
+    assert await TTSService(live).synthesize("openai", "alloy", "Hello there.") is None
+    assert fake.requests == live.get("openai").retry_policy().max_attempts
+
+
+@pytest.mark.asyncio
+async def test_budget_stops_retry_amplification(upstream, sleeps):
+    """Test an exhausted budget turns retries off"""
+    fake = upstream(*[(503, {})] * 10)
+    service = TTSService(live)
+    service._retry_policies["openai"] = RetryPolicy(
+        max_attempts=5,
+        budget=RetryBudget(ratio=0, min_per_second=0, max_tokens=1),
+    )
+    assert await service.synthesize("openai", "alloy", "First request.") is None
+    assert await service.synthesize("openai", "alloy", "Second request.") is None
+    # One retry for the first request, none for the second
+    assert fake.requests == 3
+
+
+@pytest.mark.asyncio
+async def test_long_retry_after_fails_fast(sleeps):
+    """Test a Retry-After past max_delay gives up rather than retrying early"""
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) == 1:
+            raise UpstreamError("slow down", retryable=True, status=429, retry_after=120)
+        return "ok"
+
+    with pytest.raises(UpstreamError):
+        await RetryPolicy(max_delay=5).run(call, "test")
+    assert calls == [1]
+    assert sleeps == []
+
+    calls.clear()
+    assert await RetryPolicy(max_delay=500).run(call, "test") == "ok"
+    assert sleeps == [120]
+
+
+@pytest.mark.asyncio
+async def test_edge_no_audio_is_final(monkeypatch, tmp_path):
+    """Test Edge refusing to speak is not retried"""
+    from edge_tts.exceptions import NoAudioReceived
+
+    class Silent:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        async def save(self, path):
+            raise NoAudioReceived("No audio was received")
+
+    monkeypatch.setattr("edge_tts.Communicate", Silent)
+    with pytest.raises(UpstreamError) as e:
+        await live.get("edge").render("Hello.", "en-US-GuyNeural", 1.0, "mp3", str(tmp_path / "a.mp3"))
+    assert not e.value.retryable
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+from app.metrics import TOOL_NAME
+from app.services.scheduler import FairLimiter, current_priority, load_weights, priority
+
+WEIGHTS = {"paid": 8.0, "free_trial": 3.0, "preview": 1.0}
+
+
+async def drain(limiter: FairLimiter, classes):
+    """Queue one waiter per class name behind a held slot; grant order"""
+    order = []
+
+    async def worker(name):
+        async with limiter.slot(name):
+            order.append(name)
+
+    await limiter.acquire("paid")
+    tasks = [asyncio.create_task(worker(name)) for name in classes]
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_weighted_fair_order():
+    """Test saturated slots are shared by weight without starving previews"""
+    limiter = FairLimiter(1, WEIGHTS)
+    order = await drain(limiter, ["preview"] * 8 + ["paid"] * 16)
+    assert order[:9].count("paid") == 8
+    assert order[:9].count("preview") == 1
+    assert order.count("preview") == 8
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_idle_class_does_not_bank_credit():
+    """Test a class that sat idle doesn't get a burst of slots on return"""
+    limiter = FairLimiter(1, WEIGHTS)
+    await drain(limiter, ["paid"] * 40)
+    order = await drain(limiter, ["free_trial"] * 6 + ["paid"] * 12)
+    assert order[:12].count("free_trial") == 3
+
+
+@pytest.mark.asyncio
+async def test_uncontended_acquire_is_immediate():
+    """Test callers under capacity never queue"""
+    limiter = FairLimiter(2, WEIGHTS)
+    await limiter.acquire("preview")
+    await limiter.acquire("preview")
+    assert limiter.active == 2
+    assert limiter.waiting() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue():
+    """Test a cancelled waiter gives up its place and the slot still passes on"""
+    limiter = FairLimiter(1, WEIGHTS)
+    await limiter.acquire("paid")
+    cancelled = asyncio.create_task(limiter.acquire("paid"))
+    served = asyncio.create_task(limiter.acquire("preview"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    assert limiter.waiting() == 1
+
+    limiter.release()
+    await served
+    assert limiter.active == 1
+
+
+@pytest.mark.asyncio
+async def test_waiter_cancelled_as_slot_frees():
+    """Test a slot freed between a cancel and its handling skips the dead waiter"""
+    limiter = FairLimiter(1, WEIGHTS)
+    await limiter.acquire("paid")
+    cancelled = asyncio.create_task(limiter.acquire("paid"))
+    await asyncio.sleep(0)
+    # The waiter's future is cancelled now, its except block runs later
+    cancelled.cancel()
+    limiter.release()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    assert (limiter.active, limiter.waiting()) == (0, 0)
+
+    # Granted, then cancelled before the task resumed: the slot is handed on
+    await limiter.acquire("paid")
+    granted = asyncio.create_task(limiter.acquire("paid"))
+    served = asyncio.create_task(limiter.acquire("preview"))
+    await asyncio.sleep(0)
+    limiter.release()
+    granted.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await granted
+    await served
+    assert (limiter.active, limiter.waiting()) == (1, 0)
+
+
+def test_priority_context():
+    """Test the class is scoped to the block"""
+    assert current_priority() == "paid"
+    with priority("preview"):
+        assert current_priority() == "preview"
+    assert current_priority() == "paid"
+    with pytest.raises(ValueError):
+        with priority("vip"):
+            pass
+
+
+def test_load_weights():
+    """Test weights come from JSON and missing classes default to 1"""
+    assert load_weights('{"paid": 4}') == {"paid": 4.0, "free_trial": 1.0, "preview": 1.0}
+    with pytest.raises(ValueError):
+        load_weights('{"vip": 4}')
+    with pytest.raises(ValueError):
+        load_weights('{"paid": 0}')
+
+
+def test_requests_scheduled_by_class(client, device_id, fake_provider):
+    """Test previews and free trials reach the provider under their own class"""
+    def waits(priority_class):
+        labels = {"tool": TOOL_NAME, "provider": "fake", "priority": priority_class}
+        return REGISTRY.get_sample_value("tts_queue_wait_seconds_count", labels) or 0
+
+    before = {name: waits(name) for name in WEIGHTS}
+    response = client.post("/api/v1/tts/preview", json={"text": "Preview me.", "voice_id": "fake:default"})
+    assert response.status_code == 200
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "First one is free.", "voice_id": "fake:default"},
+        headers={"X-Device-Id": device_id},
+    )
+    assert response.status_code == 200
+
+    assert waits("preview") == before["preview"] + 1
+    assert waits("free_trial") == before["free_trial"] + 1
+    assert waits("paid") == before["paid"]
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import re
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from app.database import get_db
+from app.models import FreeTrialUsage, GenerationToken
+from app.services import quota
+from app.services.audio_cache import AudioCache, audio_cache
+from app.services.providers import FakeProvider
+from app.services.tts_service import tts_service
+from app.config import get_settings
+from app.shutdown import CANCEL_GRACE_SECONDS, drain
+
+
+class StallingProvider(FakeProvider):
+    """Writes part of the file, then finishes quickly or hangs on "stuck" text"""
+
+    name = "stall"
+
+    async def render(self, text, voice, speed, audio_format, dst_path, pitch="+0Hz") -> bool:
+        self.calls += 1
+        with open(dst_path, "wb") as f:
+            f.write(b"\xff\xfb")
+        if "stuck" in text:
+            await asyncio.Event().wait()
+        await asyncio.sleep(0.05)
+        return await super().render(text, voice, speed, audio_format, dst_path, pitch)
+
+
+@pytest.fixture
+def stalling_provider(register_provider, monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+    yield register_provider(StallingProvider())
+    drain.reset()
+
+
+def test_remove_partials(tmp_path):
+    """Test shutdown removes this process's scratch files and startup only stale ones"""
+    cache = AudioCache(str(tmp_path))
+    mine = cache.temp_path()
+    fresh, stale = tmp_path / "1-fresh.part", tmp_path / "1-stale.part"
+    for path in (mine, fresh, stale):
+        open(path, "wb").close()
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+
+    assert cache.remove_partials(max_age=3600) == 1
+    assert cache.remove_partials() == 1
+    assert sorted(os.listdir(tmp_path)) == ["1-fresh.part"]
+
+
+@pytest.mark.asyncio
+async def test_rolling_restart_under_load(client, stalling_provider, tmp_path):
+    """Test a drain finishes quick work, cancels the rest and refunds it"""
+    db = next(client.app.dependency_overrides[get_db]())
+    db.add(GenerationToken(device_id="paid", total_tokens=10))
+    db.add(FreeTrialUsage(device_id="paid", used=True))
+    db.commit()
+
+    transport = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        def generate(text, device="paid"):
+            return asyncio.create_task(http.post(
+                "/api/v1/tts/generate",
+                json={"text": text, "voice_id": "stall:default"},
+                headers={"X-Device-Id": device},
+            ))
+
+        lines = ["Quick line one.", "Quick line two.", "Quick line three."]
+        quick = [generate(line) for line in lines]
+        stuck = [generate("stuck line one."), generate("stuck line two."), generate("stuck trial.", "trial")]
+        await asyncio.sleep(0.02)
+        assert drain.in_flight == 6
+
+        draining = asyncio.create_task(drain.drain(0.5))
+        await asyncio.sleep(0)
+        refused = await http.post("/api/v1/tts/generate", json={"text": "Late.", "voice_id": "stall:default"},
+                                  headers={"X-Device-Id": "paid"})
+        ready = await http.get("/ready")
+
+        assert await draining == 3
+        results = await asyncio.gather(*quick, *stuck, return_exceptions=True)
+    await tts_service.cancel_inflight()
+
+    assert refused.status_code == 503
+    assert refused.headers["retry-after"]
+    assert ready.status_code == 503 and ready.json()["status"] == "draining"
+    assert [r.status_code for r in results[:3]] == [200] * 3
+    assert all(isinstance(r, asyncio.CancelledError) for r in results[3:])
+
+    # Only delivered audio is charged; cancelled holds and the free trial come back
+    db.expire_all()
+    tokens = db.query(GenerationToken).filter(GenerationToken.device_id == "paid").one()
+    assert tokens.reserved_credits == 0
+    assert tokens.used_credits == quota.cost({"stall": sum(len(line) for line in lines)})
+    assert db.query(FreeTrialUsage).filter(FreeTrialUsage.device_id == "trial").one().used is False
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_shutdown_fits_stop_grace_period():
+    """Test uvicorn's drain, the app's drain and the cancel grace end before SIGKILL"""
+    root = Path(__file__).resolve().parents[2]
+    dockerfile = (root / "backend" / "Dockerfile").read_text()
+    compose = (root / "docker-compose.yml").read_text()
+    uvicorn = float(re.search(r'"--timeout-graceful-shutdown", "(\d+)"', dockerfile).group(1))
+    grace = float(re.search(r"stop_grace_period: (\d+)s", compose).group(1))
+    assert uvicorn + get_settings().SHUTDOWN_DRAIN_SECONDS + CANCEL_GRACE_SECONDS < grace
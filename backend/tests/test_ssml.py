@@ -0,0 +1,123 @@
+import pytest
+from app.services.ssml import SSMLError, parse_ssml, is_ssml
+from app.services.audio_merge import concat_mp3, mp3_silence
+from app.services.tts_service import tts_service
+from app.services.audio_cache import audio_cache
+from app.models import VoiceGeneration
+
+DIALOGUE = (
+    '<speak>'
+    '<voice name="openai:nova">Hi, I am Nova.</voice>'
+    '<break time="500ms"/>'
+    '<voice name="en-GB-RyanNeural"><prosody rate="fast" pitch="+5Hz">And I am Ryan.</prosody></voice>'
+    '</speak>'
+)
+
+
+def test_parse_dialogue_segments():
+    """Test voice switches, breaks and prosody become ordered segments"""
+    segments = parse_ssml(DIALOGUE, "openai:alloy")
+    assert [(s.voice_id, s.text, s.break_ms) for s in segments] == [
+        ("openai:nova", "Hi, I am Nova.", 0),
+        ("openai:alloy", "", 500),
+        ("edge:en-GB-RyanNeural", "And I am Ryan.", 0),
+    ]
+    assert segments[2].speed == 1.25
+    assert segments[2].pitch == "+5Hz"
+
+
+def test_parse_merges_and_inherits_default_voice():
+    """Test text outside <voice> uses the request voice and adjacent runs merge"""
+    segments = parse_ssml("<speak>One <s>two</s> three</speak>", "edge:en-US-GuyNeural", 1.5)
+    assert len(segments) == 1
+    assert segments[0].text == "One two three"
+    assert segments[0].speed == 1.5
+
+
+@pytest.mark.parametrize("markup, text", [
+    ("<speak><s>One</s><s>Two</s></speak>", "One Two"),
+    ("<speak><p>First.</p><p>Second.</p></speak>", "First. Second."),
+    ("<speak>un<emphasis>believ</emphasis>able</speak>", "unbelievable"),
+    ('<speak>Made by <sub alias="World Wide Web Consortium">W3C</sub>.</speak>', "Made by World Wide Web Consortium."),
+])
+def test_parse_joins_text_runs(markup, text):
+    """Test blocks are kept apart, inline elements aren't, and <sub> speaks its alias"""
+    assert [s.text for s in parse_ssml(markup, "openai:alloy")] == [text]
+
+
+@pytest.mark.parametrize("markup", [
+    "<speak><voice>no name</voice></speak>",
+    "<speak><prosody pitch='+10%'>x</prosody></speak>",
+    "<speak><break time='soon'/>x</speak>",
+    "<speak><video/>x</speak>",
+    "<speak><break time='1s'/></speak>",
+    "<speak>unclosed",
+])
+def test_parse_rejects_invalid(markup):
+    """Test invalid markup raises SSMLError"""
+    with pytest.raises(SSMLError):
+        parse_ssml(markup, "openai:alloy")
+
+
+@pytest.mark.parametrize("markup", [
+    '<!DOCTYPE speak [<!ENTITY a "aaaaaaaaaa"><!ENTITY b "&a;&a;&a;&a;&a;">]><speak>&b;</speak>',
+    '<!DOCTYPE speak [<!ENTITY secret SYSTEM "file:///etc/passwd">]><speak>&secret;</speak>',
+    '<?xml version="1.0"?>\n<!doctype speak SYSTEM "http://example.com/speak.dtd"><speak>x</speak>',
+])
+def test_parse_rejects_dtds(markup):
+    """Test DTDs are refused before parsing, so entities never expand or load"""
+    with pytest.raises(SSMLError, match="DOCTYPE"):
+        parse_ssml(markup, "openai:alloy")
+
+
+def test_is_ssml():
+    assert is_ssml("  <speak>Hi</speak>")
+    assert not is_ssml("Hello <b>there</b>")
+
+
+def test_concat_mp3_inserts_silence(tmp_path):
+    """Test MP3 frame concatenation with pauses"""
+    a, b = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    a.write_bytes(b"AAA")
+    b.write_bytes(b"BBB")
+    out = tmp_path / "out.mp3"
+    concat_mp3([str(a), 240, str(b)], str(out))
+    assert out.read_bytes() == b"AAA" + mp3_silence(240) + b"BBB"
+    assert len(mp3_silence(240)) == 10 * 144
+
+
+def test_generate_ssml_accounts_per_voice(client, device_id, monkeypatch, tmp_path):
+    """Test multi-voice generation records characters per voice"""
+    calls = []
+
+    async def synthesize(provider, voice, text, speed=1.0, audio_format="mp3", bitrate=None, pitch="+0Hz"):
+        calls.append((provider, voice, text))
+        filename = f"{len(calls)}.mp3"
+        (tmp_path / filename).write_bytes(b"\xff\xf3" + text.encode())
+        return filename
+
+    monkeypatch.setattr(tts_service, "synthesize", synthesize)
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+    monkeypatch.setattr("app.services.tts_service.can_transcode", lambda: False)
+    monkeypatch.setattr("app.services.audio_merge.can_transcode", lambda: False)
+    monkeypatch.setattr("app.api.v1.tts.can_transcode", lambda: False)
+
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": DIALOGUE, "voice_id": "openai:alloy"},
+        headers={"X-Device-Id": device_id},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["segments"] == 3
+    assert data["characters_used"] == len("Hi, I am Nova.") + len("And I am Ryan.")
+    assert sorted(calls) == [("edge", "en-GB-RyanNeural", "And I am Ryan."), ("openai", "nova", "Hi, I am Nova.")]
+
+    from app.database import get_db
+    db = next(client.app.dependency_overrides[get_db]())
+    rows = db.query(VoiceGeneration).filter(VoiceGeneration.device_id == device_id).all()
+    assert {(r.provider, r.voice_id, r.text_length) for r in rows} == {
+        ("openai", "openai:nova", 14),
+        ("edge", "edge:en-GB-RyanNeural", 14),
+    }
+    assert len({r.audio_url for r in rows}) == 1
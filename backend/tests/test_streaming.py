@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+from app.services.sentence_splitter import SentenceSplitter
+from app.services.tts_service import tts_service
+from app.services.audio_cache import audio_cache
+from app.api.v1.tts import STREAM_HOLD_CHARACTERS
+from app.models import FreeTrialUsage, GenerationToken, UsageRollup, VoiceGeneration
+from app.services import quota
+
+
+def test_splitter_incremental():
+    """Test sentences are emitted only once complete"""
+    splitter = SentenceSplitter()
+    assert splitter.feed("Hello Mr. Smith. How are") == ["Hello Mr. Smith."]
+    assert splitter.feed(" you? I am fine") == ["How are you?"]
+    assert splitter.flush() == ["I am fine"]
+
+
+def test_splitter_cjk_and_long_runs():
+    """Test CJK terminators and the max length cut"""
+    splitter = SentenceSplitter(max_length=20)
+    assert splitter.feed("你好。世界") == ["你好。"]
+    splitter.flush()
+    chunks = splitter.feed("word " * 10)
+    assert chunks and all(len(c) <= 20 for c in chunks)
+
+
+@pytest.fixture
+def fake_synthesize(monkeypatch, tmp_path):
+    calls = []
+
+    async def synthesize(provider, voice, text, speed=1.0, audio_format="mp3", bitrate=None):
+        calls.append(text)
+        filename = f"{len(calls)}.mp3"
+        # Finish later sentences first to prove ordering is preserved
+        await asyncio.sleep(0.01 * (3 - len(calls) % 3))
+        (tmp_path / filename).write_bytes(text.encode())
+        return filename
+
+    monkeypatch.setattr(tts_service, "synthesize", synthesize)
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+    return calls
+
+
+def test_stream_session_in_order(client, device_id, fake_synthesize):
+    """Test sentences stream back in order within one authorized session"""
+    with client.websocket_connect(f"/api/v1/tts/stream?device_id={device_id}") as ws:
+        ws.send_json({"type": "start", "voice_id": "edge:en-US-GuyNeural"})
+        assert ws.receive_json()["type"] == "ready"
+        ws.send_json({"type": "text", "text": "One. Two"})
+        ws.send_json({"type": "text", "text": "! Three"})
+        ws.send_json({"type": "end"})
+
+        received = []
+        while True:
+            message = ws.receive_json()
+            if message["type"] == "done":
+                break
+            assert message["type"] == "audio"
+            assert ws.receive_bytes() == message["text"].encode()
+            received.append((message["seq"], message["text"]))
+
+    assert received == [(0, "One."), (1, "Two!"), (2, "Three")]
+    assert message["sentences"] == 3
+
+    from app.database import get_db
+    db = next(client.app.dependency_overrides[get_db]())
+    assert db.query(VoiceGeneration).filter(VoiceGeneration.device_id == device_id).count() == 3
+
+
+def test_stream_rejects_bad_voice(client, device_id):
+    """Test invalid start message returns an error frame"""
+    with client.websocket_connect(f"/api/v1/tts/stream?device_id={device_id}") as ws:
+        ws.send_json({"type": "start", "voice_id": "invalid"})
+        message = ws.receive_json()
+        assert message["type"] == "error"
+        assert "Invalid voice_id format" in message["detail"]
+
+
+@pytest.fixture
+def paid_device(client, device_id):
+    from app.database import get_db
+    db = next(client.app.dependency_overrides[get_db]())
+    db.add(FreeTrialUsage(device_id=device_id, used=True))
+    db.add(GenerationToken(device_id=device_id, total_tokens=2))
+    db.commit()
+    return db
+
+
+def test_paid_stream_is_held_and_charged_once(client, device_id, paid_device, fake_synthesize, monkeypatch):
+    """Test a paid session holds credits in blocks and charges delivered sentences on disconnect"""
+    holds = []
+    hold = quota._hold
+    monkeypatch.setattr(quota, "_hold", lambda db, device, credits: holds.append(credits) or hold(db, device, credits))
+    with client.websocket_connect(f"/api/v1/tts/stream?device_id={device_id}") as ws:
+        ws.send_json({"type": "start", "voice_id": "edge:en-US-GuyNeural"})
+        assert ws.receive_json()["access_type"] == "paid"
+        ws.send_json({"type": "text", "text": "One. Two. Three. Four. Five. "})
+        for _ in range(5):
+            assert ws.receive_json()["type"] == "audio"
+            ws.receive_bytes()
+        # Usage is written with the charge, not while the session runs
+        assert not paid_device.query(UsageRollup).count()
+        # Gone without an "end": what was delivered is still charged
+
+    record = paid_device.query(GenerationToken).filter_by(device_id=device_id).one()
+    # The server settles as it handles the disconnect, which can finish after the client returns
+    for _ in range(100):
+        paid_device.refresh(record)
+        if not record.reserved_credits:
+            break
+        time.sleep(0.01)
+    assert (record.reserved_credits, record.used_credits) == (0, len("One.Two.Three.Four.Five."))
+    # The 0-credit session hold, then one block for all five sentences
+    assert holds == [0, quota.cost({"edge": STREAM_HOLD_CHARACTERS})]
+    assert paid_device.query(VoiceGeneration).filter_by(device_id=device_id).count() == 5
+
+
+def test_stream_rejects_malformed_messages(client, device_id, fake_synthesize):
+    """Test non-JSON and non-object messages get error frames, not a dropped socket"""
+    with client.websocket_connect(f"/api/v1/tts/stream?device_id={device_id}") as ws:
+        ws.send_json({"type": "start", "voice_id": "edge:en-US-GuyNeural"})
+        assert ws.receive_json()["type"] == "ready"
+        for bad in ("not json", "[1, 2]", '"text"'):
+            ws.send_text(bad)
+            assert ws.receive_json() == {"type": "error", "detail": "Messages must be JSON objects"}
+        ws.send_json({"type": "text", "text": "Still here."})
+        ws.send_json({"type": "end"})
+        assert ws.receive_json()["text"] == "Still here."
+        ws.receive_bytes()
+        assert ws.receive_json()["type"] == "done"
+
+
+def test_stream_rejects_malformed_start(client, device_id):
+    """Test a start message that isn't a JSON object closes with an error frame"""
+    with client.websocket_connect(f"/api/v1/tts/stream?device_id={device_id}") as ws:
+        ws.send_text("[]")
+        assert ws.receive_json()["type"] == "error"
@@ -0,0 +1,77 @@
+from app.services.text_normalizer import normalize_text, number_to_words, language_for_voice
+
+
+def test_variants_share_canonical_form():
+    """Test whitespace/markup variants normalize to the same text"""
+    variants = [
+        "Hello   world.\n\nWelcome back.",
+        "**Hello** world. Welcome\tback.",
+        "<speak>Hello <emphasis>world</emphasis>. Welcome back.</speak>",
+        "# Hello world.\n> Welcome back.",
+        "Hello\u200b world.\u00a0Welcome back.",
+    ]
+    assert {normalize_text(v) for v in variants} == {"Hello world. Welcome back."}
+
+
+def test_markdown_links_and_code():
+    """Test Markdown links, images and inline code keep their text"""
+    text = "See [the docs](https://x.io) and ![a chart](c.png), run `make`."
+    assert normalize_text(text) == "See the docs and a chart, run make."
+
+
+def test_snake_case_untouched():
+    """Test underscores inside words are not treated as emphasis"""
+    assert normalize_text("set max_retry_count now") == "set max_retry_count now"
+
+
+def test_english_numbers():
+    """Test number, ordinal, percent, currency and year expansion"""
+    assert normalize_text("I have 3 cats") == "I have three cats"
+    assert normalize_text("the 21st time") == "the twenty-first time"
+    assert normalize_text("50% off") == "fifty percent off"
+    assert normalize_text("$5.50") == "five dollars and fifty cents"
+    assert normalize_text("in 1999") == "in nineteen ninety-nine"
+    assert normalize_text("1,234") == "one thousand two hundred thirty-four"
+    assert normalize_text("pi is 3.14") == "pi is three point one four"
+
+
+def test_plain_text_survives():
+    """Test comparisons, list numbers, decades and digit groups keep their meaning"""
+    assert normalize_text("If a < b and c > d then stop.") == "If a < b and c > d then stop."
+    assert normalize_text("1. First\n2. Second") == "one. First two. Second"
+    assert normalize_text("1) First", "fr") == "1. First"
+    assert normalize_text("The 1990s and the '80s") == "The nineteen nineties and the eighties"
+    assert normalize_text("Call 555-1234") == "Call five five five, one two three four"
+    assert normalize_text("(555) 123-4567") == "five five five, one two three, four five six seven"
+    assert normalize_text("from 1990-1995") == "from nineteen ninety-nineteen ninety-five"
+
+
+def test_number_to_words():
+    """Test large integer spelling"""
+    assert number_to_words(0) == "zero"
+    assert number_to_words(1000001) == "one million one"
+
+
+def test_locale_abbreviations():
+    """Test abbreviations expand per language and digits stay outside English"""
+    assert normalize_text("Dr. Smith", "en") == "Doctor Smith"
+    assert normalize_text("z.B. 3 Äpfel", "de") == "zum Beispiel 3 Äpfel"
+
+
+def test_language_for_voice():
+    """Test language is derived from Edge voice names, and unknown for OpenAI's"""
+    assert language_for_voice("edge", "de-DE-KatjaNeural") == "de"
+    assert language_for_voice("openai", "alloy") == ""
+    # Digits are left to voices whose language isn't known
+    assert normalize_text("Il a 3 chats", language_for_voice("openai", "alloy")) == "Il a 3 chats"
+
+
+def test_generate_rejects_markup_only_text(client, device_id):
+    """Test text that normalizes to nothing is rejected"""
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "<p> </p>", "voice_id": "openai:alloy"},
+        headers={"X-Device-Id": device_id},
+    )
+    assert response.status_code == 400
+    assert "empty" in response.json()["detail"]
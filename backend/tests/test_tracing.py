@@ -0,0 +1,114 @@
+import logging
+
+import httpx
+import pytest
+from sqlalchemy import create_engine, text
+from app.database import get_db
+from app.services.providers import build_registry
+from app.services.audio_cache import audio_cache
+from app.services.tts_service import TTSService
+from app.tracing import InMemoryExporter, TraceLogFilter, instrument_engine, span, tracer
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    exporter = InMemoryExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    return exporter
+
+
+def test_nested_spans(exporter):
+    """Test children share the trace and point at their parent"""
+    with span("outer") as outer:
+        with span("inner", step=1) as inner:
+            pass
+    assert exporter.names() == ["inner", "outer"]
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+    assert inner.attributes == {"step": 1}
+
+
+def test_span_records_errors(exporter):
+    """Test exceptions mark the span as failed"""
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError("boom")
+    assert exporter.spans[0].status == "error"
+
+
+def test_unsampled_spans_not_exported(monkeypatch):
+    """Test nothing is exported without an exporter"""
+    monkeypatch.setattr(tracer, "exporter", None)
+    with span("quiet") as quiet:
+        pass
+    assert not quiet.sampled
+
+
+def test_generate_is_traced(client, device_id, exporter, fake_provider):
+    """Test each generation stage is a span under the request's root span"""
+    traceparent = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+    response = client.post(
+        "/api/v1/tts/generate",
+        json={"text": "Trace me.", "voice_id": "fake:default"},
+        headers={"X-Device-Id": device_id, "traceparent": traceparent},
+    )
+    assert response.status_code == 200
+    assert response.headers["x-trace-id"] == "a" * 32
+
+    names = exporter.names()
+    for stage in (
+        "tts.prepare", "tts.quota.reserve", "tts.synthesize", "tts.provider.render",
+        "tts.publish", "tts.record", "POST /api/v1/tts/generate",
+    ):
+        assert stage in names
+    assert {s.trace_id for s in exporter.spans} == {"a" * 32}
+    root = exporter.spans[names.index("POST /api/v1/tts/generate")]
+    assert root.parent_id == "b" * 16
+    assert root.attributes["status"] == 200
+
+
+@pytest.mark.asyncio
+async def test_traceparent_sent_upstream(monkeypatch, tmp_path, exporter):
+    """Test upstream requests carry the current trace"""
+    seen = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get("traceparent"))
+        return httpx.Response(200, content=b"ID3audio")
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    monkeypatch.setattr("app.services.providers.openai.get_http_client", lambda: client)
+    monkeypatch.setattr(audio_cache, "directory", str(tmp_path))
+
+    with span("request") as root:
+        assert await TTSService(build_registry("live")).synthesize("openai", "alloy", "Hello there.")
+    assert seen[0].startswith(f"00-{root.trace_id}-")
+    render = exporter.spans[exporter.names().index("tts.provider.render")]
+    assert seen[0] == render.traceparent()
+
+
+def test_db_queries_are_spans(exporter):
+    """Test instrumented engines record a span per statement"""
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with span("request"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    query = exporter.spans[exporter.names().index("db.query")]
+    assert query.attributes["operation"] == "SELECT"
+
+    with span("request"):
+        sessions = get_db()
+        next(sessions)
+        sessions.close()
+    assert "db.session" in exporter.names()
+
+
+def test_logs_carry_trace_ids():
+    """Test log records inside a span get its ids"""
+    record = logging.LogRecord("app.test", logging.INFO, "", 0, "hello", (), None)
+    with span("request") as current:
+        TraceLogFilter().filter(record)
+    assert record.trace_id == current.trace_id
+    assert record.span_id == current.span_id
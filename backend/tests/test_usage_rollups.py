@@ -0,0 +1,100 @@
+import pytest
+from app.database import get_db
+from app.models import UsageRollup
+from app.services.usage_rollup import ALL_DEVICES, record_generation, rebuild_rollups, device_totals
+from app.api.v1 import admin
+
+
+@pytest.fixture
+def db(client):
+    return next(client.app.dependency_overrides[get_db]())
+
+
+@pytest.fixture
+def admin_key(monkeypatch):
+    monkeypatch.setattr(admin.settings, "ADMIN_API_KEY", "secret")
+    return {"X-Admin-Key": "secret"}
+
+
+def seed(db, device_id, count, voice_id="openai:alloy", text_length=10):
+    for _ in range(count):
+        record_generation(db, device_id, voice_id, voice_id.split(":")[0], text_length, "/audio/x.mp3")
+    db.commit()
+
+
+def test_record_generation_updates_rollups(db, device_id):
+    """Test each write bumps hour/day/total rows per device and globally"""
+    seed(db, device_id, 3)
+    seed(db, "other-device", 2, voice_id="edge:en-US-GuyNeural", text_length=5)
+
+    day = db.query(UsageRollup).filter_by(period="day", device_id=ALL_DEVICES, provider="openai").one()
+    assert (day.generations, day.characters) == (3, 30)
+    assert db.query(UsageRollup).filter_by(period="hour", device_id=device_id).one().generations == 3
+    assert device_totals(db, device_id) == {"generations": 3, "characters": 30}
+    assert device_totals(db, "other-device") == {"generations": 2, "characters": 10}
+    assert device_totals(db, "") == {"generations": 0, "characters": 0}
+
+
+def test_rebuild_matches_incremental(db, device_id):
+    """Test a rebuild from voice_generations reproduces the incremental rollups"""
+    seed(db, device_id, 4)
+    before = sorted((r.period, r.device_id, r.generations, r.characters) for r in db.query(UsageRollup))
+    assert rebuild_rollups(db) == 4
+    after = sorted((r.period, r.device_id, r.generations, r.characters) for r in db.query(UsageRollup))
+    assert before == after
+
+
+def test_history_pagination(client, db, device_id):
+    """Test keyset pagination walks all generations newest first"""
+    seed(db, device_id, 5)
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/v1/tts/history", params=params, headers={"X-Device-Id": device_id})
+        assert response.status_code == 200
+        data = response.json()
+        seen.extend(item["id"] for item in data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+    assert data["total_generations"] == 5
+
+
+def test_history_invalid_cursor(client, device_id):
+    response = client.get("/api/v1/tts/history?cursor=bad", headers={"X-Device-Id": device_id})
+    assert response.status_code == 400
+
+
+def test_admin_stats_requires_key(client, admin_key):
+    """Test admin stats rejects a wrong key"""
+    response = client.get("/api/v1/admin/stats", headers={"X-Admin-Key": "wrong"})
+    assert response.status_code == 401
+
+
+def test_admin_stats_disabled_without_key(client):
+    response = client.get("/api/v1/admin/stats")
+    assert response.status_code == 403
+
+
+def test_admin_stats_reads_rollups(client, db, device_id, admin_key):
+    """Test stats aggregate per provider and voice"""
+    seed(db, device_id, 2)
+    seed(db, device_id, 1, voice_id="edge:en-US-GuyNeural", text_length=7)
+    response = client.get("/api/v1/admin/stats?period=total", headers=admin_key)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_generations"] == 3
+    assert data["total_characters"] == 27
+    assert {b["provider"] for b in data["buckets"]} == {"openai", "edge"}
+
+
+@pytest.mark.parametrize("device", ["", "*", "x" * 200, "a b", "../etc"])
+def test_invalid_device_ids_are_refused(client, device):
+    """Test device routes refuse ids that could name the global or all-device rows"""
+    assert client.get("/api/v1/tts/history", headers={"X-Device-Id": device}).status_code == 422
+    assert client.get("/api/v1/tokens/status", headers={"X-Device-Id": device}).status_code == 422
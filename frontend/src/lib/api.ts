@@ -34,6 +34,9 @@ export interface TTSResponse {
   error?: string
 }
 
+// A token buys this many characters with standard voices (backend CHARACTERS_PER_TOKEN)
+export const CHARACTERS_PER_TOKEN = 1000
+
 export interface Product {
   id: string
   name: string
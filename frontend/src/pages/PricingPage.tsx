@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react'
 import { useTranslation } from 'react-i18next'
 import { Link } from 'react-router-dom'
 import { motion } from 'framer-motion'
-import { getProducts, createCheckout, Product } from '../lib/api'
+import { getProducts, createCheckout, Product, CHARACTERS_PER_TOKEN } from '../lib/api'
 import { getDeviceId } from '../lib/fingerprint'
 import { useTokenStore } from '../lib/tokenStore'
 import LanguageSwitcher from '../components/LanguageSwitcher'
@@ -142,7 +142,7 @@ export default function PricingPage() {
                     <ul className="space-y-3 mb-8">
                       <li className="flex items-center gap-2 text-white">
                         <span className="text-studio-neon-green">✓</span>
-                        {product.tokens} {t('pricing.generations')}
+                        {product.tokens} {t('pricing.tokens')} · {(product.tokens * CHARACTERS_PER_TOKEN).toLocaleString()} {t('pricing.characters')}
                       </li>
                       <li className="flex items-center gap-2 text-white">
                         <span className="text-studio-neon-green">✓</span>
@@ -158,6 +158,8 @@ export default function PricingPage() {
                       </li>
                     </ul>
 
+                    <p className="text-studio-muted text-xs mb-4 -mt-4">{t('pricing.tierNote')}</p>
+
                     <button
                       onClick={() => handlePurchase(product.id)}
                       disabled={processingId !== null}